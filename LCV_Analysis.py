@@ -1,13 +1,33 @@
 
+import os
+
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
-from scipy import stats
 
-# Matplotlibで日本語フォントを表示するための設定
-plt.rcParams['font.sans-serif'] = ['M+ 1C']
-plt.rcParams['axes.unicode_minus'] = False
+from density_scatter import DENSITY_THRESHOLD, density_scatter, should_aggregate
+from figure_rendering import make_job, render_figures
+from instrumentation import staged
+
+# 元のスクリプトの既定フォントサイズで描画する
+LCV_FIGURE_RC = {'font.size': 10}
+
+
+def draw_lcv_scatter(df, x_col, y_col, title, xlabel, ylabel, density_threshold=DENSITY_THRESHOLD):
+    """低位発熱量と説明変数の散布図を描画する（点数が density_threshold を超える場合は密度表示）"""
+    fig, ax = plt.subplots(figsize=(10, 6))
+    if should_aggregate(len(df), density_threshold):
+        mesh = density_scatter(ax, df[x_col], df[y_col], threshold=density_threshold, cmap='viridis')
+        fig.colorbar(mesh, ax=ax, label='Count')
+    else:
+        import seaborn as sns
+        sns.scatterplot(data=df, x=x_col, y=y_col, ax=ax)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.grid(True)
+    return fig
+
 
 def remove_outliers_iqr(df, column):
     """
@@ -73,17 +93,22 @@ def remove_outliers_iqr(df, column):
     
     return df_cleaned, outlier_info
 
-def analyze_lcv(file_path):
+@staged
+def analyze_lcv(file_path, df=None, output_dir='result', stages=None):
     """
     CSVファイルを分析し、低位発熱量の統計分析と相関プロットを行う。
     外れ値除外機能を含む。
 
     Args:
         file_path (str): 分析対象のCSVファイルパス
+        df (DataFrame): 読み込み済みのデータ（指定時は file_path を読み込まない）
+        output_dir (str): 図の保存先
     """
+    from scipy import stats
+
     try:
-        # CSVファイルの読み込み
-        df = pd.read_csv(file_path, encoding='utf-8')
+        # CSVファイルの読み込み（読み込み済みのデータは変更しないようコピーして使う）
+        df = pd.read_csv(file_path, encoding='utf-8') if df is None else df.copy()
 
         # 必要な列を抽出
         lcv_col = '低位発熱量_(実測値)_kJ/kg'
@@ -91,6 +116,7 @@ def analyze_lcv(file_path):
         start_year_col = '使用開始年度'
 
         # データのクリーニングと型変換
+        stages.begin('derive', rows=len(df))
         df[lcv_col] = pd.to_numeric(df[lcv_col], errors='coerce')
         df[capacity_col] = pd.to_numeric(df[capacity_col], errors='coerce')
         df[start_year_col] = pd.to_numeric(df[start_year_col], errors='coerce')
@@ -106,6 +132,7 @@ def analyze_lcv(file_path):
         df = df[df['稼働年数'] >= 0]
 
         # 外れ値の除外（低位発熱量）
+        stages.begin('filter', rows=len(df))
         print("--- 外れ値除外前の低位発熱量データ ---")
         print(f"レコード数: {len(df)}")
         print(f"低位発熱量の範囲: {df[lcv_col].min():.2f} - {df[lcv_col].max():.2f} kJ/kg")
@@ -133,15 +160,13 @@ def analyze_lcv(file_path):
 
 
         # 1. 低位発熱量の数値分析（外れ値除外後）
+        stages.begin('aggregate', rows=len(df))
         print("--- 低位発熱量_(実測値)_kJ/kg の統計分析（外れ値除外後） ---")
         print(df[lcv_col].describe())
         print(f"中央値: {df[lcv_col].median()}")
         print("\n")
 
         # 2. 施設全体の処理能力との相関プロット
-        plt.figure(figsize=(10, 6))
-        sns.scatterplot(data=df, x=capacity_col, y=lcv_col)
-        
         # 相関係数とP値の計算
         correlation_capacity, p_value_capacity = stats.pearsonr(df[capacity_col], df[lcv_col])
         
@@ -162,21 +187,19 @@ def analyze_lcv(file_path):
         else:
             p_display_capacity = f"{p_value_capacity:.3f}"
         
-        plt.title(f'Figure 4: Lower Calorific Value vs. Total Facility Processing Capacity\n(Correlation coefficient: {correlation_capacity:.3f}, p-value: {p_display_capacity} {significance_capacity})')
-        plt.xlabel('Total Facility Processing Capacity (t/day)')
-        plt.ylabel('Lower Calorific Value (Measured Value) (kJ/kg)')
-        plt.grid(True)
-        plt.savefig('result/lcv_vs_capacity.png')
-        plt.close()
-        print("グラフ 'result/lcv_vs_capacity.png' を保存しました。")
+        jobs = [make_job(draw_lcv_scatter, os.path.join(output_dir, 'lcv_vs_capacity.png'), rc=LCV_FIGURE_RC, kwargs={
+            'df': df[[capacity_col, lcv_col]],
+            'x_col': capacity_col,
+            'y_col': lcv_col,
+            'title': f'Figure 4: Lower Calorific Value vs. Total Facility Processing Capacity\n(Correlation coefficient: {correlation_capacity:.3f}, p-value: {p_display_capacity} {significance_capacity})',
+            'xlabel': 'Total Facility Processing Capacity (t/day)',
+            'ylabel': 'Lower Calorific Value (Measured Value) (kJ/kg)',
+        })]
         print(f"処理能力との相関: r = {correlation_capacity:.3f}, p = {p_display_capacity} {significance_capacity}")
         print()
 
 
         # 3. 稼働年数との相関プロット
-        plt.figure(figsize=(10, 6))
-        sns.scatterplot(data=df, x='稼働年数', y=lcv_col)
-        
         # 相関係数とP値の計算
         correlation_years, p_value_years = stats.pearsonr(df['稼働年数'], df[lcv_col])
         
@@ -197,16 +220,22 @@ def analyze_lcv(file_path):
         else:
             p_display_years = f"{p_value_years:.3f}"
         
-        plt.title(f'図4: 低位発熱量 vs 稼働年数\n(相関係数: {correlation_years:.3f}, P値: {p_display_years} {significance_years})')
-        plt.xlabel('稼働年数 (年)')
-        plt.ylabel('低位発熱量 (実測値) (kJ/kg)')
-        plt.grid(True)
-        plt.savefig('result/lcv_vs_years.png')
-        plt.close()
-        print("グラフ 'result/lcv_vs_years.png' を保存しました。")
+        jobs.append(make_job(draw_lcv_scatter, os.path.join(output_dir, 'lcv_vs_years.png'), rc=LCV_FIGURE_RC, kwargs={
+            'df': df[['稼働年数', lcv_col]],
+            'x_col': '稼働年数',
+            'y_col': lcv_col,
+            'title': f'図4: 低位発熱量 vs 稼働年数\n(相関係数: {correlation_years:.3f}, P値: {p_display_years} {significance_years})',
+            'xlabel': '稼働年数 (年)',
+            'ylabel': '低位発熱量 (実測値) (kJ/kg)',
+        }))
         print(f"稼働年数との相関: r = {correlation_years:.3f}, p = {p_display_years} {significance_years}")
         print()
 
+        # 2つの散布図を並列に描画・保存
+        stages.end()
+        render_figures(jobs)
+        print()
+
         # 相関分析のまとめ
         print("--- 相関分析まとめ ---")
         print(f"処理能力との相関: r = {correlation_capacity:.3f}, p = {p_display_capacity} {significance_capacity}")
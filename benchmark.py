@@ -0,0 +1,257 @@
+"""
+分析のスケーリングのベンチマーク
+
+synthetic_survey.py で行数の異なる合成データ（既定は 1千・1万・10万・100万行）を作り、
+incineration.py の各サブコマンドを別プロセスで実行して経過時間・CPU 時間・ピーク RSS と
+段階ごとの経過時間（instrumentation のトレース）を計測する。保存しておいた基準値
+（--save-baseline）と比べ、閾値を超えて遅く・大きくなった組み合わせを報告する。
+
+    python benchmark.py --sizes 1000 10000 100000 --save-baseline
+    python benchmark.py --sizes 1000 10000 100000          # 基準値と比較
+"""
+
+import argparse
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import synthetic_survey
+
+CONFIG = {
+    'root': os.path.dirname(os.path.abspath(__file__)),
+    'output_dir': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'result', 'benchmark'),
+    'sizes': [1_000, 10_000, 100_000, 1_000_000],
+    # 計測するサブコマンド（plots は stats / power の結果を使うため後に置く）
+    'analyses': ['stats', 'power', 'efficiency', 'describe', 'plots'],
+    'repeat': 1,
+    # 基準値に対する比がこれを超えたら悪化とみなす
+    'threshold': 1.25,
+    # 1回の実行の制限時間（秒。None は無制限）
+    'timeout': None,
+}
+
+
+def baseline_path(config=CONFIG):
+    return os.path.join(config['output_dir'], 'baseline.json')
+
+
+def run_analysis(name, input_csv, work_dir, timeout=None, root=None):
+    """
+    incineration.py のサブコマンドを1つ別プロセスで実行して計測する。
+
+    Returns:
+        dict: status, wall_s, cpu_s, peak_rss_mb, stages（段階 → 経過時間[秒]）, log
+    """
+    root = root or CONFIG['root']
+    os.makedirs(work_dir, exist_ok=True)
+    log = os.path.join(work_dir, f"{name}.log")
+    trace = os.path.join(work_dir, f"{name}.trace.jsonl")
+    if os.path.exists(trace):
+        os.remove(trace)
+    # 出力キャッシュで描画などが省略されないようにする
+    env = dict(os.environ, MPLBACKEND='Agg', PYTHONUNBUFFERED='1', OUTPUT_CACHE='0',
+               OUTPUT_CACHE_MANIFEST=os.path.join(work_dir, '.cache', 'manifest.json'),
+               INCINERATION_TRACE=trace)
+    env.pop('INCINERATION_PROFILE', None)
+
+    command = [sys.executable, os.path.join(root, 'incineration.py'), name,
+               '--input', input_csv, '--output-dir', work_dir]
+    start = time.perf_counter()
+    with open(log, 'w', encoding='utf-8') as f:
+        proc = subprocess.Popen(command, cwd=root, env=env, stdout=f, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL)
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, proc.send_signal, (signal.SIGKILL,))
+            timer.start()
+        # wait4 でこの子プロセスだけの CPU 時間とピーク RSS を取得する
+        _, wait_status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(wait_status)
+        if timer is not None:
+            timer.cancel()
+    wall = time.perf_counter() - start
+
+    if proc.returncode == 0:
+        status = 'ok'
+    elif proc.returncode == -signal.SIGKILL and timeout is not None and wall >= timeout:
+        status = 'timeout'
+    else:
+        status = f"failed ({proc.returncode})"
+    # ru_maxrss は Linux では KB、macOS ではバイト
+    peak = usage.ru_maxrss / (1024 * 1024) if sys.platform == 'darwin' else usage.ru_maxrss / 1024
+    return {
+        'status': status,
+        'wall_s': round(wall, 4),
+        'cpu_s': round(usage.ru_utime + usage.ru_stime, 4),
+        'peak_rss_mb': round(peak, 1),
+        'stages': stage_times(trace),
+        'log': log,
+    }
+
+
+def stage_times(trace):
+    """トレースから段階ごとの経過時間の合計を求める（サブコマンド全体の 'command' は除く）"""
+    if not os.path.exists(trace) or os.path.getsize(trace) == 0:
+        return {}
+    import instrumentation
+    records = instrumentation.load_trace(trace)
+    records = records[records['stage'] != 'command']
+    return records.groupby('stage', sort=False)['wall_s'].sum().round(4).to_dict()
+
+
+def run_benchmark(sizes=None, analyses=None, repeat=None, timeout=None, config=CONFIG):
+    """
+    行数 × サブコマンドの組み合わせを計測する。
+
+    同じ組み合わせを repeat 回実行した場合、時間は最小値、ピーク RSS は最大値を採る。
+
+    Returns:
+        list: 組み合わせごとの計測結果（dict）
+    """
+    sizes = sizes or config['sizes']
+    analyses = analyses or config['analyses']
+    repeat = repeat or config['repeat']
+    timeout = config['timeout'] if timeout is None else timeout
+
+    template = synthetic_survey.load_template()
+    results = []
+    for n_rows in sizes:
+        input_csv = synthetic_survey.write_survey(n_rows, template=template)
+        work_dir = os.path.join(config['output_dir'], 'runs', f"rows_{n_rows}")
+        for name in analyses:
+            runs = [run_analysis(name, input_csv, work_dir, timeout, config['root']) for _ in range(repeat)]
+            ok = [r for r in runs if r['status'] == 'ok']
+            best = min(ok, key=lambda r: r['wall_s']) if ok else runs[-1]
+            result = {
+                'rows': n_rows,
+                'analysis': name,
+                'status': best['status'],
+                'wall_s': best['wall_s'],
+                'cpu_s': min(r['cpu_s'] for r in (ok or runs)),
+                'peak_rss_mb': max(r['peak_rss_mb'] for r in (ok or runs)),
+                'stages': best['stages'],
+            }
+            results.append(result)
+            print(f"{n_rows:>10,} 行  {name:<12} {result['status']:<8} {result['wall_s']:9.2f} 秒 "
+                  f"{result['peak_rss_mb']:9.1f} MB" + ('' if ok else f"  （ログ: {best['log']}）"))
+    return results
+
+
+def results_frame(results):
+    """計測結果を (行数, サブコマンド) を索引とする DataFrame にする"""
+    return pd.DataFrame(results).set_index(['rows', 'analysis'])
+
+
+def scaling_exponents(results):
+    """
+    サブコマンドごとに log(経過時間) を log(行数) に回帰した傾き（1 なら行数に比例）。
+
+    行数が2種類以上成功しているサブコマンドのみ。
+    """
+    frame = pd.DataFrame(results)
+    frame = frame[frame['status'] == 'ok']
+    exponents = {}
+    for name, group in frame.groupby('analysis', sort=False):
+        if group['rows'].nunique() >= 2:
+            slope, _ = np.polyfit(np.log(group['rows']), np.log(group['wall_s'].clip(lower=1e-6)), 1)
+            exponents[name] = round(float(slope), 2)
+    return exponents
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    payload = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def compare_with_baseline(results, baseline, threshold=None):
+    """
+    基準値との比（今回 / 基準値）を求める。
+
+    Returns:
+        pd.DataFrame: 経過時間・ピーク RSS の今回値・基準値・比と、悪化したかどうか
+    """
+    threshold = threshold or CONFIG['threshold']
+    current = results_frame(results)[['status', 'wall_s', 'peak_rss_mb']]
+    base = results_frame(baseline)[['status', 'wall_s', 'peak_rss_mb']]
+    joined = current.join(base, how='inner', rsuffix='_基準')
+    joined = joined[(joined['status'] == 'ok') & (joined['status_基準'] == 'ok')]
+    joined['経過時間の比'] = (joined['wall_s'] / joined['wall_s_基準']).round(2)
+    joined['ピークRSSの比'] = (joined['peak_rss_mb'] / joined['peak_rss_mb_基準']).round(2)
+    joined['悪化'] = (joined['経過時間の比'] > threshold) | (joined['ピークRSSの比'] > threshold)
+    return joined.drop(columns=['status', 'status_基準'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成データで分析のスケーリングを計測し、基準値と比較する')
+    parser.add_argument('--sizes', type=int, nargs='+', default=CONFIG['sizes'], help='合成データの行数')
+    parser.add_argument('--analyses', nargs='+', default=CONFIG['analyses'], help='計測するサブコマンド')
+    parser.add_argument('--repeat', type=int, default=CONFIG['repeat'], help='同じ組み合わせの実行回数')
+    parser.add_argument('--timeout', type=float, default=CONFIG['timeout'], help='1回の実行の制限時間（秒）')
+    parser.add_argument('--baseline', default=baseline_path(), help='基準値のファイル')
+    parser.add_argument('--save-baseline', action='store_true', help='今回の結果を基準値として保存する')
+    parser.add_argument('--threshold', type=float, default=CONFIG['threshold'], help='悪化とみなす基準値との比')
+    args = parser.parse_args()
+
+    from incineration import COMMANDS
+    unknown = [name for name in args.analyses if name not in COMMANDS]
+    if unknown:
+        parser.error(f"不明なサブコマンド: {', '.join(unknown)}（{', '.join(COMMANDS)}）")
+
+    results = run_benchmark(args.sizes, args.analyses, args.repeat, args.timeout)
+    latest = os.path.join(CONFIG['output_dir'], 'latest.json')
+    save_results(results, latest)
+
+    frame = results_frame(results)
+    stages = pd.DataFrame(list(frame['stages']), index=frame.index).fillna(0.0)
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print("\n=== 計測結果 ===")
+        print(frame.drop(columns='stages'))
+        if not stages.empty:
+            print("\n=== 段階ごとの経過時間（秒） ===")
+            print(stages.round(3))
+        exponents = scaling_exponents(results)
+        if exponents:
+            print("\n=== スケーリング指数（経過時間 ∝ 行数^指数） ===")
+            for name, exponent in exponents.items():
+                print(f"{name:<12} {exponent:5.2f}")
+
+        regressed = False
+        if args.save_baseline:
+            save_results(results, args.baseline)
+            print(f"\n基準値を {args.baseline} に保存しました")
+        elif os.path.exists(args.baseline):
+            comparison = compare_with_baseline(results, load_results(args.baseline), args.threshold)
+            print(f"\n=== 基準値との比較（{args.baseline}、閾値 {args.threshold}） ===")
+            print(comparison)
+            regressed = bool(comparison['悪化'].any())
+        else:
+            print(f"\n基準値がありません（--save-baseline で保存できます）: {args.baseline}")
+    print(f"計測結果を {latest} に保存しました")
+
+    failed = (frame['status'] != 'ok').any()
+    return 1 if failed or regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
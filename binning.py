@@ -0,0 +1,163 @@
+"""
+範囲別分布（ビン分け）の共通モジュール
+
+ビン境界とラベルを宣言的に定義し、件数・割合・ビンごとの集計値を np.digitize と np.bincount の
+1回の走査で求める。グループ（都道府県・年度など）ごとの分布も同じ走査で計算できる。
+結果は DataFrame で返すため、コンソール表示（print_distribution）にも HTML / CSV への書き出しにも使える。
+"""
+
+import numpy as np
+import pandas as pd
+
+INF = float('inf')
+
+
+def _fmt(value):
+    """境界値の表示（整数なら桁区切り付きの整数）"""
+    return f"{int(value):,}" if float(value).is_integer() else f"{value:,g}"
+
+
+def _default_labels(edges, right, unit):
+    labels = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if right:
+            # (lo, hi] : 「lo超〜hi以下」
+            if lo == -INF:
+                labels.append(f"{_fmt(hi)}{unit}以下")
+            elif hi == INF:
+                labels.append(f"{_fmt(lo)}{unit}超")
+            else:
+                labels.append(f"{_fmt(lo)}{unit}超〜{_fmt(hi)}{unit}以下")
+        else:
+            # [lo, hi) : 「lo-hi」
+            if lo == -INF:
+                labels.append(f"{_fmt(hi)}{unit}未満")
+            elif hi == INF:
+                labels.append(f"{_fmt(lo)}{unit}以上")
+            else:
+                labels.append(f"{_fmt(lo)}-{_fmt(hi)}{unit}")
+    return labels
+
+
+def make_bins(edges, labels=None, right=False, unit='', name='範囲'):
+    """
+    ビンの定義を作成する。
+
+    Args:
+        edges (list): ビン境界（昇順。端を開く場合は -inf / inf）
+        labels (list): ビンのラベル（省略時は境界と単位から自動生成）
+        right (bool): False なら [下限, 上限)、True なら (下限, 上限]
+        unit (str): 自動生成するラベルの単位
+        name (str): 分布の表で範囲の列に付ける名前
+
+    Returns:
+        dict: {'edges', 'labels', 'right', 'name'}
+    """
+    edges = np.asarray(edges, dtype=float)
+    if edges.ndim != 1 or edges.size < 2 or np.any(np.diff(edges) <= 0):
+        raise ValueError(f"ビン境界は2つ以上の昇順の値で指定してください: {edges}")
+    labels = list(labels) if labels is not None else _default_labels(edges, right, unit)
+    if len(labels) != edges.size - 1:
+        raise ValueError(f"ラベルの数 ({len(labels)}) がビンの数 ({edges.size - 1}) と一致しません")
+    return {'edges': edges, 'labels': labels, 'right': right, 'name': name}
+
+
+# 発電効率（仕様値・公称値）の範囲別分布
+EFFICIENCY_BINS = make_bins([-INF, 10, 15, 20, 25, INF], unit='%', name='発電効率の範囲')
+# 発電能力の範囲別分布
+CAPACITY_BINS = make_bins([-INF, 1000, 3000, 5000, 10000, INF], unit='kW', name='発電能力の範囲')
+# 熱利用率の分布（100%超は物理的に不可能）
+HEAT_RATIO_BINS = make_bins([0, 10, 20, 30, 50, 100, INF], right=True, unit='%', name='熱利用率の範囲')
+
+
+def assign_bins(values, bins):
+    """
+    各値のビン番号を返す（欠損値・範囲外は -1）。
+
+    Args:
+        values: 値（Series / ndarray）
+        bins (dict): make_bins で作成したビンの定義
+    """
+    values = np.asarray(values, dtype=float)
+    edges = bins['edges']
+    codes = np.digitize(values, edges[1:-1], right=bins['right'])
+    if bins['right']:
+        inside = (values > edges[0]) & (values <= edges[-1])
+    else:
+        inside = (values >= edges[0]) & (values < edges[-1])
+    return np.where(inside, codes, -1)
+
+
+def bin_counts(values, bins):
+    """ビンごとの件数（ndarray）"""
+    codes = assign_bins(values, bins)
+    return np.bincount(codes[codes >= 0], minlength=len(bins['labels']))
+
+
+def distribution(values, bins, aggregates=None, groups=None, group_name='グループ', total=None):
+    """
+    範囲別分布を計算する。
+
+    Args:
+        values: ビン分けする値
+        bins (dict): make_bins で作成したビンの定義
+        aggregates (dict): {名前: 値} ビンごとに合計と平均を求める値（values と同じ長さ）
+        groups: グループのキー（values と同じ長さ。指定時はグループごとの分布）
+        group_name (str): グループの列名
+        total (int): 割合の分母（省略時はグループごとの有効値の件数）
+
+    Returns:
+        DataFrame: [グループ,] 範囲, 件数, 割合_%, [名前_合計, 名前_平均, ...]
+    """
+    codes = assign_bins(values, bins)
+    n_bins = len(bins['labels'])
+    if groups is None:
+        group_codes = np.zeros(len(codes), dtype=np.int64)
+        group_labels = None
+    else:
+        group_codes, group_labels = pd.factorize(pd.Series(np.asarray(groups)), sort=True)
+    n_groups = 1 if group_labels is None else len(group_labels)
+
+    keep = (codes >= 0) & (group_codes >= 0)
+    flat = group_codes[keep] * n_bins + codes[keep]
+    size = n_groups * n_bins
+    counts = np.bincount(flat, minlength=size).reshape(n_groups, n_bins)
+
+    denom = counts.sum(axis=1, keepdims=True) if total is None else np.full((n_groups, 1), total)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shares = np.where(denom > 0, counts / denom * 100, np.nan)
+
+    result = pd.DataFrame({
+        bins['name']: np.tile(bins['labels'], n_groups),
+        '件数': counts.ravel(),
+        '割合_%': shares.ravel(),
+    })
+    for name, agg_values in (aggregates or {}).items():
+        agg_values = np.asarray(agg_values, dtype=float)[keep]
+        valid = ~np.isnan(agg_values)
+        sums = np.bincount(flat[valid], weights=agg_values[valid], minlength=size)
+        n_valid = np.bincount(flat[valid], minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[f'{name}_合計'] = sums
+            result[f'{name}_平均'] = np.where(n_valid > 0, sums / np.maximum(n_valid, 1), np.nan)
+
+    if group_labels is not None:
+        result.insert(0, group_name, np.repeat(np.asarray(group_labels), n_bins))
+    return result
+
+
+def print_distribution(dist, unit='施設', show_share=False, thousands=False):
+    """
+    範囲別分布をコンソールに表示する（例: 「10-15%: 12 施設 (3.4%)」）。
+
+    Args:
+        dist (DataFrame): distribution() の結果（グループなし）
+        unit (str): 件数の単位
+        show_share (bool): 割合も表示する
+        thousands (bool): 件数を桁区切りで表示する
+    """
+    label_col = dist.columns[0]
+    for label, count, share in zip(dist[label_col], dist['件数'], dist['割合_%']):
+        count_text = f"{count:,}" if thousands else f"{count}"
+        share_text = f" ({share:.1f}%)" if show_share else ""
+        print(f"{label}: {count_text} {unit}{share_text}")
@@ -0,0 +1,92 @@
+"""
+分析スクリプト共通の設定（入力データ・出力先のパスと各分析のパラメータ）
+
+設定ファイル（TOML / JSON）を読み込み、既定値に上書きする。設定ファイルは次の順に探す。
+    1. load_config() の引数
+    2. 環境変数 INCINERATION_CONFIG
+    3. このモジュールと同じディレクトリの incineration.toml（なければ既定値のみ）
+
+最上位のキーは全ての分析で共通の設定、[stats] などのテーブルは各サブコマンドの設定で、
+section() で共通の設定にサブコマンドの設定を重ねたものを取り出す。
+"""
+
+import json
+import os
+
+CONFIG_ENV = 'INCINERATION_CONFIG'
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'incineration.toml')
+
+DEFAULT_CONFIG = {
+    # 相対パスの基準（設定ファイルで相対パスを指定した場合は設定ファイルのディレクトリが基準）
+    'base_dir': os.path.dirname(os.path.abspath(__file__)),
+    'input_file': '2022_1焼却施設.csv',
+    'output_dir': 'result',
+    'encoding': 'utf-8-sig',
+    # 図の描画のワーカープロセス数（1 は現在のプロセスで描画。None は CPU 数）
+    'workers': 1,
+}
+
+# パスとして解決するキー（base_dir からの相対パス可）
+PATH_KEYS = ('input_file', 'output_dir')
+
+
+def read_config_file(path):
+    """設定ファイル（.toml / .json）を読み込む"""
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    try:
+        import tomllib
+    except ImportError:  # Python 3.10 以前
+        try:
+            import tomli as tomllib
+        except ImportError as e:
+            raise ImportError("TOML の設定ファイルを読み込むには Python 3.11 以降か tomli が必要です (pip install tomli)") from e
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+
+def resolve_path(config, path):
+    """base_dir からの相対パスを絶対パスにする"""
+    path = os.path.expanduser(path)
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(config['base_dir'], path))
+
+
+def load_config(path=None):
+    """
+    設定を読み込む。
+
+    Args:
+        path (str): 設定ファイルのパス（省略時は環境変数 INCINERATION_CONFIG、incineration.toml の順に探す）
+
+    Returns:
+        dict: 既定値に設定ファイルを重ねた設定（input_file, output_dir は絶対パス）
+    """
+    path = path or os.environ.get(CONFIG_ENV)
+    if path is None and os.path.exists(DEFAULT_CONFIG_FILE):
+        path = DEFAULT_CONFIG_FILE
+
+    config = dict(DEFAULT_CONFIG)
+    if path is not None:
+        loaded = read_config_file(path)
+        base_dir = loaded.pop('base_dir', None)
+        if base_dir is not None:
+            base_dir = os.path.expanduser(base_dir)
+            config['base_dir'] = (base_dir if os.path.isabs(base_dir)
+                                  else os.path.join(os.path.dirname(os.path.abspath(path)), base_dir))
+        config.update(loaded)
+    config['config_file'] = path
+    config['base_dir'] = os.path.normpath(config['base_dir'])
+    for key in PATH_KEYS:
+        config[key] = resolve_path(config, config[key])
+    return config
+
+
+def section(config, name):
+    """共通の設定にサブコマンド name の設定（[name] テーブル）を重ねたものを返す"""
+    common = {k: v for k, v in config.items() if not isinstance(v, dict)}
+    overrides = dict(config.get(name, {}))
+    for key in PATH_KEYS:
+        if key in overrides:
+            overrides[key] = resolve_path(config, overrides[key])
+    return {**common, **overrides}
@@ -1,10 +1,22 @@
+import argparse
+import itertools
 import os
-from datetime import datetime
+import re
 
+import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import japanize_matplotlib
+
+from figure_rendering import make_job, render_figures
+
+# CSVのフルパス（必要に応じて書き換えてください）
+CSV_ABS_PATH = "/home/ubuntu/cur/program/Analyisis_incineration/神戸電鉄_乗降客数.csv"
+
+# 既定の対象列（候補のうち存在するものを使用）
+X_OPTIONS = ["年間処理量(t/day)", "年間処理量(t/year)"]
+Y_OPTIONS = ["発電量実績(MWh/year)"]
+
+# --pairs / --x / --y で列の候補を区切る文字（例: "年間処理量(t/day)|年間処理量(t/year)"）
+OPTION_SEPARATOR = "|"
 
 
 def pick_existing(cols, options):
@@ -14,65 +26,177 @@ def pick_existing(cols, options):
     return None
 
 
-def main():
-    # CSVのフルパス（必要に応じて書き換えてください）
-    CSV_ABS_PATH = "/home/ubuntu/cur/program/Analyisis_incineration/神戸電鉄_乗降客数.csv"
-
-    if not os.path.exists(CSV_ABS_PATH):
-        raise FileNotFoundError(f"CSVが見つかりません: {CSV_ABS_PATH}")
-
-    # 結果出力ディレクトリ
-    out_dir = os.path.join(os.path.dirname(__file__), "result")
-    os.makedirs(out_dir, exist_ok=True)
-
-    # 指定フォント設定（簡潔）
-    plt.rcParams['font.sans-serif'] = ['M+ 1C']
-    plt.rcParams['axes.unicode_minus'] = False
-
-    # 読み込み
-    df = pd.read_csv(CSV_ABS_PATH, encoding="utf-8")
-
-    # 対象列名（存在するものを使用）
-    x_options = ["年間処理量(t/day)", "年間処理量(t/year)"]
-    y_options = ["発電量実績(MWh/year)"]
-
-    x_col = pick_existing(df.columns, x_options)
-    y_col = pick_existing(df.columns, y_options)
-    if x_col is None or y_col is None:
-        raise KeyError(
-            f"必要な列が見つかりません。x候補: {x_options} / y候補: {y_options} / 実列: {list(df.columns)}"
+def resolve_columns(header, specs):
+    """
+    列の指定（候補を OPTION_SEPARATOR で区切った文字列、または候補のリスト）をヘッダーに対して1回だけ解決する。
+
+    Returns:
+        dict: 指定 → 実際の列名（見つからない指定は None）
+    """
+    resolved = {}
+    for spec in specs:
+        key = spec if isinstance(spec, str) else OPTION_SEPARATOR.join(spec)
+        if key not in resolved:
+            resolved[key] = pick_existing(header, key.split(OPTION_SEPARATOR))
+    return resolved
+
+
+def build_pairs(pairs=None, x_specs=None, y_specs=None):
+    """
+    列の組（x の指定, y の指定）のリスト。pairs は "x:y"、x_specs / y_specs は直積にする。
+
+    何も指定しなければ既定の1組（X_OPTIONS × Y_OPTIONS）。
+    """
+    result = []
+    for pair in pairs or []:
+        if ":" not in pair:
+            raise ValueError(f"列の組は x:y の形で指定してください: {pair}")
+        x_spec, y_spec = pair.split(":", 1)
+        result.append((x_spec, y_spec))
+    if x_specs or y_specs:
+        if not (x_specs and y_specs):
+            raise ValueError("--x と --y は両方指定してください")
+        result += [(x, y) for x, y in itertools.product(x_specs, y_specs) if x != y]
+    if not result:
+        result = [(OPTION_SEPARATOR.join(X_OPTIONS), OPTION_SEPARATOR.join(Y_OPTIONS))]
+    return list(dict.fromkeys(result))
+
+
+def pairwise_correlations(df, pairs):
+    """
+    列の組ごとの Pearson 相関係数（組ごとに両方の値がある行のみ）を行列演算1回で求める。
+
+    Returns:
+        pd.DataFrame: x, y, n, pearson_r, abs_r
+    """
+    columns = list(dict.fromkeys(col for pair in pairs for col in pair))
+    values = np.column_stack([pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64) for c in columns])
+    valid = ~np.isnan(values)
+    # 列ごとに平均を引いても相関係数は変わらない（桁の大きな列の桁落ちを防ぐ）
+    centered = np.where(valid, values - np.nanmean(np.where(valid, values, np.nan), axis=0), 0.0)
+    mask = valid.astype(np.float64)
+
+    # [i, j] は列 i と列 j の両方に値がある行での合計
+    n = mask.T @ mask
+    sum_x = centered.T @ mask
+    sum_xx = (centered ** 2).T @ mask
+    sum_xy = centered.T @ centered
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = n * sum_xy - sum_x * sum_x.T
+        var = n * sum_xx - sum_x ** 2
+        corr = cov / np.sqrt(var * var.T)
+
+    position = {c: i for i, c in enumerate(columns)}
+    rows = []
+    for x_col, y_col in pairs:
+        i, j = position[x_col], position[y_col]
+        r = corr[i, j] if n[i, j] >= 2 and np.isfinite(corr[i, j]) else np.nan
+        rows.append({"x": x_col, "y": y_col, "n": int(n[i, j]), "pearson_r": r})
+    table = pd.DataFrame(rows, columns=["x", "y", "n", "pearson_r"])
+    table["abs_r"] = table["pearson_r"].abs()
+    return table
+
+
+def draw_relplot(x, y, x_col, y_col, corr):
+    """散布図（seaborn.relplot）の Figure を返す（figure_rendering のジョブから呼ばれる）"""
+    import seaborn as sns
+
+    valid = pd.DataFrame({x_col: x, y_col: y})
+    with sns.axes_style("whitegrid"):
+        g = sns.relplot(
+            data=valid,
+            x=x_col,
+            y=y_col,
+            kind="scatter",
+            height=5,
+            aspect=1.3,
+            color="#1f77b4",
         )
-
-    # 数値化 & 欠損除外
-    x = pd.to_numeric(df[x_col], errors="coerce")
-    y = pd.to_numeric(df[y_col], errors="coerce")
-    valid = pd.DataFrame({x_col: x, y_col: y}).dropna()
-
-    # 相関係数（Pearson）
-    corr = valid[x_col].corr(valid[y_col]) if not valid.empty else float("nan")
-
-    # 可視化（散布図: seaborn.relplot）
-    sns.set_theme(style="whitegrid")
-    g = sns.relplot(
-        data=valid,
-        x=x_col,
-        y=y_col,
-        kind="scatter",
-        height=5,
-        aspect=1.3,
-        color="#1f77b4",
-    )
     title = f"{x_col} と {y_col} の関係 (n={len(valid)})\nPearson r = {corr:.3f}"
     g.set_axis_labels(x_col, y_col)
     g.figure.suptitle(title, y=1.03)
-
-    # 保存
-    stem = os.path.splitext(os.path.basename(CSV_ABS_PATH))[0]
-    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-    out_path = os.path.join(out_dir, f"{stem}_relplot_{ts}.png")
-    g.figure.savefig(out_path, bbox_inches="tight", dpi=150)
-    print(f"相関係数 (Pearson): {corr:.4f}")
-    print(f"散布図を保存しました: {out_path}")
+    return g.figure
+
+
+def _safe_name(column):
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", column).strip("_")
+
+
+def relplot_path(out_dir, stem, x_col, y_col):
+    """散布図の保存先（同じ列の組は同じファイルに上書きする）"""
+    return os.path.join(out_dir, f"{stem}_relplot_{_safe_name(x_col)}__{_safe_name(y_col)}.png")
+
+
+def build_jobs(df, correlations, out_dir, stem):
+    """相関係数の表の組ごとに散布図の描画ジョブを作成する"""
+    jobs = []
+    for row in correlations.itertuples(index=False):
+        x = pd.to_numeric(df[row.x], errors="coerce")
+        y = pd.to_numeric(df[row.y], errors="coerce")
+        both = x.notna() & y.notna()
+        jobs.append(make_job(draw_relplot, relplot_path(out_dir, stem, row.x, row.y),
+                             kwargs={"x": x[both].to_numpy(), "y": y[both].to_numpy(),
+                                     "x_col": row.x, "y_col": row.y, "corr": row.pearson_r},
+                             savefig={"dpi": 150, "bbox_inches": "tight"}))
+    return jobs
+
+
+def run(csv_path, pairs, out_dir, workers=None, plots=True, encoding="utf-8"):
+    """
+    列の組をまとめて処理する（CSV の読み込みと列名の解決は1回だけ）。
+
+    Returns:
+        pd.DataFrame: |r| の大きい順の相関係数の表（散布図のパスを含む）
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSVが見つかりません: {csv_path}")
+    header = pd.read_csv(csv_path, encoding=encoding, nrows=0).columns
+    resolved = resolve_columns(header, [spec for pair in pairs for spec in pair])
+    missing = [spec for spec, col in resolved.items() if col is None]
+    if missing:
+        raise KeyError(f"必要な列が見つかりません。候補: {missing} / 実列: {list(header)}")
+    column_pairs = list(dict.fromkeys((resolved[x], resolved[y]) for x, y in pairs if resolved[x] != resolved[y]))
+
+    # 使う列だけを読み込む
+    df = pd.read_csv(csv_path, encoding=encoding, usecols=sorted({c for pair in column_pairs for c in pair}))
+    correlations = pairwise_correlations(df, column_pairs)
+    correlations = correlations.sort_values("abs_r", ascending=False, na_position="last", kind="stable")
+
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    os.makedirs(out_dir, exist_ok=True)
+    correlations["output"] = None
+    if plots:
+        jobs = build_jobs(df, correlations, out_dir, stem)
+        correlations["output"] = render_figures(jobs, workers=workers)
+
+    summary_path = os.path.join(out_dir, f"{stem}_correlations.csv")
+    correlations.to_csv(summary_path, index=False, encoding="utf-8-sig")
+    print(f"相関係数の一覧を保存しました: {summary_path}（{len(correlations)} 組）")
+    return correlations.reset_index(drop=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="列の組の相関係数と散布図（seaborn.relplot）をまとめて作成する")
+    parser.add_argument("--csv", default=CSV_ABS_PATH, help="入力CSV")
+    parser.add_argument("--encoding", default="utf-8", help="入力CSVの文字コード")
+    parser.add_argument("--pairs", nargs="+", default=None,
+                        help=f'列の組 "x:y"（列名は候補を "{OPTION_SEPARATOR}" で区切って指定できる）')
+    parser.add_argument("--x", nargs="+", default=None, help="x の列（--y との直積）")
+    parser.add_argument("--y", nargs="+", default=None, help="y の列（--x との直積）")
+    parser.add_argument("--output-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "result"),
+                        help="結果出力ディレクトリ")
+    parser.add_argument("--workers", type=int, default=None, help="描画のワーカープロセス数")
+    parser.add_argument("--no-plots", action="store_true", help="散布図を作らず相関係数の一覧のみ出力する")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pairs = build_pairs(args.pairs, args.x, args.y)
+    correlations = run(args.csv, pairs, args.output_dir, workers=args.workers, plots=not args.no_plots,
+                       encoding=args.encoding)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(correlations[["x", "y", "n", "pearson_r"]].round(4).to_string(index=False))
 
 
 if __name__ == "__main__":
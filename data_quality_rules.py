@@ -0,0 +1,316 @@
+"""
+焼却施設データの品質チェックを宣言的なルールで一括検証するモジュール
+
+ルールは「違反条件」の式として一度だけ宣言し、数値配列に対する NumPy 演算として
+まとめて評価する。結果は 施設 × ルール の違反表として CSV に出力できる。
+変更された行のみを再検証するインクリメンタル検証にも対応する。
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+# 式の中で使う別名 → 元データの列名
+SURVEY_COLUMNS = {
+    'annual': '年間処理量_t/年度',
+    'capacity': '施設全体の処理能力_t/日',
+    'furnaces': '炉数',
+    'start_year': '使用開始年度',
+    'heat_spec': '余熱利用量（仕様値・公称値）_余熱利用量_MJ',
+    'heat_spec_ext': '余熱利用量（仕様値・公称値）_うち外部熱供給量_MJ',
+    'heat_actual': '余熱利用量（実績値）_余熱利用量_MJ',
+    'heat_actual_ext': '余熱利用量（実績値）_うち外部熱供給量_MJ',
+    'power_kw': '発電能力_発電能力_kW',
+    'efficiency': '発電能力_発電効率（仕様値・公称値）_％',
+    'generated': '発電能力_総発電量（実績値）_MWh',
+    'generated_ext': '発電能力_うち外部供給量（実績値）_MWh',
+    'sold': '余剰電力利用（売電）_売電量_MWh/年',
+    'comp_total': 'ごみ組成分析結果（乾ベース）_合計_％',
+    'comp_paper': 'ごみ組成分析結果（乾ベース）_紙・布類_％',
+    'comp_plastic': 'ごみ組成分析結果（乾ベース）_ﾋﾞﾆｰﾙ、合成樹脂、ｺﾞﾑ、皮革類_％',
+    'comp_wood': 'ごみ組成分析結果（乾ベース）_木、竹、わら類_％',
+    'comp_kitchen': 'ごみ組成分析結果（乾ベース）_ちゅう芥類_％',
+    'comp_incombustible': 'ごみ組成分析結果（乾ベース）_不燃物類_％',
+    'comp_other': 'ごみ組成分析結果（乾ベース）_その他_％',
+    'three_total': '三成分_合計_％',
+    'moisture': '三成分_水分_％',
+    'combustible': '三成分_可燃分_％',
+    'ash': '三成分_灰分_％',
+    'lcv_calc': '低位発熱量_(計算値)_kJ/kg',
+    'lcv_measured': '低位発熱量_(実測値)_kJ/kg',
+}
+
+# 各ルール: name（識別子）, description（表示名）, violation（違反条件の式）
+# 式は NaN を含む比較が False になるため、値が記載されている施設のみが判定される
+SURVEY_RULES = [
+    {
+        'name': 'annual_treatment_range',
+        'description': '年間処理量が負または100万t/年超',
+        'violation': '(annual < 0) | (annual > 1000000)',
+    },
+    {
+        'name': 'annual_exceeds_capacity',
+        'description': '年間処理量が処理能力×366日を超過',
+        'violation': '(capacity > 0) & (annual > capacity * 366)',
+    },
+    {
+        'name': 'capacity_furnace_consistency',
+        'description': '処理能力と炉数が不整合（炉数0以下、または1炉あたり1t/日未満・700t/日超）',
+        'violation': '(capacity > 0) & ((furnaces <= 0) | (capacity / furnaces < 1) | (capacity / furnaces > 700))',
+    },
+    {
+        'name': 'composition_sum',
+        'description': 'ごみ組成（乾ベース）の内訳合計が100%でない',
+        'violation': '(comp_total > 0) & (abs(comp_paper + comp_plastic + comp_wood + comp_kitchen'
+                     ' + comp_incombustible + comp_other - 100) > 1)',
+    },
+    {
+        'name': 'three_component_sum',
+        'description': '三成分（水分・可燃分・灰分）の合計が100%でない',
+        'violation': '(three_total > 0) & (abs(moisture + combustible + ash - 100) > 1)',
+    },
+    {
+        'name': 'lcv_measured_range',
+        'description': '低位発熱量（実測値）が1,000〜50,000 kJ/kgの範囲外',
+        'violation': '(lcv_measured != 0) & ((lcv_measured < 1000) | (lcv_measured > 50000))',
+    },
+    {
+        'name': 'lcv_calc_range',
+        'description': '低位発熱量（計算値）が1,000〜50,000 kJ/kgの範囲外',
+        'violation': '(lcv_calc != 0) & ((lcv_calc < 1000) | (lcv_calc > 50000))',
+    },
+    {
+        'name': 'sold_le_generated',
+        'description': '売電量が総発電量を超過',
+        'violation': 'sold > generated',
+    },
+    {
+        'name': 'power_external_le_generated',
+        'description': '発電の外部供給量が総発電量を超過',
+        'violation': 'generated_ext > generated',
+    },
+    {
+        'name': 'heat_external_le_actual',
+        'description': '外部熱供給量（実績値）が余熱利用量（実績値）を超過',
+        'violation': 'heat_actual_ext > heat_actual',
+    },
+    {
+        'name': 'heat_external_le_spec',
+        'description': '外部熱供給量（仕様値）が余熱利用量（仕様値）を超過',
+        'violation': 'heat_spec_ext > heat_spec',
+    },
+    {
+        'name': 'efficiency_range',
+        'description': '発電効率が0%以下または40%超',
+        'violation': '(efficiency <= 0) | (efficiency > 40)',
+    },
+    {
+        'name': 'generation_exceeds_capacity',
+        'description': '総発電量が発電能力×8,784時間を超過',
+        'violation': '(power_kw > 0) & (generated > power_kw * 8784 / 1000)',
+    },
+    {
+        'name': 'negative_amounts',
+        'description': '余熱利用量・発電量・売電量に負の値',
+        'violation': '(heat_actual < 0) | (heat_spec < 0) | (generated < 0) | (sold < 0)',
+    },
+]
+
+DEFAULT_KEY_COLUMNS = ['地方公共団体コード', '施設コード']
+FACILITY_COLUMNS = ['都道府県名', '地方公共団体名', '施設名称']
+
+_EVAL_NAMESPACE = {'__builtins__': {}, 'abs': np.abs, 'where': np.where, 'isnan': np.isnan}
+
+
+def compile_rules(rules):
+    """ルールの式をコンパイルし、式で使われる別名の一覧と合わせて返す"""
+    compiled = []
+    for rule in rules:
+        code = compile(rule['violation'], f"<rule {rule['name']}>", 'eval')
+        compiled.append({**rule, 'code': code, 'names': set(code.co_names) - set(_EVAL_NAMESPACE)})
+    return compiled
+
+
+def _column_arrays(df, names, columns):
+    """式で使う別名ごとに数値配列を一度だけ作成する"""
+    arrays = {}
+    for name in names:
+        col = columns.get(name, name)
+        if col in df.columns:
+            arrays[name] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+        else:
+            arrays[name] = np.full(len(df), np.nan)
+    return arrays
+
+
+def evaluate_rules(df, rules=SURVEY_RULES, columns=SURVEY_COLUMNS):
+    """
+    全ルールを一括評価し、違反マスクを返す。
+
+    Args:
+        df (DataFrame): 検証対象データ
+        rules (list): ルール定義（またはコンパイル済みルール）
+        columns (dict): 式の別名 → 列名（式で列名を直接使う場合は不要）
+
+    Returns:
+        DataFrame: 行 = df の行, 列 = ルール名 の真偽値（True が違反）
+    """
+    compiled = rules if rules and 'code' in rules[0] else compile_rules(rules)
+    names = set().union(*(rule['names'] for rule in compiled)) if compiled else set()
+    arrays = _column_arrays(df, names, columns)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        masks = {
+            rule['name']: np.broadcast_to(eval(rule['code'], _EVAL_NAMESPACE, arrays), (len(df),))
+            for rule in compiled
+        }
+    return pd.DataFrame(masks, index=df.index, dtype=bool)
+
+
+def evaluate_expression(df, expression, columns=SURVEY_COLUMNS):
+    """
+    ルールと同じ書式の式（別名は数値化した列）を評価し、真偽値のマスクを返す。
+
+    Args:
+        df (DataFrame): 対象データ
+        expression (str): 条件式（例: '(power_kw >= 4000) & (power_kw <= 6000)'）
+        columns (dict): 式の別名 → 列名
+
+    Returns:
+        ndarray: 行ごとの真偽値
+    """
+    code = compile(expression, '<expression>', 'eval')
+    arrays = _column_arrays(df, set(code.co_names) - set(_EVAL_NAMESPACE), columns)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.broadcast_to(np.asarray(eval(code, _EVAL_NAMESPACE, arrays), dtype=bool), (len(df),))
+
+
+def _row_keys(df, key_columns):
+    """行を識別するキー（キー列が無ければインデックス）"""
+    key_columns = [col for col in (key_columns or []) if col in df.columns]
+    if not key_columns:
+        return pd.Index(df.index.astype(str))
+    return pd.Index(df[key_columns].astype(str).agg('|'.join, axis=1))
+
+
+def _rules_signature(rules, columns):
+    text = '\n'.join(f"{r['name']}:{r['violation']}" for r in rules)
+    text += '\n' + repr(sorted(columns.items()))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def validate_incremental(df, state_path, rules=SURVEY_RULES, columns=SURVEY_COLUMNS,
+                         key_columns=DEFAULT_KEY_COLUMNS):
+    """
+    前回の検証結果を再利用し、内容が変わった行と新しい行のみを再検証する。
+
+    Args:
+        df (DataFrame): 検証対象データ
+        state_path (str): 行ハッシュと違反結果を保存するファイル
+        rules (list): ルール定義
+        columns (dict): 式の別名 → 列名
+        key_columns (list): 行を識別する列（複数年データでは年度列も含める）
+
+    Returns:
+        DataFrame: evaluate_rules と同じ形式の違反マスク
+        int: 再検証した行数
+    """
+    compiled = compile_rules(rules)
+    used_cols = sorted({columns.get(n, n) for rule in compiled for n in rule['names']} & set(df.columns))
+    keys = _row_keys(df, key_columns)
+    if keys.has_duplicates:
+        raise ValueError("キー列で行を一意に識別できません。key_columns に年度などの列を追加してください。")
+    row_hashes = pd.Series(pd.util.hash_pandas_object(df[used_cols], index=False).to_numpy(), index=keys)
+    signature = _rules_signature(rules, columns)
+
+    previous = None
+    if os.path.exists(state_path):
+        with open(state_path, 'rb') as f:
+            previous = pickle.load(f)
+        if previous.get('signature') != signature:
+            previous = None
+
+    if previous is None:
+        changed = np.ones(len(df), dtype=bool)
+    else:
+        old_hashes = previous['hashes'].reindex(keys)
+        changed = (old_hashes.to_numpy() != row_hashes.to_numpy()) | old_hashes.isnull().to_numpy()
+
+    result = pd.DataFrame(False, index=keys, columns=[r['name'] for r in compiled])
+    if previous is not None:
+        unchanged_keys = keys[~changed]
+        result.loc[unchanged_keys] = previous['violations'].loc[unchanged_keys].to_numpy()
+    if changed.any():
+        fresh = evaluate_rules(df.iloc[np.flatnonzero(changed)], compiled, columns)
+        result.iloc[np.flatnonzero(changed)] = fresh.to_numpy()
+
+    os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+    with open(state_path, 'wb') as f:
+        pickle.dump({'signature': signature, 'hashes': row_hashes, 'violations': result}, f)
+
+    result.index = df.index
+    return result, int(changed.sum())
+
+
+def build_violation_report(df, violations, rules=SURVEY_RULES, only_violations=True):
+    """施設 × ルール の違反表を作成する（列名はルールの表示名）"""
+    descriptions = {rule['name']: rule['description'] for rule in rules}
+    ids = df[[col for col in DEFAULT_KEY_COLUMNS + FACILITY_COLUMNS if col in df.columns]]
+    table = violations.rename(columns=descriptions)
+    report = pd.concat([ids, table], axis=1)
+    report['違反件数'] = violations.sum(axis=1).to_numpy()
+    if only_violations:
+        report = report[report['違反件数'] > 0]
+    return report
+
+
+def summarize_violations(violations, rules=SURVEY_RULES):
+    """ルールごとの違反施設数を返す"""
+    descriptions = {rule['name']: rule['description'] for rule in rules}
+    counts = violations.sum().rename(index=descriptions)
+    return counts.rename('違反施設数').rename_axis('ルール').reset_index()
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="焼却施設データの品質ルールを一括検証し、違反表をCSVに出力する")
+    p.add_argument("--input", default="2022_1焼却施設.csv", help="入力CSVのパス")
+    p.add_argument("--output", default="result/data_quality_violations.csv", help="違反表の出力パス")
+    p.add_argument(
+        "--state",
+        default=None,
+        help="インクリメンタル検証の状態ファイル。指定時は変更された行のみ再検証する",
+    )
+    p.add_argument(
+        "--key-columns",
+        nargs="+",
+        default=DEFAULT_KEY_COLUMNS,
+        help="行を識別する列（複数年データでは年度列を追加）",
+    )
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    df = pd.read_csv(args.input, encoding="utf-8-sig")
+
+    if args.state:
+        violations, n_checked = validate_incremental(df, args.state, key_columns=args.key_columns)
+        print(f"再検証した行数: {n_checked:,} / {len(df):,}")
+    else:
+        violations = evaluate_rules(df)
+
+    print("\n=== ルール別の違反施設数 ===")
+    print(summarize_violations(violations).to_string(index=False))
+
+    report = build_violation_report(df, violations)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    report.to_csv(args.output, index=False, encoding="utf-8-sig")
+    print(f"\n違反表を保存しました: {args.output}（{len(report):,} 施設）")
+
+
+if __name__ == "__main__":
+    main()
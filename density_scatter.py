@@ -0,0 +1,133 @@
+"""
+点数の多い散布図を 2 次元ヒストグラム（または六角形ビン）で描画するモジュール
+
+点数が閾値以下なら通常の散布図、閾値を超えたら NumPy で 2 次元に集計し、
+点ごとのアーティストの代わりに 1 枚の画像レイヤー（QuadMesh / AxesImage）として描画する。
+対数軸（年間発熱量など）の場合は log10 空間で等間隔にビンを切る。
+"""
+
+import numpy as np
+
+# この点数を超えたら集計表示に切り替える
+DENSITY_THRESHOLD = 5000
+DEFAULT_BINS = 120
+
+
+def should_aggregate(n_points, threshold=DENSITY_THRESHOLD):
+    """集計表示に切り替えるかどうか（threshold=None なら常に散布図）"""
+    return threshold is not None and n_points > threshold
+
+
+def _finite_xy(x, y, xlog=False, ylog=False):
+    """数値化して有限値（対数軸の場合は正の値）だけを残す"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    if xlog:
+        valid &= x > 0
+    if ylog:
+        valid &= y > 0
+    return x[valid], y[valid]
+
+
+def _edges(values, bins, log):
+    """ビン境界（対数軸の場合は log10 空間で等間隔）"""
+    if values.size == 0:
+        return np.linspace(0, 1, bins + 1)
+    v = np.log10(values) if log else values
+    lo, hi = v.min(), v.max()
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    edges = np.linspace(lo, hi, bins + 1)
+    return 10 ** edges if log else edges
+
+
+def bin_points(x, y, bins=DEFAULT_BINS, xlog=False, ylog=False):
+    """
+    点を 2 次元ヒストグラムに集計する。
+
+    Args:
+        x, y: 座標（Series / ndarray）
+        bins (int or tuple): ビン数（x, y 別に指定する場合はタプル）
+        xlog, ylog (bool): 対数軸として log10 空間で等間隔にビンを切る
+
+    Returns:
+        tuple: (counts[x, y], xedges, yedges)。境界は元の単位
+    """
+    x, y = _finite_xy(x, y, xlog, ylog)
+    nx, ny = (bins, bins) if np.isscalar(bins) else bins
+    xedges = _edges(x, nx, xlog)
+    yedges = _edges(y, ny, ylog)
+    # 対数軸でも log10 空間のインデックスで数えれば np.histogram2d と同じ結果になる
+    counts, _, _ = np.histogram2d(
+        np.log10(x) if xlog else x,
+        np.log10(y) if ylog else y,
+        bins=[np.log10(xedges) if xlog else xedges, np.log10(yedges) if ylog else yedges],
+    )
+    return counts, xedges, yedges
+
+
+def _single_color_cmap(color):
+    """白から指定色へのカラーマップ（カテゴリ色を保ったまま密度を表す）"""
+    from matplotlib.colors import LinearSegmentedColormap, to_rgba
+
+    return LinearSegmentedColormap.from_list('density', [to_rgba(color, 0.15), to_rgba(color, 1.0)])
+
+
+def density_scatter(ax, x, y, threshold=DENSITY_THRESHOLD, mode='hist2d', bins=DEFAULT_BINS,
+                    xlog=False, ylog=False, color=None, cmap=None, alpha=None, label=None,
+                    **scatter_kwargs):
+    """
+    散布図を描画する（点数が閾値を超える場合は密度表示）。
+
+    Args:
+        ax: 描画先の Axes
+        x, y: 座標
+        threshold (int): 集計表示に切り替える点数（None なら常に散布図）
+        mode (str): 'hist2d'（2 次元ヒストグラム）または 'hexbin'（六角形ビン）
+        bins (int or tuple): ビン数（hexbin の場合は x 方向の格子数）
+        xlog, ylog (bool): 軸を対数スケールにする
+        color: 散布図の色 / 密度表示のカラーマップの基準色
+        cmap: 密度表示のカラーマップ（指定時は color より優先）
+        alpha (float): 透明度
+        label (str): 凡例のラベル
+        **scatter_kwargs: 散布図の場合に ax.scatter へ渡す追加の引数
+
+    Returns:
+        描画したアーティスト（PathCollection / QuadMesh / AxesImage / PolyCollection）
+    """
+    from matplotlib.colors import LogNorm
+
+    n_points = len(x)
+    if not should_aggregate(n_points, threshold):
+        artist = ax.scatter(x, y, alpha=alpha, color=color, label=label, **scatter_kwargs)
+    else:
+        if cmap is None:
+            cmap = _single_color_cmap(color) if color is not None else 'viridis'
+        if mode == 'hexbin':
+            xv, yv = _finite_xy(x, y, xlog, ylog)
+            artist = ax.hexbin(xv, yv, gridsize=bins, mincnt=1, cmap=cmap, alpha=alpha, norm=LogNorm(),
+                               xscale='log' if xlog else 'linear', yscale='log' if ylog else 'linear')
+        elif mode == 'hist2d':
+            counts, xedges, yedges = bin_points(x, y, bins=bins, xlog=xlog, ylog=ylog)
+            counts = np.ma.masked_equal(counts.T, 0)
+            norm = LogNorm(vmin=1, vmax=max(counts.max(), 1)) if counts.count() else None
+            if xlog or ylog:
+                # 対数軸では画像のピクセルが等間隔にならないため QuadMesh で描画する
+                artist = ax.pcolormesh(xedges, yedges, counts, cmap=cmap, norm=norm, alpha=alpha,
+                                       shading='flat', rasterized=True)
+            else:
+                artist = ax.imshow(counts, extent=(xedges[0], xedges[-1], yedges[0], yedges[-1]),
+                                   origin='lower', aspect='auto', interpolation='nearest',
+                                   cmap=cmap, norm=norm, alpha=alpha)
+        else:
+            raise ValueError(f"未対応の mode です: {mode}")
+        # 凡例用に空の散布図を追加する（画像レイヤーは凡例に表示されないため）
+        if label is not None:
+            ax.scatter([], [], color=color, alpha=alpha, label=f'{label} (density, n={n_points})')
+
+    if xlog:
+        ax.set_xscale('log')
+    if ylog:
+        ax.set_yscale('log')
+    return artist
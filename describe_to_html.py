@@ -1,14 +1,163 @@
+import argparse
+import html as html_lib
 import os
 from datetime import datetime
 import pandas as pd
 
+import output_cache
+import streaming_stats
+import binning
+from binning import EFFICIENCY_BINS, bin_counts
+from streaming_stats import (
+    DEFAULT_CHUNKSIZE, DEFAULT_SAMPLE_SIZE, StreamingDescribe, iter_numeric_chunks, numeric_chunk, svg_histogram,
+)
+
+# 入力CSV（既定: リポジトリのデータ）
+# フルパスをベタ書き（必要に応じて書き換えてください）
+CSV_ABS_PATH = "/home/ubuntu/cur/program/Analyisis_incineration/神戸電鉄_乗降客数.csv"
+
+# 発電効率の列（インデックス40）
+EFFICIENCY_COLUMN_INDEX = 40
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="utf-8" />
+    <title>describe レポート</title>
+    <style>
+        body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Noto Sans JP', 'Hiragino Kaku Gothic ProN', 'Yu Gothic', Meiryo, Arial, sans-serif; margin: 24px; }}
+        h1 {{ margin-bottom: 8px; }}
+        .path {{ color: #666; font-size: 0.9em; margin-bottom: 24px; }}
+        table.data {{ border-collapse: collapse; width: 100%; margin: 12px 0; }}
+        table.data th, table.data td {{ border: 1px solid #ddd; padding: 6px 8px; text-align: right; }}
+        table.data th {{ background: #f7f7f7; text-align: center; }}
+        .note {{ color: #666; font-size: 0.9em; }}
+        .hist {{ display: inline-block; margin: 8px 16px 8px 0; vertical-align: top; }}
+        .hist h3 {{ font-size: 0.95em; margin: 4px 0; }}
+    </style>
+</head>
+<body>
+    <h1>describe レポート</h1>
+    <div class="path">CSV: {csv_path}</div>
+"""
+
+HTML_FOOT = """
+    <p class="note">{note}</p>
+</body>
+</html>
+"""
+
+
+def efficiency_section(col_name, sdesc, range_counts, n_valid, n_total):
+    """発電効率の詳細（統計量と範囲別分布）の HTML"""
+    bins_df = pd.DataFrame({
+        EFFICIENCY_BINS["name"]: EFFICIENCY_BINS["labels"],
+        "施設数": range_counts,
+    })
+    return f"""
+    <h2>発電効率の詳細 ({col_name})</h2>
+    <p>有効データ数: {n_valid} / 総行数: {n_total}</p>
+    {sdesc.to_frame(name=col_name).to_html(classes='data', border=0)}
+    <h3>範囲別分布</h3>
+    {bins_df.to_html(index=False, classes='data', border=0)}
+    """
+
+
+def build_report(csv_path, encoding="utf-8-sig"):
+    """CSV 全体を読み込んでレポートの HTML を作成する"""
+    df = pd.read_csv(csv_path, encoding=encoding)
+
+    # 数値化を試みる（数値型でない列だけ to_numeric）
+    df_num = numeric_chunk(df)
+
+    # describe（数値列のみ）
+    desc = df_num.describe().transpose()
+
+    # 特定列（発電効率: インデックス40）があれば個別の統計も出力
+    extra_html = ""
+    if df.shape[1] > EFFICIENCY_COLUMN_INDEX:
+        col_name = df.columns[EFFICIENCY_COLUMN_INDEX]
+        series_num = df_num.iloc[:, EFFICIENCY_COLUMN_INDEX]
+        valid = series_num.dropna()
+        if not valid.empty:
+            extra_html = efficiency_section(col_name, valid.describe(), bin_counts(valid, EFFICIENCY_BINS),
+                                            valid.size, series_num.size)
+
+    return (
+        HTML_HEAD.format(csv_path=html_lib.escape(csv_path))
+        + f"""
+    <h2>数値列の基本統計</h2>
+    {desc.to_html(classes='data', border=0)}
+
+    {extra_html}
+"""
+        + HTML_FOOT.format(note="本レポートは pandas.DataFrame.describe() に基づいて自動生成されています。")
+    )
+
+
+def write_streaming_report(csv_path, out_path, chunksize=DEFAULT_CHUNKSIZE, sample_size=DEFAULT_SAMPLE_SIZE,
+                           bins=20, encoding="utf-8-sig"):
+    """
+    CSV をチャンクごとに読み込んで統計量を逐次集計し、レポートを節ごとにファイルへ書き出す。
+
+    メモリ使用量はチャンク1つ分と「列数 × sample_size」に抑えられる。四分位数とヒストグラムは
+    有効値が sample_size 件を超える列ではサンプルからの推定値になる。
+    """
+    tmp_path = out_path + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(HTML_HEAD.format(csv_path=html_lib.escape(csv_path)))
+
+        acc = None
+        eff_col = None
+        eff_counts = 0
+        for chunk in iter_numeric_chunks(csv_path, chunksize=chunksize, encoding=encoding):
+            if acc is None:
+                acc = StreamingDescribe(chunk.columns, sample_size=sample_size)
+                if chunk.shape[1] > EFFICIENCY_COLUMN_INDEX:
+                    eff_col = chunk.columns[EFFICIENCY_COLUMN_INDEX]
+            acc.update(chunk)
+            if eff_col is not None:
+                eff_counts = eff_counts + bin_counts(chunk[eff_col], EFFICIENCY_BINS)
+        if acc is None:
+            raise ValueError(f"CSVにデータがありません: {csv_path}")
+
+        desc = acc.describe()
+        f.write(f"""
+    <h2>数値列の基本統計</h2>
+    <p>総行数: {acc.n_rows}</p>
+    {desc.to_html(classes='data', border=0)}
+""")
+
+        if eff_col is not None and desc.loc[eff_col, "count"] > 0:
+            f.write(efficiency_section(eff_col, desc.loc[eff_col], eff_counts,
+                                       int(desc.loc[eff_col, "count"]), acc.n_rows))
+
+        f.write("\n    <h2>列ごとの分布</h2>\n")
+        for col in acc.columns:
+            hist = acc.histogram(col, bins=bins)
+            if hist is None:
+                continue
+            note = "" if acc.is_exact(col) else "（サンプルからの推定）"
+            f.write(f'    <div class="hist"><h3>{html_lib.escape(str(col))}{note}</h3>{svg_histogram(*hist)}</div>\n')
+
+        f.write(HTML_FOOT.format(
+            note=f"本レポートは CSV を {chunksize} 行ずつ読み込んで逐次集計した統計量に基づいて自動生成されています。"
+                 f"四分位数とヒストグラムは有効値が {sample_size} 件を超える列ではサンプルからの推定値です。"
+        ))
+    os.replace(tmp_path, out_path)
+
 
 def main():
-    # 入力CSV（既定: リポジトリのデータ）
-    # フルパスをベタ書き（必要に応じて書き換えてください）
-    CSV_ABS_PATH = "/home/ubuntu/cur/program/Analyisis_incineration/神戸電鉄_乗降客数.csv"
+    parser = argparse.ArgumentParser(description="CSV の基本統計を HTML レポートにする")
+    parser.add_argument("csv_path", nargs="?", default=CSV_ABS_PATH, help="入力CSV")
+    parser.add_argument("--stream", action="store_true", help="チャンクごとに読み込んで逐次集計する（大きな CSV 向け）")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="逐次集計で一度に読み込む行数")
+    parser.add_argument("--sample-size", type=int, default=DEFAULT_SAMPLE_SIZE,
+                        help="四分位数・ヒストグラム用に列ごとに保持するサンプル数")
+    parser.add_argument("--encoding", default="utf-8-sig", help="CSVの文字コード")
+    args = parser.parse_args()
 
-    csv_path = CSV_ABS_PATH
+    csv_path = args.csv_path
 
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"CSVが見つかりません: {csv_path}")
@@ -16,6 +165,16 @@ def main():
     # 出力先
     out_dir = os.path.join(os.path.dirname(__file__), "result")
     os.makedirs(out_dir, exist_ok=True)
+    # 入力CSV・集計方法・このスクリプトが前回と同じなら、生成済みのHTMLを使う
+    params = {"stream": args.stream, "encoding": args.encoding}
+    if args.stream:
+        params.update(chunksize=args.chunksize, sample_size=args.sample_size)
+    cache_key = output_cache.compute_key(params=params, input_files=[csv_path], code=[__file__, streaming_stats, binning])
+    cached = output_cache.lookup(cache_key)
+    if cached:
+        print(f"変更がないため生成済みのHTMLを使用します: {cached[0]}")
+        return
+
     # 出力ファイル名: CSV名 + 日付時刻（重複回避）
     csv_base = os.path.basename(csv_path)
     csv_stem, _ = os.path.splitext(csv_base)
@@ -23,78 +182,13 @@ def main():
     out_filename = f"{csv_stem}_{ts}_describe.html"
     out_path = os.path.join(out_dir, out_filename)
 
-    # 読み込み
-    df = pd.read_csv(csv_path, encoding="utf-8")
-
-    # 数値化を試みる（列ごとに to_numeric）
-    df_num = df.apply(pd.to_numeric, errors="coerce")
-
-    # describe（数値列のみ）
-    desc = df_num.describe().transpose()
-
-    # 特定列（発電効率: インデックス40）があれば個別の統計も出力
-    extra_html = ""
-    if df.shape[1] > 40:
-        col_name = df.columns[40]
-        series_num = pd.to_numeric(df.iloc[:, 40], errors="coerce")
-        valid = series_num.dropna()
-        if not valid.empty:
-            sdesc = valid.describe()
-            # 範囲別分布
-            bins_count = {
-                "10%未満": (valid < 10).sum(),
-                "10-15%": ((valid >= 10) & (valid < 15)).sum(),
-                "15-20%": ((valid >= 15) & (valid < 20)).sum(),
-                "20-25%": ((valid >= 20) & (valid < 25)).sum(),
-                "25%以上": (valid >= 25).sum(),
-            }
-            bins_df = (
-                pd.Series(bins_count, name="施設数")
-                .rename_axis("発電効率の範囲")
-                .reset_index()
-            )
-
-            extra_html = f"""
-            <h2>発電効率の詳細 ({col_name})</h2>
-            <p>有効データ数: {valid.size} / 総行数: {series_num.size}</p>
-            {sdesc.to_frame(name=col_name).to_html(classes='data', border=0)}
-            <h3>範囲別分布</h3>
-            {bins_df.to_html(index=False, classes='data', border=0)}
-            """
-
-    # HTML組み立て
-    html = f"""
-    <!DOCTYPE html>
-    <html lang="ja">
-    <head>
-        <meta charset="utf-8" />
-        <title>describe レポート</title>
-        <style>
-            body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Noto Sans JP', 'Hiragino Kaku Gothic ProN', 'Yu Gothic', Meiryo, Arial, sans-serif; margin: 24px; }}
-            h1 {{ margin-bottom: 8px; }}
-            .path {{ color: #666; font-size: 0.9em; margin-bottom: 24px; }}
-            table.data {{ border-collapse: collapse; width: 100%; margin: 12px 0; }}
-            table.data th, table.data td {{ border: 1px solid #ddd; padding: 6px 8px; text-align: right; }}
-            table.data th {{ background: #f7f7f7; text-align: center; }}
-            .note {{ color: #666; font-size: 0.9em; }}
-        </style>
-    </head>
-    <body>
-        <h1>describe レポート</h1>
-        <div class="path">CSV: {csv_path}</div>
-
-        <h2>数値列の基本統計</h2>
-        {desc.to_html(classes='data', border=0)}
-
-        {extra_html}
-
-        <p class="note">本レポートは pandas.DataFrame.describe() に基づいて自動生成されています。</p>
-    </body>
-    </html>
-    """
-
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    if args.stream:
+        write_streaming_report(csv_path, out_path, chunksize=args.chunksize, sample_size=args.sample_size,
+                               encoding=args.encoding)
+    else:
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(build_report(csv_path, encoding=args.encoding))
+    output_cache.record(cache_key, [out_path], kind='html', source=csv_path)
 
     print(f"HTMLを書き出しました: {out_path}")
 
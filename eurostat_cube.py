@@ -0,0 +1,361 @@
+"""
+Eurostat の SDMX-CSV（linear 形式）を 次元 × 年 の配列（キューブ）として読み込む
+
+EU/env_wasmun_linear_2_0.csv（一般廃棄物の処理方法別の量）のような linear 形式は、1観測1行で
+各次元のコード列の隣にラベル列（'geo' と 'Geopolitical entity (reporting)' など）が並ぶ。
+ここでは各次元をコードのカテゴリとして読み込み、ラベルは次元ごとの辞書（コード → ラベル）に分け、
+観測値を wst_oper × unit × geo × TIME_PERIOD（ファイルの次元の順、年は最後）の NumPy 配列にする。
+値が1種類しかない次元（freq など）は軸にせず fixed に残す。
+
+作ったキューブは入力ファイルのハッシュをキーに .npz で保存し、次回からは CSV を解析しない。
+
+    cube = load_cube()
+    italy = cube.sel(wst_oper='DSP_I_RCV_E', unit='KG_HAB', geo='IT')   # 年の1次元
+    cube.sel(unit='KG_HAB').growth()                                     # 前年比
+    cube.sel(unit='KG_HAB').cagr(2013, 2023)                             # 年平均成長率
+
+    python eurostat_cube.py --operation DSP_I_RCV_E --unit KG_HAB --start 2013 --end 2023
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import output_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONFIG = {
+    'input_file': os.path.join(BASE_DIR, 'EU', 'env_wasmun_linear_2_0.csv'),
+    'encoding': 'utf-8',
+    # 作ったキューブの保存先（出力キャッシュの管理ファイルと同じディレクトリ）
+    'cache_dir': os.path.join(os.path.dirname(output_cache.DEFAULT_MANIFEST), 'eurostat'),
+}
+
+# SDMX-CSV の列（ラベル列は各列の直後にある）
+STRUCTURE_COLUMNS = ('STRUCTURE', 'STRUCTURE_ID', 'STRUCTURE_NAME')
+TIME_COLUMN = 'TIME_PERIOD'
+VALUE_COLUMN = 'OBS_VALUE'
+FLAG_COLUMN = 'OBS_FLAG'
+ATTRIBUTE_COLUMNS = (FLAG_COLUMN, 'CONF_STATUS')
+# 観測値がない要素のフラグの番号
+NO_FLAG = -1
+
+
+def split_columns(columns):
+    """
+    linear 形式の列を (次元のコード列, コード列 → ラベル列) に分ける。
+
+    STRUCTURE* の列の後は「コード列, ラベル列」の組が並ぶ（labels=both で書き出した場合）。
+    ラベル列のない（labels=none で書き出した）ファイルにも対応する。
+    """
+    columns = [c for c in columns if c not in STRUCTURE_COLUMNS]
+    codes = [c for c in columns if c == c.strip() and (c.islower() or c.isupper()) and ' ' not in c]
+    label_of = {}
+    for code in codes:
+        i = columns.index(code)
+        if i + 1 < len(columns) and columns[i + 1] not in codes:
+            label_of[code] = columns[i + 1]
+    dimensions = [c for c in codes if c not in (TIME_COLUMN, VALUE_COLUMN, *ATTRIBUTE_COLUMNS)]
+    return dimensions, label_of
+
+
+def read_linear(path, encoding='utf-8'):
+    """
+    linear 形式の CSV をコードの列だけの表とラベルの辞書にする。
+
+    Returns:
+        tuple: (観測の表（次元・属性はカテゴリ、TIME_PERIOD は整数、OBS_VALUE は float）,
+                ラベル（列 → {コード: ラベル}）, 次元のコード列のリスト)
+    """
+    header = pd.read_csv(path, encoding=encoding, nrows=0).columns
+    dimensions, label_of = split_columns(header)
+    attributes = [c for c in ATTRIBUTE_COLUMNS if c in header]
+    categorical = dimensions + attributes
+    # ラベル列も繰り返しが多いのでカテゴリとして読み込む（文字列の行ごとの実体を作らない）
+    label_columns = [label_of[c] for c in categorical if c in label_of]
+    df = pd.read_csv(path, encoding=encoding,
+                     usecols=[*categorical, *label_columns, TIME_COLUMN, VALUE_COLUMN],
+                     dtype={c: 'category' for c in [*categorical, *label_columns]})
+
+    labels = {}
+    for column in categorical:
+        if column in label_of:
+            pairs = df[[column, label_of[column]]].drop_duplicates().dropna(subset=[column])
+            labels[column] = dict(zip(pairs[column].astype(str), pairs[label_of[column]].astype(str)))
+        else:
+            labels[column] = {str(c): str(c) for c in df[column].cat.categories}
+    df = df.drop(columns=label_columns)
+    df[VALUE_COLUMN] = pd.to_numeric(df[VALUE_COLUMN], errors='coerce')
+    return df, labels, dimensions
+
+
+class Cube:
+    """
+    観測値の配列と軸（次元 → コードの配列）。
+
+    values は次元の順の float64 の配列（観測がない要素は NaN）、flags は同じ形の観測状態のフラグの
+    番号（flag_codes の添字、なければ NO_FLAG）。sel() で選んだ次元はスカラーなら軸から外れる。
+    """
+
+    def __init__(self, values, axes, labels, flags=None, flag_codes=(), fixed=None):
+        self.values = values
+        self.axes = dict(axes)
+        self.labels = labels
+        self.flags = flags if flags is not None else np.full(values.shape, NO_FLAG, dtype=np.int8)
+        self.flag_codes = list(flag_codes)
+        self.fixed = dict(fixed or {})
+
+    @property
+    def dims(self):
+        return list(self.axes)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __repr__(self):
+        axes = ' × '.join(f"{name}({len(codes)})" for name, codes in self.axes.items())
+        fixed = ', '.join(f"{k}={v}" for k, v in self.fixed.items())
+        return f"<Cube {axes}{' ' + fixed if fixed else ''}>"
+
+    def _positions(self, dim, selector):
+        """コード・ラベル（またはそれらのリスト）を軸の位置にする"""
+        codes = self.axes[dim]
+        lookup = {str(c): i for i, c in enumerate(codes)}
+        if dim != TIME_COLUMN:
+            by_label = {label: code for code, label in self.labels.get(dim, {}).items()}
+            lookup.update({label: lookup[code] for label, code in by_label.items() if code in lookup})
+        items = selector if isinstance(selector, (list, tuple, np.ndarray, pd.Index)) else [selector]
+        missing = [s for s in items if str(s) not in lookup]
+        if missing:
+            raise KeyError(f"{dim} にないコード: {', '.join(map(str, missing))}")
+        positions = np.array([lookup[str(s)] for s in items], dtype=np.intp)
+        return positions if items is selector else positions[0]
+
+    def sel(self, **selectors):
+        """
+        次元のコード（またはラベル）で選ぶ。スカラーで選んだ次元は軸から外れる。
+
+        例: cube.sel(unit='KG_HAB', geo=['IT', 'DE'], TIME_PERIOD=range(2013, 2024))
+        """
+        unknown = [dim for dim in selectors if dim not in self.axes]
+        if unknown:
+            raise KeyError(f"キューブにない次元: {', '.join(unknown)}（{', '.join(self.axes)}）")
+        index, axes, fixed = [], {}, dict(self.fixed)
+        for dim, codes in self.axes.items():
+            if dim not in selectors:
+                index.append(slice(None))
+                axes[dim] = codes
+                continue
+            selector = selectors[dim]
+            if isinstance(selector, range):
+                selector = list(selector)
+            positions = self._positions(dim, selector)
+            index.append(positions)
+            if np.ndim(positions) == 0:
+                fixed[dim] = codes[positions]
+            else:
+                axes[dim] = codes[positions]
+        # 配列での選択が複数の軸にまたがっても直積になるよう、軸ごとに順に選ぶ
+        values, flags = self.values, self.flags
+        axis = 0
+        for position in index:
+            if isinstance(position, slice):
+                axis += 1
+                continue
+            values = np.take(values, position, axis=axis)
+            flags = np.take(flags, position, axis=axis)
+            if np.ndim(position) > 0:
+                axis += 1
+        return Cube(values, axes, self.labels, flags, self.flag_codes, fixed)
+
+    def _time_axis(self):
+        if TIME_COLUMN not in self.axes:
+            raise ValueError(f"{TIME_COLUMN} の軸がありません（年をスカラーで選んでいます）")
+        return self.dims.index(TIME_COLUMN)
+
+    def growth(self, periods=1):
+        """
+        periods 年前からの増加率（値 / periods 年前の値 - 1）。年の軸は1年刻みなので位置の差が年の差になる。
+
+        periods 年前の値が 0 以下または欠損の要素は NaN。
+        """
+        axis = self._time_axis()
+        current = np.moveaxis(self.values, axis, -1)
+        previous = np.full_like(current, np.nan)
+        previous[..., periods:] = current[..., :-periods]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = current / np.where(previous > 0, previous, np.nan) - 1
+        return Cube(np.moveaxis(rate, -1, axis), self.axes, self.labels, fixed=self.fixed)
+
+    def cagr(self, start, end):
+        """
+        start 年から end 年までの年平均成長率（次元から年の軸を除いた配列）。
+
+        Returns:
+            Cube: 年の軸のないキューブ（どちらかの年の値が 0 以下または欠損の要素は NaN）
+        """
+        if end <= start:
+            raise ValueError(f"end は start より後の年にしてください: {start} → {end}")
+        first = self.sel(**{TIME_COLUMN: start}).values
+        last = self.sel(**{TIME_COLUMN: end}).values
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.where((first > 0) & (last >= 0), (last / first) ** (1.0 / (end - start)) - 1, np.nan)
+        axes = {dim: codes for dim, codes in self.axes.items() if dim != TIME_COLUMN}
+        return Cube(rate, axes, self.labels, fixed={**self.fixed, TIME_COLUMN: f"{start}-{end}"})
+
+    def share(self, dim, total):
+        """dim の各コードの値を total のコードの値で割った比（例: share('wst_oper', 'TRT')）"""
+        axis = self.dims.index(dim)
+        denominator = np.take(self.values, [self._positions(dim, total)], axis=axis)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = self.values / np.where(denominator > 0, denominator, np.nan)
+        return Cube(ratio, self.axes, self.labels, fixed=self.fixed)
+
+    def label(self, dim, code):
+        return self.labels.get(dim, {}).get(str(code), str(code))
+
+    def to_frame(self, columns=TIME_COLUMN, labels=False):
+        """
+        キューブを DataFrame にする。2次元なら columns の次元を列、もう一方を行にし、それ以外は long 形式。
+
+        Args:
+            labels (bool): 行・列にコードの代わりにラベルを使う
+        """
+        axes = {dim: [self.label(dim, c) for c in codes] if labels else list(codes)
+                for dim, codes in self.axes.items()}
+        if len(axes) == 2 and columns in axes:
+            (rows,) = [dim for dim in self.dims if dim != columns]
+            values = np.moveaxis(self.values, self.dims.index(columns), -1)
+            return pd.DataFrame(values, index=pd.Index(axes[rows], name=rows),
+                                columns=pd.Index(axes[columns], name=columns))
+        index = pd.MultiIndex.from_product(list(axes.values()), names=self.dims)
+        return pd.DataFrame({VALUE_COLUMN: self.values.reshape(-1)}, index=index)
+
+
+def build_cube(df, labels, dimensions):
+    """
+    観測の表を密な配列にする。年の軸は最小の年から最大の年まで1年刻み（観測のない年は NaN）。
+
+    Raises:
+        ValueError: 同じ次元の組み合わせの観測が複数ある場合
+    """
+    fixed = {dim: str(df[dim].cat.categories[0]) for dim in dimensions if len(df[dim].cat.categories) == 1}
+    dims = [dim for dim in dimensions if dim not in fixed]
+
+    axes, positions = {}, []
+    for dim in dims:
+        # カテゴリの順はコードの文字列順
+        axes[dim] = np.asarray(df[dim].cat.categories.astype(str), dtype=object)
+        positions.append(df[dim].cat.codes.to_numpy(dtype=np.intp))
+    years = df[TIME_COLUMN].to_numpy(dtype=np.int64)
+    axes[TIME_COLUMN] = np.arange(years.min(), years.max() + 1)
+    positions.append(years - years.min())
+
+    shape = tuple(len(codes) for codes in axes.values())
+    flat = np.ravel_multi_index(positions, shape)
+    if len(np.unique(flat)) != len(flat):
+        raise ValueError("同じ次元の組み合わせの観測が複数あります（次元の列の判定を確認してください）")
+    values = np.full(int(np.prod(shape)), np.nan)
+    values[flat] = df[VALUE_COLUMN].to_numpy(dtype=np.float64)
+
+    flags = np.full(values.shape, NO_FLAG, dtype=np.int8)
+    flag_codes = []
+    if FLAG_COLUMN in df.columns:
+        flag_codes = [str(c) for c in df[FLAG_COLUMN].cat.categories]
+        flags[flat] = df[FLAG_COLUMN].cat.codes.to_numpy(dtype=np.int8)
+    return Cube(values.reshape(shape), axes, labels, flags.reshape(shape), flag_codes, fixed)
+
+
+def _cache_path(path, config):
+    key = output_cache.compute_key(params={'file': os.path.basename(path)}, input_files=[path],
+                                   code=[split_columns, read_linear, build_cube])[:16]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(config['cache_dir'], f"{stem}_{key}.npz")
+
+
+def save_cube(cube, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    meta = {'dims': cube.dims, 'labels': cube.labels, 'flag_codes': cube.flag_codes, 'fixed': cube.fixed}
+    arrays = {f"axis_{i}": np.asarray(codes).astype(str if dim != TIME_COLUMN else np.int64)
+              for i, (dim, codes) in enumerate(cube.axes.items())}
+    part = path + '.part.npz'
+    np.savez(part, values=cube.values, flags=cube.flags, meta=np.array(json.dumps(meta, ensure_ascii=False)),
+             **arrays)
+    os.replace(part, path)
+
+
+def read_cube(path):
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        axes = {dim: data[f"axis_{i}"] if dim == TIME_COLUMN else data[f"axis_{i}"].astype(object)
+                for i, dim in enumerate(meta['dims'])}
+        return Cube(data['values'], axes, meta['labels'], data['flags'], meta['flag_codes'], meta['fixed'])
+
+
+def load_cube(path=None, config=CONFIG, cache=True):
+    """
+    linear 形式の CSV をキューブとして読み込む（保存したキューブがあれば CSV を解析しない）。
+
+    Args:
+        path (str): 入力CSV（省略時は config['input_file']）
+        cache (bool): 作ったキューブを保存・再利用する（OUTPUT_CACHE=0 でも無効）
+    """
+    path = path or config['input_file']
+    cache = cache and os.environ.get('OUTPUT_CACHE', '1') != '0'
+    cache_path = _cache_path(path, config) if cache else None
+    if cache_path and os.path.exists(cache_path):
+        return read_cube(cache_path)
+    cube = build_cube(*read_linear(path, config['encoding']))
+    if cache_path:
+        save_cube(cube, cache_path)
+    return cube
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Eurostat の linear 形式の CSV をキューブにし、国別の推移と成長率を出す')
+    parser.add_argument('--input', default=CONFIG['input_file'], help='linear 形式の CSV')
+    parser.add_argument('--operation', default='DSP_I_RCV_E', help='処理方法のコード（wst_oper）')
+    parser.add_argument('--unit', default='KG_HAB', help='単位のコード（unit）')
+    parser.add_argument('--geo', nargs='+', default=None, help='国・地域のコード（省略時は全て）')
+    parser.add_argument('--start', type=int, default=None, help='年平均成長率の開始年')
+    parser.add_argument('--end', type=int, default=None, help='年平均成長率の終了年')
+    parser.add_argument('--output', default=None, help='国 × 年の表を書き出す CSV')
+    parser.add_argument('--no-cache', action='store_true', help='保存したキューブを使わない')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cube = load_cube(args.input, cache=not args.no_cache)
+    print(f"{cube}（{time.perf_counter() - start:.3f} 秒）")
+
+    selectors = {'wst_oper': args.operation, 'unit': args.unit}
+    if args.geo:
+        selectors['geo'] = args.geo
+    selected = cube.sel(**selectors)
+    table = selected.to_frame()
+    years = selected.axes[TIME_COLUMN]
+    observed = years[~np.all(np.isnan(selected.values), axis=0)]
+    first = args.start or int(observed.min())
+    last = args.end or int(observed.max())
+    table['年平均成長率'] = selected.cagr(first, last).values
+    table.insert(0, '国・地域', [cube.label('geo', code) for code in table.index])
+
+    print(f"\n=== {cube.label('wst_oper', args.operation)} [{cube.label('unit', args.unit)}]、"
+          f"年平均成長率 {first}–{last} ===")
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(table[['国・地域', first, last, '年平均成長率']].sort_values('年平均成長率').round(3))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        table.to_csv(args.output, encoding='utf-8-sig')
+        print(f"\n国 × 年の表を {args.output} に出力しました。")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+条件に合う施設の一覧を作成するモジュール
+
+抽出条件はデータ品質ルールと同じ書式の式（別名は数値化した列）で指定し、並べ替えた一覧を
+テキスト・CSV・HTML で出力する。テキストの整形は列ごとにまとめて文字列化・連結するため、
+施設数が数千件になっても行ごとの Python の処理は発生しない。
+"""
+
+import argparse
+import re
+import string
+
+import numpy as np
+import pandas as pd
+
+from data_quality_rules import SURVEY_COLUMNS, evaluate_expression
+
+# 式・テンプレートで使える別名（数値列は data_quality_rules と共通）
+LISTING_COLUMNS = {
+    **SURVEY_COLUMNS,
+    'prefecture': '都道府県名',
+    'municipality': '地方公共団体名',
+    'facility_name': '施設名称',
+}
+
+# 表示の書式（例: '2d', ',.0f', '.2f'）を列ごとにまとめて処理するための正規表現
+_NUMBER_SPEC = re.compile(r'^(?P<width>\d+)?(?P<comma>,)?(?:\.(?P<prec>\d+))?(?P<type>[fd])$')
+
+
+def query_facilities(df, expression=None, sort_by=None, ascending=True, columns=LISTING_COLUMNS):
+    """
+    条件に合う施設を抽出して並べ替える。
+
+    Args:
+        df (DataFrame): 施設データ
+        expression (str): 抽出条件の式（省略時は全施設）
+        sort_by (str): 並べ替えの別名または列名（数値化できる列は数値として並べ替える）
+        ascending (bool): 昇順に並べ替える
+        columns (dict): 式の別名 → 列名
+
+    Returns:
+        DataFrame: 抽出・並べ替えた施設データ（元の列のまま）
+    """
+    result = df[evaluate_expression(df, expression, columns)] if expression else df
+    if sort_by:
+        col = columns.get(sort_by, sort_by)
+        numeric = pd.to_numeric(result[col], errors='coerce')
+        key = numeric if numeric.notna().any() else result[col].astype(str)
+        # 欠損値は末尾に置く（DataFrame.sort_values と同じ並び）
+        order = key.reset_index(drop=True).sort_values(ascending=ascending, na_position='last').index
+        result = result.iloc[order]
+    return result
+
+
+def format_values(values, spec=''):
+    """
+    値の列をまとめて文字列にする（str.format の書式と同じ表示）。
+
+    数値の書式（幅・桁区切り・小数点以下桁数・f/d）は NumPy でまとめて処理し、
+    それ以外の書式のみ値ごとに str.format を使う。
+    """
+    values = pd.Series(values)
+    if not spec:
+        return values.astype(str).reset_index(drop=True)
+    m = _NUMBER_SPEC.match(spec)
+    if m is None:
+        return values.map(('{:' + spec + '}').format).reset_index(drop=True)
+
+    numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+    if m['type'] == 'd':
+        text = np.char.mod('%d', np.nan_to_num(numbers).astype(np.int64))
+        text = np.where(np.isnan(numbers), 'nan', text)
+    else:
+        text = np.char.mod(f"%.{m['prec'] or 6}f", numbers)
+    text = pd.Series(text, dtype=object)
+
+    if m['comma']:
+        parts = text.str.extract(r'^(?P<sign>-?)(?P<int>\d+)(?P<frac>\.\d+)?$')
+        grouped = parts['int'].str.replace(r'(?<=\d)(?=(?:\d{3})+$)', ',', regex=True)
+        text = text.where(parts['int'].isna(), parts['sign'] + grouped + parts['frac'].fillna(''))
+    if m['width']:
+        text = text.str.rjust(int(m['width']))
+    return text
+
+
+def format_listing(df, template, columns=LISTING_COLUMNS, start=1):
+    """
+    施設ごとにテンプレートを埋めた文字列を作成する。
+
+    Args:
+        df (DataFrame): query_facilities の結果
+        template (str): str.format 形式のテンプレート。{no} は通し番号、その他は別名または列名
+        columns (dict): 別名 → 列名
+        start (int): 通し番号の開始値
+
+    Returns:
+        Series: 施設ごとの文字列
+    """
+    result = pd.Series([''] * len(df), dtype=object)
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            result = result + literal
+        if field is None:
+            continue
+        if field == 'no':
+            values = pd.Series(np.arange(start, start + len(df)))
+        else:
+            values = df[columns.get(field, field)]
+        result = result + format_values(values, spec)
+    return result
+
+
+def listing_text(df, template, columns=LISTING_COLUMNS, start=1):
+    """テンプレートを埋めた一覧のテキスト（施設の間は空行で区切る）"""
+    return '\n'.join(format_listing(df, template, columns, start))
+
+
+def listing_table(df, fields, columns=LISTING_COLUMNS):
+    """CSV・HTML 用の一覧表（fields は別名または列名のリスト。見出しは元の列名）"""
+    table = df[[columns.get(f, f) for f in fields]].reset_index(drop=True)
+    table.index = table.index + 1
+    table.index.name = 'No.'
+    return table
+
+
+def write_listing(df, path, fields=None, template=None, columns=LISTING_COLUMNS):
+    """
+    一覧をファイルに書き出す（拡張子 .csv / .html は表、それ以外はテンプレートのテキスト）。
+    """
+    if path.lower().endswith(('.csv', '.html', '.htm')):
+        table = listing_table(df, fields or list(df.columns), columns)
+        if path.lower().endswith('.csv'):
+            table.to_csv(path, encoding='utf-8-sig')
+        else:
+            table.to_html(path, classes='data', border=0)
+    else:
+        if template is None:
+            raise ValueError("テキストで出力する場合はテンプレートを指定してください")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(listing_text(df, template, columns) + '\n')
+    print(f"施設一覧 ({len(df)} 件) を書き出しました: {path}")
+
+
+DEFAULT_TEMPLATE = '{no:2d}. {prefecture} {municipality} - {facility_name}\n'
+DEFAULT_FIELDS = ['prefecture', 'municipality', 'facility_name']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='条件に合う施設の一覧を作成する')
+    parser.add_argument('--input', required=True, help='施設データのCSV')
+    parser.add_argument('--where', help="抽出条件の式（例: '(power_kw >= 4000) & (power_kw <= 6000)'）")
+    parser.add_argument('--sort', help='並べ替えの別名または列名')
+    parser.add_argument('--desc', action='store_true', help='降順に並べ替える')
+    parser.add_argument('--fields', nargs='+', default=DEFAULT_FIELDS, help='CSV・HTML に出力する別名または列名')
+    parser.add_argument('--template', default=DEFAULT_TEMPLATE, help='テキスト出力のテンプレート')
+    parser.add_argument('--output', help='出力先（.csv / .html / .txt。省略時は画面に表示）')
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input, encoding='utf-8-sig')
+    facilities = query_facilities(df, args.where, sort_by=args.sort, ascending=not args.desc)
+    # コマンドラインで指定した '\n' を改行として扱う
+    template = args.template.replace('\\n', '\n')
+    if args.output:
+        write_listing(facilities, args.output, fields=args.fields, template=template)
+    else:
+        print(f"該当施設数: {len(facilities)}")
+        print(listing_text(facilities, template))
+
+
+if __name__ == '__main__':
+    main()
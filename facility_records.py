@@ -0,0 +1,485 @@
+"""
+施設ごとの調査記録（EU/ロンバルディア_info/*.json）の読み込み・検証・統合
+
+施設ごとの JSON（facility / contractors / process / performance などの入れ子）を
+'process.generator_rating.rated_power_MW' のような「.」区切りの項目に平坦化し、1ファイル1行の
+型付きの表にする。キーの末尾の '*' は必須項目の印で、平坦化するときに取り除き、値がない（null・空の
+リスト）必須項目は検証結果に記録する。年度付きの実績（performance_2022、annual_performance + year）は
+'performance.*' にそろえる。
+
+同じ施設について複数の出典（Busto_Arsizio_gemini.json と Busto_Arsizio_gpt.json のように、
+ファイル名の末尾が出典名）がある場合は項目ごとに1つの値を選び、どの出典の値を採ったか・値が
+食い違っていたかを項目ごとの出典の表に残す。
+
+ファイルが多い場合（数百施設）に備えて、JSON の解析は複数のプロセスで並列に行い、平坦化した結果は
+索引ファイルに保存する。2回目以降はサイズと更新時刻が変わったファイルだけを解析し直す。
+
+    python facility_records.py                              # EU/ロンバルディア_info を読み込む
+    python facility_records.py path/to/json_dir --output-dir result --strict
+"""
+
+import argparse
+import json
+import os
+import pickle
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import output_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONFIG = {
+    'info_dir': os.path.join(BASE_DIR, 'EU', 'ロンバルディア_info'),
+    'output_dir': os.path.join(BASE_DIR, 'result', 'facility_records'),
+    # 平坦化した結果の索引（出力キャッシュの管理ファイルと同じディレクトリ）
+    'index_file': os.path.join(os.path.dirname(output_cache.DEFAULT_MANIFEST), 'facility_records_index.pkl'),
+    # 解析するワーカープロセス数（None は CPU 数、1 以下は現在のプロセスで順に解析）
+    'workers': None,
+    # ファイル数がこれ未満なら並列にしない（プロセスの起動の方が遅い）
+    'parallel_min_files': 64,
+    # 値が食い違う場合、まず data_quality.last_compiled_date が新しい出典を、同じ日付なら先に書いた出典を採る
+    'source_priority': ['default', 'gpt', 'gemini'],
+    # 数値の相対差がこれ以下なら同じ値とみなす（kWh と MWh の丸めの違いなど）
+    'numeric_rtol': 1e-3,
+}
+
+REQUIRED_MARK = '*'
+DEFAULT_SOURCE = 'default'
+# ファイル名の末尾の出典名（Busto_Arsizio_gpt.json → 施設キー 'Busto_Arsizio'、出典 'gpt'）
+SOURCE_SUFFIX = re.compile(r'^(?P<plant>.+?)_(?P<source>gemini|gpt|claude|manual)$', re.IGNORECASE)
+# 年度付きの実績のキー（'*' を除いた後）
+PERFORMANCE_KEY = re.compile(r'^(?:performance_(?P<year>\d{4})|annual_performance)$')
+# リストの値を1つの文字列にするときの区切り
+LIST_SEPARATOR = '; '
+
+# ファイルに '*' がなくても必須とする項目（キーが丸ごとない場合も検出するため）
+REQUIRED_FIELDS = [
+    'facility.name',
+    'facility.location.address',
+    'facility.location.municipality',
+    'facility.owner',
+    'facility.operator',
+    'process.incineration_type',
+    'process.authorized_waste_throughput.total_tpd',
+    'performance.year',
+    'performance.waste_incinerated_tonnes',
+    'performance.electricity_generated.mwh',
+    'data_quality.last_compiled_date',
+]
+
+# 型付きの表の数値の列（ここにない項目は文字列）
+NUMERIC_FIELDS = {
+    'facility.location.coordinates.lat': 'float64',
+    'facility.location.coordinates.lon': 'float64',
+    'process.authorized_waste_throughput.total_tph': 'float64',
+    'process.authorized_waste_throughput.total_tpd': 'float64',
+    'process.generator_rating.apparent_power_MVA': 'float64',
+    'process.generator_rating.rated_power_MW': 'float64',
+    'performance.year': 'Int64',
+    'performance.waste_incinerated_tonnes': 'float64',
+    'performance.electricity_generated.mwh': 'float64',
+    'performance.electricity_generated.kwh': 'float64',
+    'performance.heat_supplied.mwh': 'float64',
+    'performance.heat_supplied.gj': 'float64',
+    'performance.avg_operational_assumption.utilization_factor': 'float64',
+    'performance.avg_operational_assumption.operating_hours_per_year': 'float64',
+    'performance.avg_operational_assumption.implied_daily_throughput_tpd': 'float64',
+    'performance.avg_operational_assumption.energy_efficiency_R1': 'float64',
+    'construction_total_cost.amount': 'float64',
+    'construction_total_cost.year_of_cost': 'Int64',
+    'construction_total_cost.confidence': 'float64',
+    'data_quality.primary_year_of_stats': 'Int64',
+    'references.count': 'Int64',
+}
+DATE_FIELDS = ['data_quality.last_compiled_date']
+
+# 表の先頭に置く識別用の列
+KEY_COLUMNS = ['施設キー', '出典', 'ファイル']
+
+
+def split_source(path):
+    """ファイル名から (施設キー, 出典) を求める"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = SOURCE_SUFFIX.match(stem)
+    if match:
+        return match['plant'], match['source'].lower()
+    return stem, DEFAULT_SOURCE
+
+
+def normalize_record(record):
+    """
+    出典による書き方の違いをそろえる（'*' の付いたキーはそのまま）。
+
+    'performance_2022' / 'annual_performance' は 'performance' にし、年度はキーの数字か
+    'year'（整数、または {'primary': 年度, 'notes': [...]}）から 'year' と 'year_notes' に入れる。
+    """
+    out = {}
+    for key, value in record.items():
+        match = PERFORMANCE_KEY.match(key.rstrip(REQUIRED_MARK))
+        if match and isinstance(value, dict):
+            value = dict(value)
+            year = value.pop('year', None)
+            if isinstance(year, dict):
+                value['year_notes'] = year.get('notes')
+                year = year.get('primary')
+            value['year'] = int(match['year']) if match['year'] else year
+            key = 'performance' + (REQUIRED_MARK if key.endswith(REQUIRED_MARK) else '')
+        out[key] = value
+    return out
+
+
+def flatten_record(record, prefix=''):
+    """
+    入れ子の記録を「.」区切りの項目に平坦化する。
+
+    Returns:
+        tuple: (項目 → 値, 必須の印が付いた項目の集合)
+            リストの値は LIST_SEPARATOR で連結した文字列、空のリストは None。
+            キーの途中に '*' がある場合（'process*' の下など）は末端の項目に '*' がある場合のみ必須とする。
+    """
+    values, required_fields = {}, set()
+    for key, value in record.items():
+        name = key.rstrip(REQUIRED_MARK)
+        is_required = key.endswith(REQUIRED_MARK)
+        path = f"{prefix}{name}"
+        if isinstance(value, dict):
+            child_values, child_required = flatten_record(value, f"{path}.")
+            values.update(child_values)
+            required_fields |= child_required
+            continue
+        if isinstance(value, list):
+            value = LIST_SEPARATOR.join(str(v) for v in value if v is not None) or None
+        values[path] = value
+        if is_required:
+            required_fields.add(path)
+    return values, required_fields
+
+
+def parse_file(path):
+    """
+    JSON ファイルを1つ読み込み、平坦化する（ワーカープロセスで実行する）。
+
+    Returns:
+        dict: values（項目 → 値）, required（必須の項目）, references（参考文献のリスト）, error
+    """
+    plant, source = split_source(path)
+    parsed = {'path': os.path.abspath(path), 'plant': plant, 'source': source,
+              'values': {}, 'required': set(), 'references': [], 'error': None}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+    except (OSError, ValueError) as e:
+        parsed['error'] = f"{type(e).__name__}: {e}"
+        return parsed
+    if not isinstance(record, dict):
+        parsed['error'] = "最上位が JSON のオブジェクトではありません"
+        return parsed
+
+    record = normalize_record(record)
+    # 参考文献は施設の項目ではなく別の表にする（件数と ID のみ項目に残す）
+    references = next((record.pop(k) for k in ('references*', 'references') if k in record), None) or []
+    references = [flatten_record(r)[0] for r in references if isinstance(r, dict)]
+    values, required = flatten_record(record)
+    values['references.count'] = len(references)
+    values['references.ids'] = LIST_SEPARATOR.join(str(r.get('id')) for r in references) or None
+    parsed.update(values=values, required=required, references=references)
+    return parsed
+
+
+def _index_signature():
+    """索引を作ったコードのバージョン（平坦化の方法が変わったら索引を作り直す）"""
+    return output_cache.code_version(normalize_record, flatten_record, parse_file)
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _parse_files(paths, workers, min_files):
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers <= 1 or len(paths) < min_files:
+        return [parse_file(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(parse_file, paths, chunksize=max(1, len(paths) // (workers * 4))))
+
+
+def load_records(paths, config=CONFIG, index_file=None):
+    """
+    JSON ファイルを解析する（索引にあり、サイズと更新時刻が同じファイルは解析しない）。
+
+    Args:
+        paths (list): JSON ファイル
+        index_file (str): 平坦化した結果の索引（None は config['index_file']、'' は索引を使わない）
+
+    Returns:
+        tuple: (parse_file() の結果のリスト（paths の順）, 解析し直したファイル数)
+    """
+    index_file = config['index_file'] if index_file is None else index_file
+    signature = _index_signature()
+    entries = {}
+    if index_file and os.path.exists(index_file):
+        with open(index_file, 'rb') as f:
+            index = pickle.load(f)
+        if index.get('signature') == signature:
+            entries = index['entries']
+
+    paths = [os.path.abspath(p) for p in paths]
+    stats = {path: _file_stat(path) for path in paths}
+    stale = [path for path in paths if entries.get(path, {}).get('stat') != stats[path]]
+    if stale:
+        for parsed in _parse_files(stale, config['workers'], config['parallel_min_files']):
+            entries[parsed['path']] = {'stat': stats[parsed['path']], 'parsed': parsed}
+
+    if index_file and stale:
+        # 今回のファイルにないものも残す（別のディレクトリの索引を共有できるように）
+        os.makedirs(os.path.dirname(os.path.abspath(index_file)), exist_ok=True)
+        part = index_file + '.part'
+        with open(part, 'wb') as f:
+            pickle.dump({'signature': signature, 'entries': entries}, f)
+        os.replace(part, index_file)
+    return [entries[path]['parsed'] for path in paths], len(stale)
+
+
+def find_files(info_dir):
+    """ディレクトリ（サブディレクトリを含む）の JSON ファイル"""
+    found = []
+    for root, _, files in os.walk(info_dir):
+        found += [os.path.join(root, name) for name in files if name.lower().endswith('.json')]
+    return sorted(found)
+
+
+def _typed(df):
+    """数値・日付の項目を型付きにし、それ以外を文字列にする"""
+    for column in df.columns:
+        if column in KEY_COLUMNS:
+            df[column] = df[column].astype('string')
+        elif column in NUMERIC_FIELDS:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(NUMERIC_FIELDS[column])
+        elif column in DATE_FIELDS:
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+        else:
+            df[column] = df[column].astype('string')
+    return df
+
+
+def records_frame(parsed_list):
+    """
+    解析結果を1ファイル1行の型付きの表にする（読み込めなかったファイルは含めない）。
+
+    Returns:
+        pd.DataFrame: KEY_COLUMNS と平坦化した項目の列
+    """
+    rows = [{'施設キー': p['plant'], '出典': p['source'], 'ファイル': os.path.basename(p['path']), **p['values']}
+            for p in parsed_list if p['error'] is None]
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return pd.DataFrame(columns=KEY_COLUMNS)
+    fields = sorted(c for c in df.columns if c not in KEY_COLUMNS)
+    return _typed(df[KEY_COLUMNS + fields])
+
+
+def references_frame(parsed_list):
+    """参考文献の表（1文献1行。cites は LIST_SEPARATOR で連結した文字列）"""
+    rows = [{'施設キー': p['plant'], '出典': p['source'], 'ファイル': os.path.basename(p['path']), **ref}
+            for p in parsed_list for ref in p['references']]
+    return pd.DataFrame(rows, columns=None if rows else KEY_COLUMNS)
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _is_number(value):
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def validate_records(parsed_list):
+    """
+    必須項目と数値の項目を検証する。
+
+    問題の種類:
+        読み込めない: JSON として読み込めない
+        必須項目がない: REQUIRED_FIELDS の項目のキーがない
+        必須項目が空: '*' の付いた項目、または REQUIRED_FIELDS の項目が null・空文字・空のリスト
+        数値ではない: NUMERIC_FIELDS の項目が数値に変換できない
+
+    Returns:
+        pd.DataFrame: 施設キー, 出典, ファイル, 項目, 問題, 値（問題がなければ空の表）
+    """
+    issues = []
+    for p in parsed_list:
+        ids = {'施設キー': p['plant'], '出典': p['source'], 'ファイル': os.path.basename(p['path'])}
+        if p['error'] is not None:
+            issues.append({**ids, '項目': '', '問題': '読み込めない', '値': p['error']})
+            continue
+        values = p['values']
+        for field in sorted(set(REQUIRED_FIELDS) | p['required']):
+            if field not in values:
+                issues.append({**ids, '項目': field, '問題': '必須項目がない', '値': None})
+            elif _is_empty(values[field]):
+                issues.append({**ids, '項目': field, '問題': '必須項目が空', '値': None})
+        for field in NUMERIC_FIELDS:
+            value = values.get(field)
+            if _is_empty(value) or isinstance(value, bool):
+                continue
+            if not _is_number(value):
+                issues.append({**ids, '項目': field, '問題': '数値ではない', '値': str(value)})
+    return pd.DataFrame(issues, columns=[*KEY_COLUMNS, '項目', '問題', '値'])
+
+
+def _same_value(a, b, rtol):
+    if isinstance(a, (int, float, np.number)) and isinstance(b, (int, float, np.number)):
+        return bool(np.isclose(float(a), float(b), rtol=rtol, atol=0.0))
+    if isinstance(a, pd.Timestamp) or isinstance(b, pd.Timestamp):
+        return a == b
+    return ' '.join(str(a).split()).casefold() == ' '.join(str(b).split()).casefold()
+
+
+def _source_order(records, priority):
+    """施設ごとに、値が食い違う場合に優先する出典の順に並べた行の位置（更新日が新しい順、同じなら priority の順）"""
+    rank = {name: i for i, name in enumerate(priority)}
+    compiled = records.get('data_quality.last_compiled_date', pd.Series(pd.NaT, index=records.index))
+    order = pd.DataFrame({
+        'plant': records['施設キー'].to_numpy(),
+        'compiled': compiled.fillna(pd.Timestamp.min).to_numpy(),
+        'rank': records['出典'].map(lambda s: rank.get(s, len(rank))).to_numpy(),
+        'file': records['ファイル'].to_numpy(),
+    })
+    return order.sort_values(['plant', 'compiled', 'rank', 'file'], ascending=[True, False, True, True]).index
+
+
+def reconcile_records(records, config=CONFIG):
+    """
+    同じ施設の複数の出典を項目ごとに1つの値にまとめる。
+
+    値のある出典が1つならその値、全ての出典の値が一致すれば（数値は numeric_rtol 以内）優先する出典の値、
+    食い違えば優先する出典（_source_order()）の値を採る。
+
+    Args:
+        records (pd.DataFrame): records_frame() の表
+
+    Returns:
+        tuple: (施設ごとの表（施設キー, 出典数, 出典 と各項目）,
+                項目ごとの出典の表（施設キー, 項目, 値, 採用した出典, 一致した出典, 食い違い, 他の値）)
+    """
+    fields = [c for c in records.columns if c not in KEY_COLUMNS]
+    ordered = records.iloc[_source_order(records, config['source_priority'])]
+    plants = ordered['施設キー'].to_numpy(dtype=object)
+    sources = ordered['出典'].to_numpy(dtype=object)
+    # 施設ごとの行の範囲（DataFrame の groupby より、列を配列にして範囲で切り出す方が速い）
+    starts = np.flatnonzero(np.r_[True, plants[1:] != plants[:-1]]) if len(plants) else np.array([], dtype=int)
+    ends = np.r_[starts[1:], len(plants)]
+    arrays = {field: ordered[field].to_numpy(dtype=object) for field in fields}
+
+    rows, provenance = [], []
+    for start, end in zip(starts, ends):
+        plant = plants[start]
+        row = {'施設キー': plant, '出典数': end - start, '出典': LIST_SEPARATOR.join(sources[start:end])}
+        for field in fields:
+            candidates = [(sources[i], arrays[field][i]) for i in range(start, end) if not pd.isna(arrays[field][i])]
+            if not candidates:
+                row[field] = None
+                continue
+            chosen_source, chosen = candidates[0]
+            same = [_same_value(v, chosen, config['numeric_rtol']) for _, v in candidates]
+            others = [(s, v) for (s, v), agrees in zip(candidates, same) if not agrees]
+            row[field] = chosen
+            provenance.append({
+                '施設キー': plant,
+                '項目': field,
+                '値': str(chosen),
+                '採用した出典': chosen_source,
+                '一致した出典': LIST_SEPARATOR.join(s for (s, _), agrees in zip(candidates, same) if agrees),
+                '食い違い': bool(others),
+                '他の値': LIST_SEPARATOR.join(f"{s}={v}" for s, v in others) or None,
+            })
+        rows.append(row)
+
+    reconciled = pd.DataFrame(rows, columns=['施設キー', '出典数', '出典', *fields])
+    for field in fields:
+        reconciled[field] = reconciled[field].astype(records[field].dtype)
+    reconciled['出典数'] = reconciled['出典数'].astype('int64')
+    reconciled[['施設キー', '出典']] = reconciled[['施設キー', '出典']].astype('string')
+    provenance = pd.DataFrame(provenance, columns=['施設キー', '項目', '値', '採用した出典', '一致した出典',
+                                                   '食い違い', '他の値'])
+    return reconciled, provenance
+
+
+def load_facility_records(info_dir=None, config=CONFIG, index_file=None):
+    """
+    ディレクトリの JSON を読み込み、検証して施設ごとにまとめる。
+
+    Returns:
+        dict: records（1ファイル1行）, reconciled（1施設1行）, provenance, issues, references,
+              files（読み込んだファイル）, reparsed（解析し直したファイル数）
+    """
+    files = find_files(info_dir or config['info_dir'])
+    if not files:
+        raise FileNotFoundError(f"JSON ファイルがありません: {info_dir or config['info_dir']}")
+    parsed_list, reparsed = load_records(files, config, index_file)
+    records = records_frame(parsed_list)
+    reconciled, provenance = reconcile_records(records, config)
+    return {
+        'records': records,
+        'reconciled': reconciled,
+        'provenance': provenance,
+        'issues': validate_records(parsed_list),
+        'references': references_frame(parsed_list),
+        'files': files,
+        'reparsed': reparsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='施設ごとの調査記録（JSON）を平坦化・検証し、出典をまとめる')
+    parser.add_argument('info_dir', nargs='?', default=CONFIG['info_dir'], help='JSON ファイルのディレクトリ')
+    parser.add_argument('--output-dir', default=CONFIG['output_dir'], help='出力先')
+    parser.add_argument('--workers', type=int, default=CONFIG['workers'], help='解析するワーカープロセス数')
+    parser.add_argument('--no-index', action='store_true', help='平坦化した結果の索引を使わない')
+    parser.add_argument('--strict', action='store_true', help='検証で問題があれば終了コード 1 で終了する')
+    args = parser.parse_args()
+
+    from result_store import store_dir_for, write_result
+
+    config = {**CONFIG, 'workers': args.workers}
+    loaded = load_facility_records(args.info_dir, config, index_file='' if args.no_index else None)
+    print(f"{len(loaded['files'])} ファイルを読み込みました（解析し直したファイル: {loaded['reparsed']}）")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    entry = write_result(loaded['reconciled'], 'facility_records',
+                         params={'source_priority': config['source_priority'],
+                                 'numeric_rtol': config['numeric_rtol']},
+                         input_files=loaded['files'], code=[parse_file, reconcile_records],
+                         store_dir=store_dir_for(args.output_dir),
+                         csv_path=os.path.join(args.output_dir, 'facility_records.csv'))
+    print(f"施設ごとの表を {entry['path']} に保存しました（{len(loaded['reconciled'])} 施設）")
+    for name in ('records', 'provenance', 'issues', 'references'):
+        path = os.path.join(args.output_dir, f"facility_records_{name}.csv")
+        loaded[name].to_csv(path, index=False, encoding='utf-8-sig')
+        print(f"CSV を {path} に出力しました。")
+
+    issues, provenance = loaded['issues'], loaded['provenance']
+    conflicts = provenance[provenance['食い違い']]
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200,
+                           'display.max_colwidth', 60):
+        print(f"\n=== 検証（問題 {len(issues)} 件） ===")
+        if not issues.empty:
+            print(issues.groupby(['問題', '項目']).size().rename('件数').to_string())
+        print(f"\n=== 出典の食い違い（{len(conflicts)} 項目） ===")
+        if not conflicts.empty:
+            print(conflicts[['施設キー', '項目', '値', '採用した出典', '他の値']].to_string(index=False))
+    return 1 if args.strict and not issues.empty else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
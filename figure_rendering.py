@@ -0,0 +1,155 @@
+"""
+図の描画ジョブをプロセスプールで並列に描画・保存するモジュール
+
+各プロットスクリプトは Figure を返す描画関数（モジュールレベルの関数）と引数をジョブとして登録し、
+render_figures() に渡す。ワーカーは Agg バックエンドでフォントとスタイルを一度だけ初期化し、
+以降のジョブではそれを使い回す。
+"""
+
+import inspect
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+import jp_font
+import output_cache
+from instrumentation import stage
+from jp_font import apply_japanese_font
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 全ての図の見た目に影響するモジュール（ワーカーの初期化とフォントの解決）
+RENDER_CODE = [os.path.abspath(__file__), os.path.abspath(jp_font.__file__)]
+
+# 各スクリプト共通のスタイル（日本語フォントの適用後に反映。ジョブごとの 'rc' で上書き可能）
+DEFAULT_STYLE = {
+    'font.size': 12,
+    'axes.unicode_minus': False,
+}
+
+_worker_initialized = False
+
+
+def make_job(draw, output, kwargs=None, savefig=None, rc=None):
+    """
+    描画ジョブを作成する。
+
+    Args:
+        draw (callable): matplotlib.figure.Figure を返すモジュールレベルの描画関数
+        output (str): 保存先のパス
+        kwargs (dict): 描画関数に渡す引数（プロセス間で受け渡すため pickle 可能であること）
+        savefig (dict): Figure.savefig に渡す引数（dpi, bbox_inches など）
+        rc (dict): このジョブだけに適用する rcParams
+    """
+    return {
+        'draw': draw,
+        'output': output,
+        'kwargs': kwargs or {},
+        'savefig': savefig or {},
+        'rc': rc or {},
+    }
+
+
+def init_worker(style=None):
+    """ワーカーの初期化: Agg バックエンドの選択とフォント・スタイルの設定を一度だけ行う"""
+    global _worker_initialized
+    if _worker_initialized:
+        return
+    matplotlib.use('Agg')
+    apply_japanese_font()
+    matplotlib.rcParams.update(DEFAULT_STYLE if style is None else style)
+    _worker_initialized = True
+
+
+def render_job(job):
+    """ジョブを1件描画して保存し、保存先のパスを返す"""
+    import matplotlib.pyplot as plt
+
+    with matplotlib.rc_context(job['rc']):
+        fig = job['draw'](**job['kwargs'])
+        out_dir = os.path.dirname(job['output'])
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        fig.savefig(job['output'], **job['savefig'])
+    plt.close(fig)
+    return job['output']
+
+
+def draw_code(draw):
+    """
+    描画関数の出力に影響するソースファイル（RENDER_CODE、描画関数のモジュール、
+    そのモジュールが import しているこのリポジトリのモジュール。density_scatter など）
+    """
+    files = list(RENDER_CODE)
+    module = sys.modules.get(getattr(draw, '__module__', None))
+    for value in [draw, *(vars(module).values() if module is not None else [])]:
+        if not (inspect.ismodule(value) or inspect.isfunction(value) or inspect.isclass(value)):
+            continue
+        try:
+            path = inspect.getsourcefile(value)
+        except TypeError:  # 組み込みのモジュールなど
+            continue
+        if path and os.path.dirname(os.path.abspath(path)) == BASE_DIR:
+            files.append(os.path.abspath(path))
+    return sorted(set(files))
+
+
+def job_cache_key(job, style=None):
+    """ジョブの引数・保存設定・描画関数と関係するモジュールのコードから出力のキャッシュキーを計算する"""
+    return output_cache.compute_key(
+        data=job['kwargs'],
+        params={'output': job['output'], 'savefig': job['savefig'], 'rc': job['rc'], 'style': style},
+        code=draw_code(job['draw']),
+    )
+
+
+def render_figures(jobs, workers=None, style=None, cache=True):
+    """
+    描画ジョブをまとめて描画する。
+
+    Args:
+        jobs (list): make_job で作成したジョブのリスト
+        workers (int): ワーカープロセス数（None は CPU 数、1 以下は現在のプロセスで順に描画）
+        style (dict): ワーカー初期化時に適用する rcParams（省略時は DEFAULT_STYLE）
+        cache (bool): 入力データ・引数・コードが前回と同じ図は再描画しない
+
+    Returns:
+        list: 図のパス（ジョブの順。キャッシュにより省略した図も含む）
+    """
+    if not jobs:
+        return []
+
+    keys = [job_cache_key(job, style) if cache else None for job in jobs]
+    fresh = output_cache.fresh_flags([(key, [job['output']]) for key, job in zip(keys, jobs)])
+    pending = [i for i, is_fresh in enumerate(fresh) if not is_fresh]
+    for i in sorted(set(range(len(jobs))) - set(pending)):
+        print(f"変更がないため描画を省略しました: {jobs[i]['output']}")
+    if not pending:
+        return [job['output'] for job in jobs]
+
+    with stage('render', rows=len(pending)):
+        rendered = _render_pending([jobs[i] for i in pending], workers, style)
+    for path in rendered:
+        print(f"グラフを保存しました: {path}")
+    output_cache.record_many([(keys[i], [path], {'kind': 'figure'})
+                              for i, path in zip(pending, rendered) if keys[i] is not None])
+    return [job['output'] for job in jobs]
+
+
+def _render_pending(jobs, workers, style):
+    """キャッシュにない図を描画する"""
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+
+    if workers <= 1:
+        init_worker(style)
+        paths = [render_job(job) for job in jobs]
+    else:
+        # fork 後の matplotlib の状態を引き継がないよう spawn でワーカーを起動する
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=init_worker, initargs=(style,)) as executor:
+            paths = list(executor.map(render_job, jobs))
+    return paths
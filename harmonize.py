@@ -0,0 +1,348 @@
+"""
+日本と欧州の焼却施設データを共通の施設スキーマにそろえる
+
+日本（一般廃棄物処理実態調査 2022_1焼却施設.csv）とロンバルディア州（EU/ロンバルディア_プロット用_modified_1.0.csv）の
+列を、処理能力 t/日・年間処理量 t・発電能力 MW・総発電量 MWh・外部熱供給量 MWh・低位発熱量・使用開始年度・
+炉型式の共通の列に対応づける。単位は列ごとにまとめて（ベクトル演算で）換算し、発電利用率・設備利用率・
+R1 係数の推定値などの指標は全ての出典で同じ式で計算する。
+
+共通の列名は日本の分析の結果（power_generation_analysis.py など）と同じにしてあるため、
+plot_power_generation.build_jobs() などの日本の分析をそのまま国をまたいで実行できる。
+
+    python harmonize.py --output-dir result
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONFIG = {
+    'jp_file': os.path.join(BASE_DIR, '2022_1焼却施設.csv'),
+    'jp_encoding': 'utf-8-sig',
+    'jp_year': 2022,
+    'lombardia_file': os.path.join(BASE_DIR, 'EU', 'ロンバルディア_プロット用_modified_1.0.csv'),
+    'lombardia_encoding': 'utf-8',
+    'output_dir': os.path.join(BASE_DIR, 'result'),
+    'lcv_use_estimate': True,
+}
+
+# 共通の施設スキーマ（列名 → 説明）
+COMMON_COLUMNS = {
+    '出典': 'データの出典',
+    '国': '国',
+    '地域': '都道府県・州',
+    '自治体': '地方公共団体・自治体',
+    '施設名称': '施設名称',
+    '実績年度': '実績値の年度',
+    '処理能力_t_per_day': '施設全体の処理能力 [t/日]',
+    '年間処理量_t': '年間処理量 [t/年]',
+    '発電能力_MW': '発電能力（発電機定格出力） [MW]',
+    '総発電量_MWh': '総発電量（実績値） [MWh/年]',
+    '余熱利用量_MWh': '余熱利用量（実績値、場内利用を含む） [MWh/年]',
+    '外部熱供給量_MWh': '外部熱供給量（実績値） [MWh/年]',
+    '低位発熱量_kJ_per_kg': '低位発熱量 [kJ/kg]',
+    '発電効率_公称': '発電効率（仕様値・公称値、0〜1）',
+    'R1係数_報告値': 'R1 係数（公表値）',
+    '使用開始年度': '使用開始年度',
+    '炉型式': '炉型式（共通の区分）',
+    '炉型式_原表記': '炉型式（元データの表記）',
+    # 以下は harmonize_frame() で計算する指標
+    '年間発熱量_MJ': '年間処理量 × 低位発熱量 [MJ/年]',
+    '発電利用率': '総発電量 / 年間発熱量（発電端の実績効率）',
+    '設備利用率': '総発電量 / (発電能力 × 8760 h)',
+    '外部熱供給率': '外部熱供給量 / 年間発熱量',
+    'R1係数_推定値': 'R1 係数の推定値（全ての出典で同じ式）',
+}
+
+# harmonize_frame() で計算する指標の列
+INDICATOR_COLUMNS = ('年間発熱量_MJ', '発電利用率', '設備利用率', '外部熱供給率', 'R1係数_推定値')
+
+# 単位 → 基準単位への係数（同じ次元の単位どうしで換算する）
+UNIT_FACTORS = {
+    # エネルギー（基準: MJ）
+    'MJ': 1.0, 'GJ': 1_000.0, 'kWh': 3.6, 'MWh': 3_600.0, 'GWh': 3_600_000.0,
+    # 電力（基準: kW）
+    'kW': 1.0, 'MW': 1_000.0,
+    # 質量（基準: t）
+    't': 1.0, 'kt': 1_000.0,
+    # 発熱量（基準: kJ/kg）
+    'kJ/kg': 1.0, 'MJ/kg': 1_000.0, 'kcal/kg': 4.1868,
+    # 比率（基準: 0〜1）
+    'ratio': 1.0, '%': 0.01,
+}
+UNIT_DIMENSIONS = {
+    'MJ': 'energy', 'GJ': 'energy', 'kWh': 'energy', 'MWh': 'energy', 'GWh': 'energy',
+    'kW': 'power', 'MW': 'power',
+    't': 'mass', 'kt': 'mass',
+    'kJ/kg': 'lcv', 'MJ/kg': 'lcv', 'kcal/kg': 'lcv',
+    'ratio': 'ratio', '%': 'ratio',
+}
+
+# 共通の列 → 単位（数値の列のみ）
+COMMON_UNITS = {
+    '処理能力_t_per_day': 't',
+    '年間処理量_t': 't',
+    '発電能力_MW': 'MW',
+    '総発電量_MWh': 'MWh',
+    '余熱利用量_MWh': 'MWh',
+    '外部熱供給量_MWh': 'MWh',
+    '低位発熱量_kJ_per_kg': 'kJ/kg',
+    '発電効率_公称': 'ratio',
+    'R1係数_報告値': 'ratio',
+    '実績年度': None,
+    '使用開始年度': None,
+}
+
+# 国名の表記 → 共通の国名（日本語。英語・イタリア語の国名と ISO 3166-1 のコードにも対応し、大文字・小文字は区別しない）
+COUNTRY_NAMES = {
+    '日本': '日本', 'japan': '日本', 'jp': '日本', 'jpn': '日本',
+    'イタリア': 'イタリア', 'italy': 'イタリア', 'italia': 'イタリア', 'it': 'イタリア', 'ita': 'イタリア',
+}
+
+# 炉型式の共通の区分（上から順に、元の表記に含まれる語で判定する。英語・イタリア語の表記にも対応）
+FURNACE_TYPES = [
+    ('ガス化溶融', r'シャフト|ガス化|gasific|gassific|shaft'),
+    ('流動床式', r'流動床|fluidi[sz]ed|fluid bed|letto fluido'),
+    ('回転式', r'回転|rotary|rotativ|tamburo'),
+    ('固定床式', r'固定床|fixed bed|letto fisso'),
+    ('ストーカ式', r'ストーカ|grate|griglia|stoker'),
+]
+FURNACE_OTHER = 'その他'
+
+# R1 係数の推定に使う係数（廃棄物枠組み指令 附属書 II: 電力 2.6、外部供給熱 1.1、0.97 は放熱損失）
+R1_ELECTRICITY_FACTOR = 2.6
+R1_EXTERNAL_HEAT_FACTOR = 1.1
+R1_INTERNAL_HEAT_FACTOR = 1.0
+R1_LOSS_FACTOR = 0.97
+
+# 出典ごとの列の対応（共通の列 → 元の列名、または (元の列名, 単位)）
+JP_SPEC = {
+    '地域': '都道府県名',
+    '自治体': '地方公共団体名',
+    '施設名称': '施設名称',
+    '処理能力_t_per_day': ('施設全体の処理能力_t/日', 't'),
+    '年間処理量_t': ('年間処理量_t/年度', 't'),
+    '発電能力_MW': ('発電能力_発電能力_kW', 'kW'),
+    '総発電量_MWh': ('発電能力_総発電量（実績値）_MWh', 'MWh'),
+    '余熱利用量_MWh': ('余熱利用量（実績値）_余熱利用量_MJ', 'MJ'),
+    '外部熱供給量_MWh': ('余熱利用量（実績値）_うち外部熱供給量_MJ', 'MJ'),
+    '発電効率_公称': ('発電能力_発電効率（仕様値・公称値）_％', '%'),
+    '使用開始年度': '使用開始年度',
+    '炉型式_原表記': '処理方式',
+}
+
+LOMBARDIA_SPEC = {
+    '国': '国',
+    '地域': '州',
+    '自治体': '自治体',
+    '施設名称': '焼却場名',
+    '実績年度': '実績年度',
+    '処理能力_t_per_day': ('処理能力(t/day)', 't'),
+    '年間処理量_t': ('年間処理量(t/year)', 't'),
+    '発電能力_MW': ('発電機定格容量(MW)', 'MW'),
+    '総発電量_MWh': ('発電量実績(MWh/year)', 'MWh'),
+    '外部熱供給量_MWh': ('熱供給量実績(MWh/year)', 'MWh'),
+    '低位発熱量_kJ_per_kg': ('低位発熱量(KJ/kg)', 'kJ/kg'),
+    'R1係数_報告値': ('R1係数', 'ratio'),
+}
+
+
+def convert_units(values, from_unit, to_unit):
+    """
+    数値の列の単位を換算する（列全体を1回の乗算で換算する）。
+
+    Args:
+        values (pd.Series): 換算する値（数値に変換できない値は NaN）
+        from_unit (str): 元の単位（UNIT_FACTORS のキー）
+        to_unit (str): 換算後の単位
+    """
+    if UNIT_DIMENSIONS[from_unit] != UNIT_DIMENSIONS[to_unit]:
+        raise ValueError(f"次元の異なる単位は換算できません: {from_unit} → {to_unit}")
+    values = pd.to_numeric(values, errors='coerce')
+    if from_unit == to_unit:
+        return values
+    return values * (UNIT_FACTORS[from_unit] / UNIT_FACTORS[to_unit])
+
+
+def classify_furnace(labels):
+    """元の炉型式の表記を共通の区分にする（表記がなければ NaN）"""
+    labels = labels.astype('string').str.lower()
+    conditions = [labels.str.contains(pattern, regex=True, na=False) for _, pattern in FURNACE_TYPES]
+    classified = np.select(conditions, [name for name, _ in FURNACE_TYPES], default=FURNACE_OTHER)
+    return pd.Series(classified, index=labels.index, dtype=object).where(labels.notna())
+
+
+def normalize_country(values):
+    """国名の表記を COUNTRY_NAMES の共通の国名にそろえる（対応のない表記は前後の空白を除いてそのまま）"""
+    values = pd.Series(values, dtype='string').str.strip()
+    return values.str.lower().map(COUNTRY_NAMES).fillna(values).to_numpy(dtype=object)
+
+
+def map_columns(df, spec, source, defaults=None):
+    """
+    元のデータの列を共通の施設スキーマの列に対応づける（単位は COMMON_UNITS に換算する）。
+
+    Args:
+        df (pd.DataFrame): 元のデータ
+        spec (dict): 共通の列 → 元の列名、または (元の列名, 単位)
+        source (str): 出典の名前（'出典' 列の値）
+        defaults (dict): spec にない共通の列に入れる定数（例: {'国': '日本'}）
+
+    '国' 列は normalize_country() で共通の国名（日本語）にそろえる。
+    """
+    columns = {}
+    for name in COMMON_COLUMNS:
+        mapping = spec.get(name)
+        if mapping is None:
+            columns[name] = (defaults or {}).get(name, np.nan)
+            continue
+        column, unit = mapping if isinstance(mapping, tuple) else (mapping, None)
+        if column not in df.columns:
+            raise KeyError(f"{source}: 列がありません: {column}")
+        if unit is not None:
+            columns[name] = convert_units(df[column], unit, COMMON_UNITS[name]).to_numpy()
+        elif name in COMMON_UNITS:
+            columns[name] = pd.to_numeric(df[column], errors='coerce').to_numpy()
+        else:
+            columns[name] = df[column].to_numpy()
+    out = pd.DataFrame(columns, index=df.index)
+    # 出典ごとに異なる国名の表記（'Italy' と既定値の '日本' など）をそろえ、国ごとの集計を同じ表記で行う
+    out['国'] = normalize_country(out['国'])
+    out['出典'] = source
+    return out
+
+
+def add_indicators(df):
+    """
+    共通の列から指標（年間発熱量・発電利用率・設備利用率・外部熱供給率・R1 係数の推定値）を計算する。
+
+    分母が 0 以下または欠損の行は NaN にする。R1 係数の推定値は、追加燃料・外部からのエネルギーの
+    輸入を 0、余熱利用量が不明な場合は外部熱供給量のみとして計算する。
+    """
+    throughput = df['年間処理量_t'].where(df['年間処理量_t'] > 0)
+    lcv = df['低位発熱量_kJ_per_kg'].where(df['低位発熱量_kJ_per_kg'] > 0)
+    rated_power = df['発電能力_MW'].where(df['発電能力_MW'] > 0)
+
+    # kJ/kg = MJ/t
+    annual_heat_mj = throughput * lcv
+    generation_mj = convert_units(df['総発電量_MWh'], 'MWh', 'MJ')
+    external_heat_mj = convert_units(df['外部熱供給量_MWh'], 'MWh', 'MJ')
+    internal_heat_mj = (convert_units(df['余熱利用量_MWh'], 'MWh', 'MJ') - external_heat_mj.fillna(0)).clip(lower=0)
+
+    df['年間発熱量_MJ'] = annual_heat_mj
+    df['発電利用率'] = generation_mj / annual_heat_mj
+    df['設備利用率'] = df['総発電量_MWh'] / (rated_power * 8760)
+    df['外部熱供給率'] = external_heat_mj / annual_heat_mj
+    produced = (R1_ELECTRICITY_FACTOR * generation_mj.fillna(0)
+                + R1_EXTERNAL_HEAT_FACTOR * external_heat_mj.fillna(0)
+                + R1_INTERNAL_HEAT_FACTOR * internal_heat_mj.fillna(0))
+    df['R1係数_推定値'] = produced / (R1_LOSS_FACTOR * annual_heat_mj)
+    return df
+
+
+def harmonize_jp(df, config=CONFIG):
+    """日本の一般廃棄物処理実態調査（焼却施設）を共通の施設スキーマにする"""
+    from lcv_estimation import select_low_heat_value
+
+    out = map_columns(df, JP_SPEC, 'JP', defaults={'国': '日本', '実績年度': config['jp_year']})
+    # 低位発熱量は日本の分析と同じ選び方（実測値 → 計算値 → 三成分からの推定値）
+    out['低位発熱量_kJ_per_kg'] = select_low_heat_value(df, use_estimate=config['lcv_use_estimate'])['低位発熱量']
+    return out
+
+
+def harmonize_lombardia(df, config=CONFIG):
+    """ロンバルディア州の焼却施設一覧を共通の施設スキーマにする"""
+    return map_columns(df, LOMBARDIA_SPEC, 'Lombardia')
+
+
+def harmonize_frame(frames):
+    """
+    出典ごとに共通の施設スキーマにしたデータを1つにまとめ、指標を計算する。
+
+    Args:
+        frames (list): map_columns() などで作った DataFrame
+
+    Returns:
+        pd.DataFrame: COMMON_COLUMNS の列を持つ施設一覧（数値の列は float、文字列の列は string）
+    """
+    df = pd.concat(frames, ignore_index=True)
+    df['炉型式'] = classify_furnace(df['炉型式_原表記'])
+    df = add_indicators(df)
+    for name in COMMON_COLUMNS:
+        if name in COMMON_UNITS or name in INDICATOR_COLUMNS:
+            df[name] = df[name].astype('float64')
+        else:
+            df[name] = df[name].astype('string')
+    return df[list(COMMON_COLUMNS)]
+
+
+def load_harmonized(config=CONFIG):
+    """
+    設定の入力ファイルを読み込み、共通の施設スキーマの施設一覧を作る（ないファイルは読み込まない）。
+
+    Returns:
+        tuple: (施設一覧, 読み込んだ入力ファイルのリスト)
+    """
+    frames, inputs = [], []
+    loaders = [
+        ('jp_file', 'jp_encoding', harmonize_jp),
+        ('lombardia_file', 'lombardia_encoding', harmonize_lombardia),
+    ]
+    for file_key, encoding_key, harmonize in loaders:
+        path = config.get(file_key)
+        if not path or not os.path.exists(path):
+            print(f"入力ファイルがないため省略します: {path}")
+            continue
+        frames.append(harmonize(pd.read_csv(path, encoding=config[encoding_key]), config))
+        inputs.append(path)
+    if not frames:
+        raise FileNotFoundError("入力ファイルが1つもありません")
+    return harmonize_frame(frames), inputs
+
+
+def summarize_by_country(df):
+    """国ごとの施設数と主な指標の中央値"""
+    return df.groupby('国', sort=False).agg(
+        施設数=('施設名称', 'size'),
+        処理能力_中央値=('処理能力_t_per_day', 'median'),
+        発電能力_MW_中央値=('発電能力_MW', 'median'),
+        発電利用率_中央値=('発電利用率', 'median'),
+        設備利用率_中央値=('設備利用率', 'median'),
+        R1係数_推定値_中央値=('R1係数_推定値', 'median'),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='日本と欧州の焼却施設データを共通の施設スキーマにそろえる')
+    parser.add_argument('--jp', default=CONFIG['jp_file'], help='日本の焼却施設データ（CSV）')
+    parser.add_argument('--lombardia', default=CONFIG['lombardia_file'], help='ロンバルディア州の施設一覧（CSV）')
+    parser.add_argument('--output-dir', default=CONFIG['output_dir'], help='出力先')
+    parser.add_argument('--no-csv', action='store_true', help='CSV を書き出さない（結果の保存先のみ）')
+    args = parser.parse_args()
+
+    from result_store import store_dir_for, write_result
+
+    config = {**CONFIG, 'jp_file': args.jp, 'lombardia_file': args.lombardia, 'output_dir': args.output_dir}
+    df, inputs = load_harmonized(config)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    csv_path = None if args.no_csv else os.path.join(args.output_dir, 'facilities_harmonized.csv')
+    entry = write_result(df, 'facilities_harmonized',
+                         params={'jp_year': config['jp_year'], 'lcv_use_estimate': config['lcv_use_estimate']},
+                         input_files=inputs, code=[map_columns, add_indicators, harmonize_jp, harmonize_lombardia],
+                         store_dir=store_dir_for(args.output_dir), csv_path=csv_path)
+    print(f"共通スキーマの施設一覧を {entry['path']} に保存しました（{len(df)} 件）")
+    if csv_path:
+        print(f"CSV を {csv_path} に出力しました。")
+
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print("\n=== 国ごとの集計 ===")
+        print(summarize_by_country(df).round(3))
+
+
+if __name__ == '__main__':
+    main()
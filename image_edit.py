@@ -1,6 +1,70 @@
+import argparse
+import fnmatch
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
 from PIL import Image, ImageDraw, ImageFont
 
-def add_text_to_image(image_path, font_path, output_path):
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')
+
+# 元のグラフ（生産および売却GWhの推移）用のテキストと描画位置
+# キー: text, pos (テキスト描画位置), bg_box (背景の白い四角の位置。省略時はテキストの範囲から自動計算), size (フォントサイズ)
+DEFAULT_TEXTS = [
+    # タイトル
+    {"text": "生産および売却GWhの推移", "pos": (250, 15), "bg_box": [200, 10, 680, 50], "size": 28},
+    # X軸ラベル
+    {"text": "22年 年初来累計", "pos": (70, 485), "bg_box": [65, 485, 165, 510], "size": 16},
+    {"text": "23年 年初来累計", "pos": (270, 485), "bg_box": [265, 485, 365, 510], "size": 16},
+    {"text": "24年 年初来累計", "pos": (470, 485), "bg_box": [465, 485, 565, 510], "size": 16},
+    {"text": "25年 予算", "pos": (675, 485), "bg_box": [670, 485, 745, 510], "size": 16},
+    # 凡例
+    {"text": "生産GWh", "pos": (355, 520), "bg_box": [345, 518, 455, 540], "size": 18},
+    {"text": "売却GWh", "pos": (505, 520), "bg_box": [495, 518, 605, 540], "size": 18},
+]
+
+# bg_box を自動計算する場合のテキスト周囲の余白（px）
+DEFAULT_PADDING = 4
+
+
+@lru_cache(maxsize=None)
+def load_font(font_path, size):
+    """フォントを読み込む（同じプロセス内ではフォントファイルとサイズごとに一度だけ読み込む）"""
+    return ImageFont.truetype(font_path, size)
+
+
+def auto_bg_box(draw, item, font, padding=DEFAULT_PADDING):
+    """テキストの描画範囲（textbbox）に余白を付けた背景の四角を返す"""
+    left, top, right, bottom = draw.textbbox(tuple(item["pos"]), item["text"], font=font)
+    return [left - padding, top - padding, right + padding, bottom + padding]
+
+
+def draw_texts(image, texts, font_path):
+    """
+    画像にテキストを描画する（元のテキストは背景色の四角で隠す）。
+
+    Args:
+        image (PIL.Image.Image): 描画先の画像
+        texts (list): テキストと描画位置の辞書のリスト
+            text, pos は必須。bg_box（省略時または "auto" で自動計算）, size（既定 16）,
+            fill（文字色、既定 black）, bg（背景色、既定 white）, padding（自動計算時の余白）を指定できる
+        font_path (str): 日本語フォントファイルのパス
+    """
+    draw = ImageDraw.Draw(image)
+    for item in texts:
+        font = load_font(item.get("font_path", font_path), item.get("size", 16))
+        bg_box = item.get("bg_box", "auto")
+        if bg_box == "auto":
+            bg_box = auto_bg_box(draw, item, font, item.get("padding", DEFAULT_PADDING))
+        bg = item.get("bg", "white")
+        # 元のテキストを隠すために四角を描画
+        draw.rectangle(bg_box, fill=bg, outline=bg)
+        # 新しいテキストを描画
+        draw.text(tuple(item["pos"]), item["text"], font=font, fill=item.get("fill", "black"))
+
+
+def add_text_to_image(image_path, font_path, output_path, texts=None):
     """
     画像に翻訳された日本語テキストを追加します。
 
@@ -8,49 +72,163 @@ def add_text_to_image(image_path, font_path, output_path):
         image_path (str): 元の画像のパス。
         font_path (str): 日本語フォントファイルのパス。
         output_path (str): テキストを追加した画像の保存パス。
+        texts (list): テキストと描画位置のリスト（省略時は DEFAULT_TEXTS）。
     """
     try:
         # 画像を開く
         image = Image.open(image_path)
-        draw = ImageDraw.Draw(image)
-
-        # 日本語フォントを読み込む
-        font_title = ImageFont.truetype(font_path, 28)
-        font_legend = ImageFont.truetype(font_path, 18)
-        font_xaxis = ImageFont.truetype(font_path, 16)
-
+        # 日本語フォントを読み込めるか確認する
+        load_font(font_path, 16)
     except FileNotFoundError as e:
         print(f"エラー: ファイルが見つかりません。 -> {e}")
         print("スクリプト、画像ファイル、フォントファイルが同じディレクトリにあるか確認してください。")
         return
 
-    # テキストと描画位置のリスト
-    # 辞書のキー: text, pos (テキスト描画位置), bg_box (背景の白い四角の位置), font
-    texts_to_add = [
-        # タイトル
-        {"text": "生産および売却GWhの推移", "pos": (250, 15), "bg_box": [200, 10, 680, 50], "font": font_title},
-        # X軸ラベル
-        {"text": "22年 年初来累計", "pos": (70, 485), "bg_box": [65, 485, 165, 510], "font": font_xaxis},
-        {"text": "23年 年初来累計", "pos": (270, 485), "bg_box": [265, 485, 365, 510], "font": font_xaxis},
-        {"text": "24年 年初来累計", "pos": (470, 485), "bg_box": [465, 485, 565, 510], "font": font_xaxis},
-        {"text": "25年 予算", "pos": (675, 485), "bg_box": [670, 485, 745, 510], "font": font_xaxis},
-        # 凡例
-        {"text": "生産GWh", "pos": (355, 520), "bg_box": [345, 518, 455, 540], "font": font_legend},
-        {"text": "売却GWh", "pos": (505, 520), "bg_box": [495, 518, 605, 540], "font": font_legend},
-    ]
-
-    # 各テキストを描画
-    for item in texts_to_add:
-        # 元のテキストを隠すために白い四角を描画
-        draw.rectangle(item["bg_box"], fill="white", outline="white")
-        # 新しいテキストを描画
-        draw.text(item["pos"], item["text"], font=item["font"], fill="black")
+    draw_texts(image, DEFAULT_TEXTS if texts is None else texts, font_path)
 
     # 画像を保存
     image.save(output_path)
     print(f"処理が完了し、画像を '{output_path}' として保存しました。")
 
-if __name__ == '__main__':
+
+# ---------------------------------------------------------------------------
+# テンプレートによる一括処理
+# ---------------------------------------------------------------------------
+
+def load_template(path):
+    """
+    オーバーレイのテンプレート（JSON / YAML）を読み込む。
+
+    テンプレートの形式:
+        font: フォントファイルのパス（テンプレートからの相対パス可）
+        match: 対象とする画像ファイル名のパターン（glob、リストも可。既定 "*"）
+        texts: テキストと描画位置のリスト（draw_texts の texts と同じ形式）
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError as e:
+                raise ImportError("YAML のテンプレートを読み込むには PyYAML が必要です (pip install pyyaml)") from e
+            template = yaml.safe_load(f)
+        else:
+            template = json.load(f)
+
+    if "texts" not in template or "font" not in template:
+        raise ValueError(f"テンプレートに font と texts が必要です: {path}")
+    font = os.path.expanduser(template["font"])
+    if not os.path.isabs(font):
+        font = os.path.join(os.path.dirname(os.path.abspath(path)), font)
+    match = template.get("match", "*")
+    return {
+        "name": os.path.basename(path),
+        "font": font,
+        "match": [match] if isinstance(match, str) else list(match),
+        "texts": template["texts"],
+    }
+
+
+def match_template(filename, templates):
+    """ファイル名に最初に一致したテンプレートを返す（一致しない場合は None）"""
+    for template in templates:
+        if any(fnmatch.fnmatch(filename, pattern) for pattern in template["match"]):
+            return template
+    return None
+
+
+def build_batch_tasks(input_dir, output_dir, templates, suffix="_jp"):
+    """入力ディレクトリの画像ごとに (入力パス, 出力パス, テンプレートの番号) を作成する"""
+    tasks = []
+    for filename in sorted(os.listdir(input_dir)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        template = match_template(filename, templates)
+        if template is None:
+            print(f"警告: 一致するテンプレートがないため省略します: {filename}")
+            continue
+        stem, ext = os.path.splitext(filename)
+        tasks.append((os.path.join(input_dir, filename),
+                      os.path.join(output_dir, f"{stem}{suffix}{ext}"),
+                      templates.index(template)))
+    return tasks
+
+
+_worker_templates = []
+
+
+def _init_batch_worker(templates):
+    """ワーカーの初期化（テンプレートを受け取り、使うフォントを先に読み込んでおく）"""
+    _worker_templates[:] = templates
+    for template in templates:
+        for item in template["texts"]:
+            load_font(item.get("font_path", template["font"]), item.get("size", 16))
+
+
+def _process_image(task):
+    image_path, output_path, template_index = task
+    template = _worker_templates[template_index]
+    with Image.open(image_path) as src:
+        image = src.copy()
+    draw_texts(image, template["texts"], template["font"])
+    image.save(output_path)
+    return output_path
+
+
+def run_batch(template_paths, input_dir, output_dir, workers=None, suffix="_jp"):
+    """
+    テンプレートに従ってディレクトリ内の画像にテキストを一括で追加する。
+
+    Args:
+        template_paths (list): テンプレートのパス（画像ごとに最初に一致したものを使う）
+        input_dir (str): 元の画像のディレクトリ
+        output_dir (str): 出力先のディレクトリ
+        workers (int): ワーカープロセス数（None は CPU 数、1 以下は現在のプロセスで順に処理）
+        suffix (str): 出力ファイル名に付ける接尾辞
+
+    Returns:
+        list: 保存した画像のパス
+    """
+    templates = [load_template(p) for p in template_paths]
+    # ワーカーの起動前にフォントを確認する（ワーカー内で失敗するとプールごと停止するため）
+    for template in templates:
+        for font_path in {template["font"]} | {item["font_path"] for item in template["texts"] if "font_path" in item}:
+            if not os.path.exists(font_path):
+                raise FileNotFoundError(f"フォントファイルが見つかりません: {font_path} (テンプレート: {template['name']})")
+    tasks = build_batch_tasks(input_dir, output_dir, templates, suffix)
+    if not tasks:
+        print("処理対象の画像がありません。")
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        _init_batch_worker(templates)
+        paths = [_process_image(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                 initargs=(templates,)) as executor:
+            paths = list(executor.map(_process_image, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    print(f"{len(paths)} 件の画像にテキストを追加し、'{output_dir}' に保存しました。")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="グラフ画像に日本語テキストを追加する")
+    parser.add_argument("--template", nargs="+", help="オーバーレイのテンプレート（JSON / YAML）。指定時は一括処理")
+    parser.add_argument("--input-dir", help="元の画像のディレクトリ（一括処理）")
+    parser.add_argument("--output-dir", help="出力先のディレクトリ（一括処理、既定: <input-dir>/translated）")
+    parser.add_argument("--workers", type=int, default=None, help="ワーカープロセス数")
+    parser.add_argument("--suffix", default="_jp", help="出力ファイル名に付ける接尾辞")
+    args = parser.parse_args()
+
+    if args.template:
+        if not args.input_dir:
+            parser.error("--template を指定した場合は --input-dir が必要です")
+        output_dir = args.output_dir or os.path.join(args.input_dir, "translated")
+        run_batch(args.template, args.input_dir, output_dir, workers=args.workers, suffix=args.suffix)
+        return
+
     # --- 設定 ---
     # 元の画像ファイル名
     input_image_file = 'image.png'
@@ -60,4 +238,8 @@ if __name__ == '__main__':
     output_image_file = 'translated_chart_jp.png'
     # --- 設定ここまで ---
 
-    add_text_to_image(input_image_file, font_file, output_image_file)
\ No newline at end of file
+    add_text_to_image(input_image_file, font_file, output_image_file)
+
+
+if __name__ == '__main__':
+    main()
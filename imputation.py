@@ -0,0 +1,187 @@
+"""
+発電効率・発電能力・余熱利用量の欠損値を KNN / 反復回帰で補完するモジュール
+
+データセットごとに一度だけ学習し、学習済みモデルをディスクにキャッシュする。
+補完したセルは「<列名>_補完」列で識別できるため、補完値の有無で統計を比較できる。
+"""
+
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+from sklearn.impute import IterativeImputer, KNNImputer
+
+# 補完対象の列と、補完を行う施設の条件（該当設備を持つ施設のみ補完する）
+POWER_FLAG_COLS = ['余熱利用の状況_発電（場内利用）', '余熱利用の状況_発電（場外利用）']
+NO_HEAT_USE_COL = '余熱利用の状況_無し'
+
+TARGET_COLUMNS = {
+    '発電能力_発電効率（仕様値・公称値）_％': 'power',
+    '発電能力_発電能力_kW': 'power',
+    '余熱利用量（実績値）_余熱利用量_MJ': 'heat',
+}
+
+# 補完の説明変数
+FEATURE_COLUMNS = [
+    '年間処理量_t/年度',
+    '施設全体の処理能力_t/日',
+    '炉数',
+    '使用開始年度',
+    '低位発熱量_(計算値)_kJ/kg',
+    '発電能力_総発電量（実績値）_MWh',
+]
+
+IMPUTED_SUFFIX = '_補完'
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'result', 'cache', 'imputation')
+
+METHODS = {
+    'knn': lambda params: KNNImputer(n_neighbors=params.get('n_neighbors', 5), weights='distance'),
+    'iterative': lambda params: IterativeImputer(max_iter=params.get('max_iter', 10),
+                                                 random_state=params.get('random_state', 0)),
+}
+
+
+def _numeric_frame(df, columns):
+    """指定列を数値に変換した DataFrame を返す（列が無ければ NaN）"""
+    return pd.DataFrame({
+        col: pd.to_numeric(df[col], errors='coerce') if col in df.columns else np.nan
+        for col in columns
+    }, index=df.index)
+
+
+def eligible_mask(df, kind):
+    """補完対象となる施設のマスク（発電施設 / 余熱利用施設）"""
+    if kind == 'power':
+        mask = pd.Series(False, index=df.index)
+        for col in POWER_FLAG_COLS:
+            if col in df.columns:
+                mask |= df[col] == '○'
+        return mask
+    if NO_HEAT_USE_COL in df.columns:
+        return df[NO_HEAT_USE_COL] != '○'
+    return pd.Series(True, index=df.index)
+
+
+def dataset_version(df, columns=None):
+    """補完に使う列の内容から、データセットのバージョン（ハッシュ値）を計算する"""
+    columns = columns or FEATURE_COLUMNS + list(TARGET_COLUMNS)
+    frame = _numeric_frame(df, columns)
+    digest = hashlib.sha256(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    digest.update(','.join(columns).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def fit_imputer(df, method='knn', params=None, cache_dir=DEFAULT_CACHE_DIR, refit=False):
+    """
+    補完モデルを学習する。同じデータセット・手法・パラメータの学習済みモデルがあればキャッシュから読み込む。
+
+    Args:
+        df (DataFrame): 焼却施設データ
+        method (str): 'knn' または 'iterative'
+        params (dict): 手法のパラメータ（n_neighbors, max_iter など）
+        cache_dir (str): 学習済みモデルの保存先
+        refit (bool): キャッシュを無視して再学習する
+
+    Returns:
+        dict: 学習済みモデル（列、標準化パラメータ、imputer、データセットバージョン）
+    """
+    if method not in METHODS:
+        raise ValueError(f"未対応の補完手法です: {method}（{', '.join(METHODS)}）")
+    params = params or {}
+    columns = FEATURE_COLUMNS + list(TARGET_COLUMNS)
+    version = dataset_version(df, columns)
+    param_key = ','.join(f"{k}={params[k]}" for k in sorted(params))
+    cache_key = hashlib.sha256(f"{version}|{method}|{param_key}".encode('utf-8')).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f"{method}_{cache_key}.pkl")
+
+    if not refit and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            model = pickle.load(f)
+        print(f"補完モデルをキャッシュから読み込みました: {cache_path}")
+        return model
+
+    frame = _numeric_frame(df, columns)
+    # 全て欠損の列は学習できないため除外する
+    usable = [col for col in columns if frame[col].notna().any()]
+    values = frame[usable].to_numpy(dtype=float)
+    mean = np.nanmean(values, axis=0)
+    std = np.nanstd(values, axis=0)
+    std[std == 0] = 1.0
+
+    imputer = METHODS[method](params)
+    imputer.fit((values - mean) / std)
+
+    model = {
+        'method': method,
+        'params': params,
+        'columns': usable,
+        'mean': mean,
+        'std': std,
+        'imputer': imputer,
+        'dataset_version': version,
+    }
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, 'wb') as f:
+            pickle.dump(model, f)
+        print(f"補完モデルを保存しました: {cache_path}")
+    except OSError as e:
+        print(f"補完モデルの保存に失敗しました: {cache_path} - {e}")
+
+    return model
+
+
+def impute_inputs(df, method='knn', params=None, model=None, targets=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    補完対象列の欠損値を一括で補完する。
+
+    Args:
+        df (DataFrame): 焼却施設データ
+        method (str): 'knn' または 'iterative'（model 指定時は無視）
+        params (dict): 手法のパラメータ
+        model (dict): fit_imputer の結果（省略時は学習またはキャッシュから読み込み）
+        targets (list): 補完する列（省略時は TARGET_COLUMNS の全列）
+        cache_dir (str): 学習済みモデルの保存先
+
+    Returns:
+        DataFrame: 補完後のデータ（各補完対象列に「<列名>_補完」の真偽値列を追加）
+    """
+    if model is None:
+        model = fit_imputer(df, method, params, cache_dir)
+    targets = [col for col in (targets or TARGET_COLUMNS) if col in model['columns']]
+
+    frame = _numeric_frame(df, model['columns'])
+    scaled = (frame.to_numpy(dtype=float) - model['mean']) / model['std']
+    imputed = model['imputer'].transform(scaled) * model['std'] + model['mean']
+    imputed = pd.DataFrame(imputed, index=df.index, columns=model['columns'])
+
+    result = df.copy()
+    for col in targets:
+        fill_mask = frame[col].isnull() & eligible_mask(df, TARGET_COLUMNS[col])
+        # 物理的にありえない負の値は補完しない
+        fill_mask &= imputed[col] > 0
+        result[col] = frame[col].where(~fill_mask, imputed[col])
+        result[col + IMPUTED_SUFFIX] = fill_mask
+
+    return result
+
+
+def any_imputed(df, columns=None):
+    """いずれかの指定列が補完された行のマスク"""
+    flags = [col + IMPUTED_SUFFIX for col in (columns or TARGET_COLUMNS) if col + IMPUTED_SUFFIX in df.columns]
+    if not flags:
+        return pd.Series(False, index=df.index)
+    return df[flags].any(axis=1)
+
+
+def print_imputation_summary(df):
+    """列ごとの補完件数を表示する"""
+    for col in TARGET_COLUMNS:
+        flag = col + IMPUTED_SUFFIX
+        if flag in df.columns:
+            print(f"{col}: {int(df[flag].sum())} 件を補完")
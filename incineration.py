@@ -0,0 +1,280 @@
+"""
+焼却施設データ分析のコマンドラインの入口
+
+    python incineration.py stats power plots
+    python incineration.py --config my.toml describe efficiency
+    python incineration.py method-filter --methods DB PFI --match grouped
+    python incineration.py method-filter --partition --match grouped
+
+複数のサブコマンドを指定すると1つのプロセスで順に実行し、設定・入力CSV（1回だけ読み込む）・
+読み込み済みのライブラリを共有する。各スクリプトを個別に実行する場合と比べて、インタプリタの起動と
+CSV の読み込みがサブコマンドの数だけ繰り返されない。stats / power と plots を一緒に指定すると、
+図は計算した結果からそのまま描画する（結果の保存先を読み直さない）。パスとパラメータは config.load_config() の設定ファイルで指定する。
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+import instrumentation
+from config import load_config, resolve_path, section
+from instrumentation import stage
+
+
+class Session:
+    """
+    サブコマンド間で共有する設定と入力データ。
+
+    入力CSVは最初に必要になったときに1回だけ読み込む。各サブコマンドには frame() でコピーを渡し、
+    あるサブコマンドでの変更が後のサブコマンドに影響しないようにする。
+    stats / power の結果は results（データセット名 → DataFrame）に残し、plots はそこから描画する
+    （結果の保存先やCSVを読み直さない）。
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.results = {}
+        self._data = None
+        os.makedirs(config['output_dir'], exist_ok=True)
+
+    @property
+    def data(self):
+        if self._data is None:
+            start = time.perf_counter()
+            with stage('load') as record:
+                self._data = pd.read_csv(self.config['input_file'], encoding=self.config['encoding'])
+                record['rows'] = len(self._data)
+            print(f"入力CSVを読み込みました: {self.config['input_file']} "
+                  f"({len(self._data):,} 行, {time.perf_counter() - start:.2f} 秒)")
+        return self._data
+
+    def frame(self):
+        """入力データのコピー"""
+        return self.data.copy()
+
+    def output_path(self, filename):
+        return os.path.join(self.config['output_dir'], filename)
+
+
+def _script_config(module_config, cfg):
+    """スクリプトの CONFIG（列番号など）に設定ファイルの値を重ねる"""
+    return {**module_config, **{k: v for k, v in cfg.items() if k in module_config}}
+
+
+def _store_params(module, cfg):
+    """結果の保存先でスクリプトの結果を探すパラメータ"""
+    cfg = _script_config(module.CONFIG, cfg)
+    return {k: cfg[k] for k in module.STORE_PARAMS}
+
+
+def run_stats(session, args):
+    import calculate_statistics
+    cfg = _script_config(calculate_statistics.CONFIG, section(session.config, 'stats'))
+    results = calculate_statistics.main(session.frame(), cfg)
+    if results is None:
+        return False
+    session.results.update(results)
+    return True
+
+
+def run_power(session, args):
+    import power_generation_analysis
+    cfg = _script_config(power_generation_analysis.CONFIG, section(session.config, 'power'))
+    results = power_generation_analysis.main(session.frame(), cfg)
+    if results is None:
+        return False
+    session.results.update(results)
+    return True
+
+
+def run_efficiency(session, args):
+    import power_efficiency_statistics
+    cfg = section(session.config, 'efficiency')
+    power_efficiency_statistics.main(session.frame(), cfg['output_dir'],
+                                     _script_config(power_efficiency_statistics.CONFIG, cfg))
+    return True
+
+
+def run_lcv(session, args):
+    import LCV_Analysis
+    cfg = section(session.config, 'lcv')
+    LCV_Analysis.analyze_lcv(cfg['input_file'], df=session.data, output_dir=cfg['output_dir'])
+    return True
+
+
+def run_method_count(session, args):
+    import 運営体分析
+    cfg = section(session.config, 'method-count')
+    sort_by_counts = args.sort_by_counts or cfg.get('sort_by_counts', False)
+    運営体分析.run(session.data, cfg['output_dir'], sort_by_counts=sort_by_counts)
+    return True
+
+
+def run_method_filter(session, args):
+    import 実施方式フィルタ
+    cfg = section(session.config, 'method-filter')
+    if args.partition or cfg.get('partition', False):
+        # 全ての方式を1回で方式ごとのファイルに分ける
+        out_dir = os.path.join(cfg['output_dir'], cfg.get('partition_dir', 'implementation_methods'))
+        実施方式フィルタ.partition_methods(session.data, out_dir,
+                                    column=cfg.get('column', 実施方式フィルタ.TARGET_COL),
+                                    match=args.match or cfg.get('match', 'raw'),
+                                    fmt=cfg.get('partition_format', 'csv'))
+        return True
+    methods = args.methods or cfg.get('methods')
+    if not methods:
+        print("抽出対象の方式名を --methods または設定ファイルの [method-filter] methods で指定してください。")
+        return False
+    out_path = os.path.join(cfg['output_dir'], cfg.get('output', 'filtered_implementation_methods.csv'))
+    実施方式フィルタ.filter_methods(session.data, methods, out_path,
+                             column=cfg.get('column', 実施方式フィルタ.TARGET_COL),
+                             match=args.match or cfg.get('match', 'raw'))
+    return True
+
+
+def run_describe(session, args):
+    import describe_data
+    describe_data.describe_efficiency(session.data)
+    return True
+
+
+def run_plots(session, args):
+    """stats / power の結果と入力データから図をまとめて描画する"""
+    import calculate_statistics
+    import plot_analysis
+    import plot_efficiency_histogram
+    import plot_power_generation
+    import plot_utilization_histogram
+    import power_generation_analysis
+    import replot_utilization_histogram
+    from figure_rendering import render_figures
+    from result_store import load_result
+
+    cfg = section(session.config, 'plots')
+    out = cfg['output_dir']
+
+    # 同じ実行の stats / power の結果はメモリから受け取り、なければ現在の設定で計算した結果を読み込む
+    heat_params = _store_params(calculate_statistics, section(session.config, 'stats'))
+    power_params = _store_params(power_generation_analysis, section(session.config, 'power'))
+
+    def results(dataset, name, columns, params):
+        if dataset in session.results:
+            return session.results[dataset][columns]
+        try:
+            return load_result(dataset, os.path.join(out, name), columns=columns, params=params)
+        except FileNotFoundError:
+            print(f"結果がありません（先に stats / power を実行してください）: {dataset}")
+            return None
+
+    jobs = []
+    heat_filtered = results('heat_utilization_filtered', 'heat_utilization_results_filtered.csv',
+                            plot_analysis.COLUMNS_FILTERED, heat_params)
+    heat_all = results('heat_utilization_all', 'heat_utilization_results_all.csv', plot_analysis.COLUMNS_ALL,
+                       heat_params)
+    if heat_filtered is not None and heat_all is not None:
+        plot_analysis.print_category_statistics(heat_filtered)
+        jobs += plot_analysis.build_jobs(heat_filtered, heat_all, os.path.join(out, 'heat_utilization_analysis.png'))
+    power_filtered = results('power_generation_filtered', 'power_generation_results_filtered.csv',
+                             plot_power_generation.COLUMNS, power_params)
+    power_all = results('power_generation_all', 'power_generation_results_all.csv', plot_power_generation.COLUMNS,
+                        power_params)
+    if power_filtered is not None and power_all is not None:
+        jobs += plot_power_generation.build_jobs(power_filtered, power_all,
+                                                 os.path.join(out, 'power_generation_analysis.png'))
+    render_figures(jobs, workers=cfg.get('workers'))
+
+    if power_filtered is not None:
+        plot_utilization_histogram.plot_power_generation_utilization_histogram(
+            output_path=os.path.join(out, 'power_generation_utilization_rate_histogram.png'), df_filtered=power_filtered)
+    replot_utilization_histogram.replot_power_generation_utilization_histogram(
+        session.data, os.path.join(out, 'recalculated_utilization_histogram.png'))
+    plot_efficiency_histogram.plot_power_generation_efficiency_histogram(
+        session.data, os.path.join(out, 'power_generation_efficiency_histogram.png'))
+    return heat_filtered is not None and power_filtered is not None
+
+
+# サブコマンド名 → (実行する関数, 説明)
+COMMANDS = {
+    'stats': (run_stats, '余熱利用率の計算（calculate_statistics.py）'),
+    'power': (run_power, '発電利用率・設備利用率の計算（power_generation_analysis.py）'),
+    'efficiency': (run_efficiency, '発電効率・熱利用率の統計（power_efficiency_statistics.py）'),
+    'lcv': (run_lcv, '低位発熱量の統計と相関（LCV_Analysis.py）'),
+    'method-count': (run_method_count, 'ごみ処理事業実施方式の件数（運営体分析.py）'),
+    'method-filter': (run_method_filter, '指定した実施方式の施設の抽出（実施方式フィルタ.py）'),
+    'describe': (run_describe, '発電効率の統計と低効率の施設一覧（describe_data.py）'),
+    'plots': (run_plots, '図の描画（plot_*.py。stats / power の結果を使う）'),
+}
+
+# 'all' で実行するサブコマンド（plots は stats / power の結果を使うため後に置く）
+ALL_COMMANDS = ['stats', 'power', 'efficiency', 'lcv', 'method-count', 'describe', 'plots']
+
+
+def parse_args(argv=None):
+    command_help = '\n'.join(f"  {name:<14} {desc}" for name, (_, desc) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        description='焼却施設データの分析を実行する（複数のサブコマンドを1つのプロセスで順に実行できる）',
+        epilog=f"サブコマンド:\n{command_help}\n  {'all':<14} {', '.join(ALL_COMMANDS)}",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('commands', nargs='+', choices=[*COMMANDS, 'all'], metavar='COMMAND',
+                        help='実行するサブコマンド（指定順に実行）')
+    parser.add_argument('--config', default=None, help='設定ファイル（TOML / JSON）')
+    parser.add_argument('--input', default=None, help='入力CSV（設定ファイルの input_file を上書き）')
+    parser.add_argument('--output-dir', default=None, help='出力先（設定ファイルの output_dir を上書き）')
+    parser.add_argument('--methods', nargs='+', default=None, help='method-filter: 抽出する方式名')
+    parser.add_argument('--match', choices=['raw', 'grouped'], default=None, help='method-filter: 方式名の照合方法')
+    parser.add_argument('--partition', action='store_true', help='method-filter: 全ての方式を方式ごとのファイルに分けて出力する')
+    parser.add_argument('--sort-by-counts', action='store_true', help='method-count: 件数の多い順に並べ替える')
+    parser.add_argument('--trace', default=None,
+                        help=f'段階ごとの計測結果を追記する JSON Lines のパス（既定: 環境変数 {instrumentation.TRACE_ENV}）')
+    parser.add_argument('--profile', default=None, help='段階ごとの cProfile の結果（.prof）の保存先')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    instrumentation.configure(trace=args.trace, profile_dir=args.profile)
+    config = load_config(args.config)
+    if args.input:
+        config['input_file'] = resolve_path(config, args.input)
+    if args.output_dir:
+        config['output_dir'] = resolve_path(config, args.output_dir)
+
+    commands = []
+    for name in args.commands:
+        for command in (ALL_COMMANDS if name == 'all' else [name]):
+            if command not in commands:
+                commands.append(command)
+
+    session = Session(config)
+    elapsed, failed = {}, []
+    start_all = time.perf_counter()
+    for name in commands:
+        print(f"\n{'=' * 20} {name} {'=' * 20}")
+        start = time.perf_counter()
+        try:
+            with instrumentation.analysis(name), stage('command'):
+                ok = COMMANDS[name][0](session, args)
+        except (Exception, SystemExit) as e:
+            print(f"エラーが発生しました ({name}): {e}")
+            ok = False
+        elapsed[name] = time.perf_counter() - start
+        if not ok:
+            failed.append(name)
+
+    print(f"\n{'=' * 20} 実行時間 {'=' * 20}")
+    for name in commands:
+        mark = '失敗' if name in failed else '完了'
+        print(f"{name:<14} {mark} {elapsed[name]:7.2f} 秒")
+    print(f"{'合計':<12} {time.perf_counter() - start_all:7.2f} 秒")
+    if instrumentation.enabled():
+        trace = instrumentation.trace_path()
+        print(f"計測結果を {trace} に追記しました（集計: python instrumentation.py {trace} --last）")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+分析の段階（読み込み・導出・絞り込み・集計・書き出し・描画）ごとの計測
+
+stage() コンテキストマネージャ・traced デコレータ・Stages（順に進む段階の区切り）で囲んだ処理について、
+経過時間・CPU 時間・ピーク RSS・行数を JSON Lines のトレースに1行ずつ追記する。
+プロファイル用のディレクトリを指定すると、段階ごとに cProfile の結果（.prof）も保存する
+（snakeviz や flameprof でフレームグラフとして表示できる）。
+
+計測は環境変数 INCINERATION_TRACE（トレースのパス）または configure() で有効になり、
+無効の場合は何も記録しない。パイプラインから起動したスクリプトも環境変数を引き継ぐため、
+同じトレースに追記される。
+"""
+
+import argparse
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+TRACE_ENV = 'INCINERATION_TRACE'
+PROFILE_ENV = 'INCINERATION_PROFILE'
+
+_settings = {
+    'trace': os.environ.get(TRACE_ENV) or None,
+    'profile_dir': os.environ.get(PROFILE_ENV) or None,
+}
+_state = threading.local()
+_write_lock = threading.Lock()
+_profile_seq = 0
+
+# 実行ごとの識別子（同じプロセスの記録をまとめるため）
+RUN_ID = uuid.uuid4().hex[:12]
+
+
+def configure(trace=None, profile_dir=None):
+    """計測を有効にする（trace: トレースのパス、profile_dir: cProfile の保存先）"""
+    if trace is not None:
+        _settings['trace'] = trace
+    if profile_dir is not None:
+        _settings['profile_dir'] = profile_dir
+
+
+def enabled():
+    return _settings['trace'] is not None
+
+
+def trace_path():
+    """トレースのパス（無効の場合は None）"""
+    return _settings['trace']
+
+
+def _stack():
+    if not hasattr(_state, 'stack'):
+        _state.stack = []
+        _state.analysis = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+    return _state.stack
+
+
+# ---------------------------------------------------------------------------
+# メモリ使用量
+# ---------------------------------------------------------------------------
+
+def _proc_status_mb(field):
+    """/proc/self/status の VmRSS / VmHWM（MB。取得できない場合は None）"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """ピーク RSS（VmHWM）をリセットする（Linux のみ。成功したら True）"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    peak = _proc_status_mb('VmHWM')
+    if peak is not None:
+        return peak
+    # /proc がない環境ではプロセス開始からのピーク（macOS はバイト、Linux は KB）
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+# ---------------------------------------------------------------------------
+# 計測
+# ---------------------------------------------------------------------------
+
+@contextlib.contextmanager
+def analysis(name):
+    """この中の段階を分析 name の記録とする"""
+    _stack()
+    previous = _state.analysis
+    _state.analysis = name
+    try:
+        yield
+    finally:
+        _state.analysis = previous
+
+
+@contextlib.contextmanager
+def stage(name, rows=None, **attrs):
+    """
+    処理の段階を計測する。
+
+    yield する辞書の 'rows' などを書き換えると記録に反映される（例: 絞り込み後の行数）。
+
+    Args:
+        name (str): 段階の名前（'load', 'derive', 'filter', 'aggregate', 'export', 'render' など）
+        rows (int): 処理した行数
+        **attrs: 記録に加える値
+    """
+    record = {'rows': rows, **attrs}
+    if not enabled():
+        yield record
+        return
+
+    stack = _stack()
+    # 入れ子の段階でピークをリセットする前に、外側の段階のピークを更新しておく
+    peak_before = _peak_rss_mb()
+    for outer in stack:
+        outer['_peak'] = max(outer['_peak'], peak_before)
+    peak_scope = 'stage' if _reset_peak_rss() else 'process'
+
+    profiler = None
+    if _settings['profile_dir'] and not any(outer.get('_profiled') for outer in stack):
+        profiler = cProfile.Profile()
+    frame = {'_name': name, '_peak': 0.0, '_profiled': profiler is not None}
+    stack.append(frame)
+
+    rss_before = _proc_status_mb('VmRSS')
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        # 例外で終了しなかった内側の段階（Stages）も含めて取り除く
+        del stack[stack.index(frame):]
+        peak = max(frame['_peak'], _peak_rss_mb())
+        for outer in stack:
+            outer['_peak'] = max(outer['_peak'], peak)
+        rss_after = _proc_status_mb('VmRSS')
+
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'run': RUN_ID,
+            'pid': os.getpid(),
+            'analysis': _state.analysis,
+            'stage': name,
+            'parent': stack[-1].get('_name') if stack else None,
+            'depth': len(stack),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'rss_mb': None if rss_after is None else round(rss_after, 1),
+            'rss_delta_mb': None if rss_after is None or rss_before is None else round(rss_after - rss_before, 1),
+            'peak_rss_mb': round(peak, 1),
+            'peak_scope': peak_scope,
+            **{k: v for k, v in record.items()},
+        }
+        if profiler is not None:
+            entry['profile'] = _dump_profile(profiler, entry['analysis'], name)
+        _write(entry)
+
+
+def _dump_profile(profiler, analysis_name, stage_name):
+    global _profile_seq
+    _profile_seq += 1
+    os.makedirs(_settings['profile_dir'], exist_ok=True)
+    path = os.path.join(_settings['profile_dir'],
+                        f"{analysis_name}.{stage_name}.{os.getpid()}.{_profile_seq}.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+def _write(entry):
+    path = _settings['trace']
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+    # 1行ずつ追記する（複数プロセスからの追記でも行が混ざらない）
+    with _write_lock, open(path, 'a', encoding='utf-8') as f:
+        f.write(line)
+
+
+def traced(name=None, rows=None):
+    """
+    関数の呼び出しを1つの段階として計測するデコレータ。
+
+    rows に関数を渡すと、戻り値から行数を求める（例: rows=len）。
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name) as record:
+                result = func(*args, **kwargs)
+                if rows is not None and result is not None:
+                    record['rows'] = rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+class Stages:
+    """
+    順に進む段階を区切って計測する（長い処理をインデントし直さずに段階へ分けるため）。
+
+        with Stages() as stages:
+            stages.begin('derive', rows=len(df))
+            ...
+            stages.begin('filter')   # 前の段階を終えて次の段階を始める
+            ...
+            stages.end(rows=len(filtered))
+
+    with で使うと、途中で例外が発生しても開いている段階を閉じる（スレッドの段階のスタックに残さない）。
+    関数全体を段階に分ける場合は staged デコレータを使う。
+    """
+
+    def __init__(self):
+        self._current = None
+        self._record = None
+
+    def begin(self, name, rows=None, **attrs):
+        self.end()
+        self._current = stage(name, rows=rows, **attrs)
+        self._record = self._current.__enter__()
+        return self._record
+
+    def end(self, rows=None):
+        if self._current is None:
+            return
+        if rows is not None:
+            self._record['rows'] = rows
+        current, self._current = self._current, None
+        current.__exit__(None, None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.end()
+        return False
+
+
+def staged(func):
+    """
+    関数を with Stages() の中で呼び出すデコレータ（関数は stages 引数で Stages を受け取る）。
+
+        @staged
+        def calculate(df, config, stages=None):
+            stages.begin('derive', rows=len(df))
+            ...
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with Stages() as stages:
+            return func(*args, stages=stages, **kwargs)
+    return wrapper
+
+
+# ---------------------------------------------------------------------------
+# 集計
+# ---------------------------------------------------------------------------
+
+def load_trace(path):
+    """トレースを DataFrame として読み込む"""
+    import pandas as pd
+    return pd.read_json(path, lines=True)
+
+
+def summarize_trace(path, run=None):
+    """
+    分析 × 段階ごとに経過時間・CPU 時間・ピーク RSS・行数を集計する（経過時間の合計の降順）。
+
+    Args:
+        path (str): トレースのパス
+        run (str): 集計する実行の識別子（省略時は全ての記録）
+    """
+    trace = load_trace(path)
+    if run is not None:
+        trace = trace[trace['run'] == run]
+    summary = trace.groupby(['analysis', 'stage'], sort=False).agg(
+        回数=('wall_s', 'size'),
+        経過時間_合計_秒=('wall_s', 'sum'),
+        経過時間_平均_秒=('wall_s', 'mean'),
+        CPU時間_合計_秒=('cpu_s', 'sum'),
+        ピークRSS_MB=('peak_rss_mb', 'max'),
+        行数=('rows', 'sum'),
+    )
+    return summary.sort_values('経過時間_合計_秒', ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='計測のトレース（JSON Lines）を段階ごとに集計する')
+    parser.add_argument('trace', nargs='?', default=os.environ.get(TRACE_ENV), help='トレースのパス')
+    parser.add_argument('--run', default=None, help='集計する実行の識別子')
+    parser.add_argument('--last', action='store_true', help='最後の実行のみ集計する')
+    args = parser.parse_args()
+    if not args.trace:
+        parser.error(f"トレースのパスを指定してください（または環境変数 {TRACE_ENV}）")
+
+    run = args.run
+    if args.last:
+        run = load_trace(args.trace)['run'].iloc[-1]
+    import pandas as pd
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(summarize_trace(args.trace, run).round(3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+日本語フォントの解決・キャッシュ・適用を共通化するモジュール
+
+フォントの探索（フォントファイルの存在確認、addfont、findfont）は初回のみ行い、
+結果（ファミリー名とフォントファイルのパス）を matplotlib のキャッシュディレクトリに保存する。
+rcParams への適用は図を作成する直前に apply_japanese_font() を呼んだときだけ行う。
+"""
+
+import json
+import os
+
+CANDIDATE_PATHS = [
+    "/usr/share/fonts/truetype/mplus/mplus-1c-regular.ttf",
+    "/usr/share/fonts/truetype/mplus/mplus-1c-bold.ttf",
+    "/usr/share/fonts/truetype/mplus/mplus-1c-medium.ttf",
+    "/usr/share/fonts/truetype/mplus/mplus-1p-regular.ttf",
+    "/usr/share/fonts/truetype/mplus/mplus-1p-bold.ttf",
+    "/usr/share/fonts/truetype/mplus/mplus-1p-medium.ttf",
+    "/usr/share/fonts/opentype/mplus/MPLUS1c-Regular.otf",
+    "/usr/share/fonts/opentype/mplus/MPLUS1c-Bold.otf",
+    "/usr/share/fonts/opentype/mplus/MPLUS1p-Regular.otf",
+    "/usr/share/fonts/opentype/mplus/MPLUS1p-Bold.otf",
+]
+CANDIDATE_FAMILIES = [
+    "M PLUS 1c", "M PLUS 1p", "M+ 1c", "M+ 1C", "M+ 1p",
+    "Noto Sans CJK JP", "Noto Sans JP",
+    "IPAexGothic", "IPAGothic", "TakaoPGothic",
+]
+FALLBACK_FAMILIES = [
+    'Noto Sans CJK JP', 'Noto Sans JP',
+    'IPAexGothic', 'IPAGothic', 'TakaoPGothic', 'DejaVu Sans',
+]
+
+CACHE_FILENAME = "incineration_jp_font.json"
+
+_resolved = None
+_applied = False
+
+
+def cache_path():
+    """フォント解決結果のキャッシュファイルのパス（環境変数 JP_FONT_CACHE で変更可能）"""
+    env = os.environ.get("JP_FONT_CACHE")
+    if env:
+        return env
+    import matplotlib
+    return os.path.join(matplotlib.get_cachedir(), CACHE_FILENAME)
+
+
+def _cache_signature():
+    import matplotlib
+    return {
+        "matplotlib": matplotlib.__version__,
+        "candidates": CANDIDATE_PATHS + CANDIDATE_FAMILIES,
+    }
+
+
+def _load_cache():
+    try:
+        with open(cache_path(), "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("signature") != _cache_signature():
+        return None
+    # 見つからなかった結果（以前の版で保存したもの）やフォントファイルが削除されていれば再探索する
+    if not cached.get("path") or not os.path.exists(cached["path"]):
+        return None
+    return cached
+
+
+def _save_cache(resolved):
+    path = cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**resolved, "signature": _cache_signature()}, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"フォントキャッシュの保存に失敗しました: {path} - {e}")
+
+
+def _probe():
+    """フォントファイルとファミリー名を順に調べ、使用可能な日本語フォントを探す"""
+    from matplotlib import font_manager
+
+    # 1) フォントファイルから読み込み、正確なファミリー名を得る
+    for p in CANDIDATE_PATHS:
+        if not os.path.exists(p):
+            continue
+        try:
+            font_manager.fontManager.addfont(p)
+            return {"family": font_manager.FontProperties(fname=p).get_name(), "path": p}
+        except Exception:
+            pass
+
+    # 2) 既知のファミリー名で探す
+    for fam in CANDIDATE_FAMILIES:
+        try:
+            path = font_manager.findfont(font_manager.FontProperties(family=fam), fallback_to_default=False)
+            return {"family": fam, "path": path}
+        except Exception:
+            pass
+
+    return {"family": None, "path": None}
+
+
+def resolve_japanese_font(refresh=False):
+    """
+    日本語フォントを解決する（キャッシュがあれば探索しない）。
+
+    Args:
+        refresh (bool): キャッシュを無視して再探索する
+
+    Returns:
+        dict: {'family': ファミリー名, 'path': フォントファイルのパス}（見つからない場合は None）
+    """
+    global _resolved
+    if _resolved is not None and not refresh:
+        return _resolved
+    cached = None if refresh else _load_cache()
+    if cached is not None:
+        _resolved = {"family": cached.get("family"), "path": cached.get("path")}
+    else:
+        _resolved = _probe()
+        # 見つからなかった結果は保存しない（後からフォントを入れたときに次のプロセスで見つけられるように）
+        if _resolved["path"]:
+            _save_cache(_resolved)
+    return _resolved
+
+
+def apply_japanese_font(verbose=False):
+    """
+    解決した日本語フォントを rcParams に適用する（プロセス内で一度だけ）。
+
+    Returns:
+        str: 適用したファミリー名（見つからない場合は None）
+    """
+    global _applied
+    resolved = resolve_japanese_font()
+    family = resolved["family"]
+    if _applied:
+        return family
+
+    from matplotlib import font_manager, rcParams
+
+    if family:
+        # キャッシュから解決した場合もフォントファイルを登録しておく
+        if resolved["path"]:
+            try:
+                font_manager.fontManager.addfont(resolved["path"])
+            except Exception:
+                pass
+        rcParams.update({
+            'font.family': ['sans-serif'],
+            'font.sans-serif': [family] + FALLBACK_FAMILIES,
+            'axes.unicode_minus': False,
+        })
+        if verbose:
+            print(f"Using Japanese font family: {family} -> {resolved['path']}")
+    else:
+        rcParams['axes.unicode_minus'] = False
+        print("Warning: Could not find a Japanese font. Matplotlib may fall back to DejaVu Sans.")
+    _applied = True
+    return family
+
+
+def japanese_font_properties():
+    """日本語フォントの FontProperties（見つからない場合は None）"""
+    resolved = resolve_japanese_font()
+    if not resolved["family"]:
+        return None
+    from matplotlib.font_manager import FontProperties
+    if resolved["path"] and os.path.exists(resolved["path"]):
+        return FontProperties(fname=resolved["path"])
+    return FontProperties(family=resolved["family"])
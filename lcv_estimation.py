@@ -0,0 +1,198 @@
+"""
+三成分（水分・可燃分・灰分）とごみ組成から低位発熱量を推定し、
+実測値 → 計算値 → 推定値 の3段階で低位発熱量を選択するモジュール
+"""
+
+import numpy as np
+import pandas as pd
+
+# 列名
+LCV_MEASURED_COL = '低位発熱量_(実測値)_kJ/kg'
+LCV_CALC_COL = '低位発熱量_(計算値)_kJ/kg'
+MOISTURE_COL = '三成分_水分_％'
+COMBUSTIBLE_COL = '三成分_可燃分_％'
+ASH_COL = '三成分_灰分_％'
+PLASTIC_COL = 'ごみ組成分析結果（乾ベース）_ﾋﾞﾆｰﾙ、合成樹脂、ｺﾞﾑ、皮革類_％'
+KITCHEN_COL = 'ごみ組成分析結果（乾ベース）_ちゅう芥類_％'
+
+# 三成分による標準推定式: Hl = 18,800 × B − 2,500 × W [kJ/kg]
+# （B: 可燃分比率, W: 水分比率。4,500B − 600W [kcal/kg] の kJ 換算）
+STANDARD_COMBUSTIBLE_COEF = 18800
+STANDARD_MOISTURE_COEF = -2500
+
+# 較正に使う実測値の妥当範囲 [kJ/kg]
+CALIBRATION_MIN = 1000
+CALIBRATION_MAX = 50000
+
+# 選択結果の区分
+SOURCE_MEASURED = '実測値'
+SOURCE_CALC = '計算値'
+SOURCE_ESTIMATED = '推定値'
+
+
+def _numeric(df, col):
+    """列を数値に変換する（列が無ければ全て NaN）"""
+    if col not in df.columns:
+        return pd.Series(np.nan, index=df.index)
+    return pd.to_numeric(df[col], errors='coerce')
+
+
+def build_component_features(df):
+    """
+    三成分と乾ベース組成から推定式の説明変数行列を作成する。
+
+    Returns:
+        ndarray: 列 = [定数項, 可燃分比率, 水分比率, 可燃分比率×プラスチック類比率, 可燃分比率×ちゅう芥類比率]
+        ndarray: 三成分が有効な行のマスク
+    """
+    moisture = _numeric(df, MOISTURE_COL).to_numpy(dtype=float) / 100
+    combustible = _numeric(df, COMBUSTIBLE_COL).to_numpy(dtype=float) / 100
+    ash = _numeric(df, ASH_COL).to_numpy(dtype=float) / 100
+    # 組成が欠損している場合は寄与なし（0）として扱う
+    plastic = np.nan_to_num(_numeric(df, PLASTIC_COL).to_numpy(dtype=float) / 100)
+    kitchen = np.nan_to_num(_numeric(df, KITCHEN_COL).to_numpy(dtype=float) / 100)
+
+    # 三成分の合計が0（未記入）のものや可燃分が無いものは推定不可
+    total = moisture + combustible + np.nan_to_num(ash)
+    valid = np.isfinite(moisture) & np.isfinite(combustible) & (combustible > 0) & (total > 0)
+
+    features = np.column_stack([
+        np.ones(len(df)),
+        combustible,
+        moisture,
+        combustible * plastic,
+        combustible * kitchen,
+    ])
+    return features, valid
+
+
+def estimate_lcv_standard(df):
+    """三成分の標準推定式による低位発熱量 [kJ/kg]（三成分が無効な行は NaN）"""
+    features, valid = build_component_features(df)
+    estimate = STANDARD_COMBUSTIBLE_COEF * features[:, 1] + STANDARD_MOISTURE_COEF * features[:, 2]
+    return pd.Series(np.where(valid, estimate, np.nan), index=df.index)
+
+
+def _loo_residuals(features, residuals, tol=1e-10):
+    """
+    最小二乗の残差 e_i を leave-one-out の残差 e_i / (1 - h_i) にする（h_i はハット行列の対角）。
+
+    組成の列が全て0のように一次従属な列があっても求まるよう、h_i は特異値分解の
+    左特異ベクトル（特異値が十分大きいもの）の i 行目の二乗和で求める。
+    h_i が 1 の施設（除くと係数が決まらない）は除く。
+    """
+    U, s, _ = np.linalg.svd(features, full_matrices=False)
+    rank = s > tol * s.max() if len(s) and s.max() > 0 else np.zeros(len(s), dtype=bool)
+    leverage = np.einsum('ij,ij->i', U[:, rank], U[:, rank])
+    usable = leverage < 1.0 - tol
+    return residuals[usable] / (1.0 - leverage[usable])
+
+
+def calibrate_lcv_estimator(df, min_samples=30):
+    """
+    実測値と三成分の両方がある施設で推定式の係数を最小二乗法により較正する。
+
+    Args:
+        df (DataFrame): 焼却施設データ
+        min_samples (int): 較正に必要な最小施設数。不足時は標準推定式を使用
+
+    Returns:
+        dict: 係数、leave-one-out 残差の二乗平均平方根（推定値の不確かさ）、較正に使った施設数
+    """
+    features, valid = build_component_features(df)
+    measured = _numeric(df, LCV_MEASURED_COL).to_numpy(dtype=float)
+    fit_mask = valid & (measured >= CALIBRATION_MIN) & (measured <= CALIBRATION_MAX)
+    n_fit = int(fit_mask.sum())
+
+    if n_fit < min_samples:
+        coef = np.array([0.0, STANDARD_COMBUSTIBLE_COEF, STANDARD_MOISTURE_COEF, 0.0, 0.0])
+        calibrated = False
+    else:
+        coef, *_ = np.linalg.lstsq(features[fit_mask], measured[fit_mask], rcond=None)
+        calibrated = True
+
+    if n_fit > 0:
+        residuals = measured[fit_mask] - features[fit_mask] @ coef
+        if calibrated:
+            # 較正に使った施設自身の残差は予測誤差を過小に見積もるので、
+            # leave-one-out の残差 e_i / (1 - h_i) を使う（loocv_selection と同じ閉形式）
+            residuals = _loo_residuals(features[fit_mask], residuals)
+        rmse = float(np.sqrt(np.mean(residuals ** 2))) if len(residuals) else np.nan
+    else:
+        rmse = np.nan
+
+    return {
+        'coef': coef,
+        'rmse': rmse,
+        'n_samples': n_fit,
+        'calibrated': calibrated,
+    }
+
+
+def estimate_lcv(df, calibration=None):
+    """
+    較正済みの推定式で低位発熱量を推定する。
+
+    Returns:
+        Series: 推定低位発熱量 [kJ/kg]（三成分が無効、または推定値が0以下の行は NaN）
+        dict: 使用した較正結果
+    """
+    if calibration is None:
+        calibration = calibrate_lcv_estimator(df)
+    features, valid = build_component_features(df)
+    estimate = features @ calibration['coef']
+    estimate = np.where(valid & (estimate > 0), estimate, np.nan)
+    return pd.Series(estimate, index=df.index), calibration
+
+
+def select_low_heat_value(df, use_estimate=True, calibration=None):
+    """
+    低位発熱量の選択: 実測値を優先し、なければ計算値、それもなければ三成分からの推定値を使用する。
+
+    Args:
+        df (DataFrame): 焼却施設データ
+        use_estimate (bool): 第3段階（推定値）を使用するか
+        calibration (dict): calibrate_lcv_estimator の結果（省略時は df で較正）
+
+    Returns:
+        DataFrame: 列 = ['低位発熱量', '区分', '不確かさ']（不確かさは kJ/kg の標準誤差の目安）
+    """
+    measured = _numeric(df, LCV_MEASURED_COL)
+    calc = _numeric(df, LCV_CALC_COL)
+
+    use_measured = measured > 0
+    use_calc = ~use_measured & (calc > 0)
+
+    lcv = measured.where(use_measured, calc.where(use_calc))
+    source = pd.Series(np.where(use_measured, SOURCE_MEASURED, np.where(use_calc, SOURCE_CALC, None)),
+                       index=df.index, dtype=object)
+
+    # 計算値の不確かさ: 両方が揃う施設での実測値との差の二乗平均平方根
+    both = use_measured & (calc > 0) & measured.between(CALIBRATION_MIN, CALIBRATION_MAX)
+    calc_uncertainty = float(np.sqrt(((measured[both] - calc[both]) ** 2).mean())) if both.any() else np.nan
+
+    uncertainty = pd.Series(np.where(use_measured, 0.0, np.where(use_calc, calc_uncertainty, np.nan)),
+                            index=df.index)
+
+    if use_estimate:
+        estimate, calibration = estimate_lcv(df, calibration)
+        use_est = lcv.isnull() & estimate.notna()
+        lcv = lcv.where(~use_est, estimate)
+        source = source.where(~use_est, SOURCE_ESTIMATED)
+        uncertainty = uncertainty.where(~use_est, calibration['rmse'])
+
+    return pd.DataFrame({
+        '低位発熱量': lcv,
+        '区分': source,
+        '不確かさ': uncertainty,
+    })
+
+
+def print_lcv_selection_summary(selection):
+    """低位発熱量の選択結果の件数を表示する"""
+    counts = selection['区分'].value_counts()
+    print(f"実測値を使用: {counts.get(SOURCE_MEASURED, 0)} 施設")
+    print(f"計算値を使用: {counts.get(SOURCE_CALC, 0)} 施設")
+    print(f"推定値を使用: {counts.get(SOURCE_ESTIMATED, 0)} 施設")
+    print(f"有効な低位発熱量: {(selection['低位発熱量'] > 0).sum()} 施設")
+    print(f"無効な低位発熱量 (0またはNaN): {selection['低位発熱量'].isnull().sum()} 施設")
@@ -0,0 +1,255 @@
+"""
+線形回帰の説明変数の組み合わせを leave-one-out 交差検証（LOOCV）で総当たりに比べる
+
+Lombardia.ipynb では R1係数 と相関の強い列を順に最大3つ選び、LeaveOneOut の cross_val_score を
+MAE と MSE で2回（それぞれ n 回の学習）実行していた。ここでは説明変数の候補から k 個以下の
+全ての組み合わせを評価する。LOOCV の残差は再学習せずにハット行列の対角 h_i から
+e_i / (1 - h_i) で求める（最小二乗の1回の QR 分解で n 回の再学習と同じ結果になる）。
+MAE・RMSE・予測 R²（PRESS）は同じ残差から1回で計算する。組み合わせの評価は複数のプロセスで並列に行う。
+
+欠損は Lombardia.ipynb と同じく組み合わせごとに、目的変数とその組み合わせの列が揃った行だけを使う。
+行数が説明変数の数 + 2 未満（LOOCV で学習に使う行が切片と係数の数に足りない）の組み合わせや、
+列が一次従属な組み合わせは評価しない。
+
+    python loocv_selection.py --preset lombardia_r1
+    python loocv_selection.py --preset jp_efficiency --max-features 4 --workers 8
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONFIG = {
+    'max_features': 3,
+    # 並べ替えの基準（小さいほど良い指標）
+    'metric': 'loocv_rmse',
+    # 評価するワーカープロセス数（None は CPU 数、1 以下は現在のプロセスで順に評価）
+    'workers': None,
+    # 組み合わせがこれ未満なら並列にしない（プロセスの起動の方が遅い）
+    'parallel_min_subsets': 2_000,
+    # R の対角の最大値に対する比がこれ以下なら一次従属とみなす
+    'rank_tol': 1e-10,
+}
+
+# 目的変数と説明変数の候補の組（features が None なら目的変数と exclude 以外の数値の列全て）
+PRESETS = {
+    'lombardia_r1': {
+        'input_file': os.path.join(BASE_DIR, 'EU', 'ロンバルディア_プロット用_modified_1.0.csv'),
+        'encoding': 'utf-8',
+        'target': 'R1係数',
+        'features': None,
+        'exclude': ['実績年度'],
+        'positive_target': False,
+    },
+    'jp_efficiency': {
+        'input_file': os.path.join(BASE_DIR, '2022_1焼却施設.csv'),
+        'encoding': 'utf-8-sig',
+        'target': '発電能力_発電効率（仕様値・公称値）_％',
+        'features': [
+            '年間処理量_t/年度',
+            '施設全体の処理能力_t/日',
+            '炉数',
+            '使用開始年度',
+            '発電能力_発電能力_kW',
+            '低位発熱量_(計算値)_kJ/kg',
+            '三成分_水分_％',
+            '三成分_可燃分_％',
+            '三成分_灰分_％',
+            '単位容積重量_kg/m3',
+        ],
+        'exclude': [],
+        # 発電効率 0 は発電設備のない施設なので除く
+        'positive_target': True,
+    },
+}
+
+RESULT_COLUMNS = ['特徴量数', '特徴量', '件数', 'train_r2', 'loocv_mae', 'loocv_rmse', 'loocv_r2', '状態']
+
+# ワーカープロセスで共有する説明変数と目的変数（_init_worker で1回だけ受け取る）
+_worker_data = {}
+
+
+def prepare(df, target, features=None, exclude=(), positive_target=False):
+    """
+    目的変数と説明変数の候補を float の配列にする（数値に変換できない値は NaN）。
+
+    Returns:
+        tuple: (説明変数 n × m, 目的変数 n, 説明変数の列名のリスト)
+    """
+    if features is None:
+        numeric = df.select_dtypes(include='number').columns
+        features = [c for c in numeric if c != target and c not in exclude]
+    missing = [c for c in [target, *features] if c not in df.columns]
+    if missing:
+        raise KeyError(f"列がありません: {', '.join(missing)}")
+    y = pd.to_numeric(df[target], errors='coerce').to_numpy(dtype=np.float64)
+    X = np.column_stack([pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float64) for c in features])
+    if positive_target:
+        y = np.where(y > 0, y, np.nan)
+    keep = ~np.isnan(y)
+    return X[keep], y[keep], list(features)
+
+
+def evaluate_subset(X, y, columns, rank_tol=CONFIG['rank_tol']):
+    """
+    説明変数の組み合わせ1つを切片付きの最小二乗で当てはめ、LOOCV の指標を求める。
+
+    LOOCV の残差は e_i / (1 - h_i)（e_i は全ての行で学習した残差、h_i はハット行列の対角）。
+    Q を切片と説明変数の QR 分解の直交行列とすると h_i は Q の i 行目の二乗和になる。
+
+    Returns:
+        tuple: (件数, train_r2, loocv_mae, loocv_rmse, loocv_r2, 状態)
+            状態は 'ok'、'行数不足'、'一次従属'（ok 以外は指標が NaN）
+    """
+    columns = list(columns)
+    rows = ~np.isnan(y)
+    if columns:
+        rows &= ~np.isnan(X[:, columns]).any(axis=1)
+    n, p = int(rows.sum()), len(columns) + 1
+    if n < p + 1:
+        return n, np.nan, np.nan, np.nan, np.nan, '行数不足'
+
+    target = y[rows]
+    features = X[np.ix_(rows, columns)]
+    # 標準化しても予測値は変わらない（桁の大きく違う列の QR 分解を安定させるため）
+    scale = features.std(axis=0)
+    features = (features - features.mean(axis=0)) / np.where(scale > 0, scale, 1.0)
+    design = np.column_stack([np.ones(n), features])
+    Q, R = np.linalg.qr(design)
+    diagonal = np.abs(np.diag(R))
+    if diagonal.min() <= rank_tol * diagonal.max():
+        return n, np.nan, np.nan, np.nan, np.nan, '一次従属'
+
+    fitted = Q @ (Q.T @ target)
+    residual = target - fitted
+    leverage = np.einsum('ij,ij->i', Q, Q)
+    if leverage.max() >= 1.0 - 1e-10:
+        # その行を除くと係数が決まらない（LOOCV の予測ができない）
+        return n, np.nan, np.nan, np.nan, np.nan, '一次従属'
+    loo_residual = residual / (1.0 - leverage)
+
+    total = np.sum((target - target.mean()) ** 2)
+    train_r2 = float(1.0 - np.sum(residual ** 2) / total) if total > 0 else np.nan
+    press = float(np.sum(loo_residual ** 2))
+    return (n, train_r2, float(np.mean(np.abs(loo_residual))), float(np.sqrt(press / n)),
+            1.0 - press / total if total > 0 else np.nan, 'ok')
+
+
+def _init_worker(X, y, rank_tol):
+    _worker_data.update(X=X, y=y, rank_tol=rank_tol)
+
+
+def _evaluate_chunk(subsets):
+    X, y, rank_tol = _worker_data['X'], _worker_data['y'], _worker_data['rank_tol']
+    return [evaluate_subset(X, y, subset, rank_tol) for subset in subsets]
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def feature_subsets(n_features, max_features):
+    """1個から max_features 個までの全ての組み合わせ（列の位置のタプル）"""
+    return [subset for k in range(1, min(max_features, n_features) + 1)
+            for subset in combinations(range(n_features), k)]
+
+
+def select_features(X, y, names, max_features=None, config=CONFIG):
+    """
+    max_features 個以下の全ての説明変数の組み合わせを評価する。
+
+    Args:
+        X (np.ndarray): 説明変数 n × m（欠損は NaN）
+        y (np.ndarray): 目的変数 n
+        names (list): 説明変数の列名
+
+    Returns:
+        pd.DataFrame: 組み合わせごとの RESULT_COLUMNS（評価できた組み合わせを config['metric'] の昇順）
+    """
+    max_features = max_features or config['max_features']
+    subsets = feature_subsets(len(names), max_features)
+    workers = min(config['workers'] or os.cpu_count() or 1, len(subsets))
+    if workers <= 1 or len(subsets) < config['parallel_min_subsets']:
+        results = [evaluate_subset(X, y, subset, config['rank_tol']) for subset in subsets]
+    else:
+        chunks = _chunks(subsets, max(1, len(subsets) // (workers * 8)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(X, y, config['rank_tol'])) as executor:
+            results = [result for chunk in executor.map(_evaluate_chunk, chunks) for result in chunk]
+
+    table = pd.DataFrame(results, columns=RESULT_COLUMNS[2:])
+    table.insert(0, '特徴量', [' + '.join(names[i] for i in subset) for subset in subsets])
+    table.insert(0, '特徴量数', [len(subset) for subset in subsets])
+    table['状態'] = table['状態'].astype('string')
+    ok = table['状態'] == 'ok'
+    return pd.concat([table[ok].sort_values(config['metric'], kind='stable'), table[~ok]], ignore_index=True)
+
+
+def fit_subset(df, target, features, positive_target=False):
+    """
+    選んだ説明変数で全ての行に当てはめた切片と係数（元の単位）。
+
+    Returns:
+        pd.Series: 'intercept' と説明変数ごとの係数
+    """
+    X, y, names = prepare(df, target, features, positive_target=positive_target)
+    rows = ~np.isnan(X).any(axis=1)
+    design = np.column_stack([np.ones(int(rows.sum())), X[rows]])
+    coef, *_ = np.linalg.lstsq(design, y[rows], rcond=None)
+    return pd.Series(coef, index=['intercept', *names])
+
+
+def load_preset(name, input_file=None):
+    """プリセットの入力ファイルを読み込む"""
+    preset = PRESETS[name]
+    path = input_file or preset['input_file']
+    return pd.read_csv(path, encoding=preset['encoding']), preset
+
+
+def main():
+    parser = argparse.ArgumentParser(description='説明変数の組み合わせを LOOCV（ハット行列による閉形式）で総当たりに比べる')
+    parser.add_argument('--preset', choices=list(PRESETS), default='lombardia_r1', help='目的変数と説明変数の候補の組')
+    parser.add_argument('--input', default=None, help='入力CSV（プリセットの input_file を上書き）')
+    parser.add_argument('--target', default=None, help='目的変数（プリセットを上書き）')
+    parser.add_argument('--features', nargs='+', default=None, help='説明変数の候補（プリセットを上書き）')
+    parser.add_argument('--max-features', type=int, default=CONFIG['max_features'], help='組み合わせの最大の個数')
+    parser.add_argument('--metric', choices=['loocv_rmse', 'loocv_mae'], default=CONFIG['metric'], help='並べ替えの基準')
+    parser.add_argument('--workers', type=int, default=CONFIG['workers'], help='ワーカープロセス数')
+    parser.add_argument('--top', type=int, default=10, help='表示する組み合わせの数')
+    parser.add_argument('--output', default=None, help='全ての組み合わせの結果を書き出す CSV')
+    args = parser.parse_args()
+
+    df, preset = load_preset(args.preset, args.input)
+    target = args.target or preset['target']
+    features = args.features or preset['features']
+    X, y, names = prepare(df, target, features, preset['exclude'], preset['positive_target'])
+    config = {**CONFIG, 'metric': args.metric, 'workers': args.workers}
+    print(f"目的変数: {target}（{len(y)} 件）、説明変数の候補: {len(names)} 列")
+
+    results = select_features(X, y, names, args.max_features, config)
+    ok = results[results['状態'] == 'ok']
+    print(f"{len(results):,} 通りの組み合わせを評価しました（評価できた組み合わせ: {len(ok):,}）")
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.max_colwidth', 80):
+        print(f"\n=== {args.metric} の小さい順（上位 {args.top}） ===")
+        print(ok.head(args.top).round(4).to_string(index=False))
+        if not ok.empty:
+            best = ok.iloc[0]['特徴量'].split(' + ')
+            print("\n=== 最良の組み合わせの係数（全ての行で学習） ===")
+            print(fit_subset(df, target, best, preset['positive_target']).to_string())
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        results.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"\n結果を {args.output} に出力しました。")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
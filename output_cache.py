@@ -0,0 +1,248 @@
+"""
+出力ファイル（図・CSV・HTML）の内容アドレス型キャッシュ
+
+入力データ・パラメータ・コードのハッシュからキーを計算し、キーと生成済みファイルの対応を
+マニフェスト（JSON）に記録する。同じキーの出力が既にあり、その後変更されていなければ再生成を省略できる。
+"""
+
+import contextlib
+import hashlib
+import inspect
+import json
+import os
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MANIFEST = os.environ.get(
+    'OUTPUT_CACHE_MANIFEST',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'result', '.cache', 'manifest.json'),
+)
+
+# キャッシュを無効化する場合は環境変数 OUTPUT_CACHE=0 を指定する
+CACHE_ENABLED = os.environ.get('OUTPUT_CACHE', '1') != '0'
+
+_file_hash_memo = {}
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """ファイル内容の SHA-256（同一プロセス内ではサイズと更新時刻が同じなら再計算しない）"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _file_hash_memo:
+        return _file_hash_memo[memo_key]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _file_hash_memo[memo_key] = digest
+    return digest
+
+
+def _update_hash(h, value):
+    """値の種類に応じてハッシュを更新する"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        h.update(b'frame')
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        names = value.columns if isinstance(value, pd.DataFrame) else [value.name]
+        h.update(repr([str(c) for c in names]).encode('utf-8'))
+    elif isinstance(value, pd.Index):
+        _update_hash(h, value.to_series())
+    elif isinstance(value, np.ndarray):
+        h.update(b'ndarray')
+        h.update(str(value.dtype).encode('utf-8'))
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, bytes):
+        h.update(value)
+    elif isinstance(value, dict):
+        for k in sorted(value, key=str):
+            h.update(str(k).encode('utf-8'))
+            _update_hash(h, value[k])
+    elif isinstance(value, (list, tuple)):
+        h.update(f'seq{len(value)}'.encode('utf-8'))
+        for v in value:
+            _update_hash(h, v)
+    elif callable(value):
+        h.update(code_version(value).encode('utf-8'))
+    else:
+        h.update(repr(value).encode('utf-8'))
+
+
+def code_version(*objs):
+    """関数・モジュール・ソースファイルのパスから、そのソースファイルの内容のハッシュを返す"""
+    h = hashlib.sha256()
+    for obj in objs:
+        # デコレータで包んだ関数は元の関数のソースファイルを使う
+        path = obj if isinstance(obj, str) else inspect.getsourcefile(inspect.unwrap(obj))
+        h.update(file_digest(path).encode('utf-8') if path and os.path.exists(path) else repr(obj).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def compute_key(data=None, params=None, code=None, input_files=None):
+    """
+    入力データ・パラメータ・コードからキャッシュキーを計算する。
+
+    Args:
+        data: DataFrame / Series / ndarray / それらのリストや辞書（出力に使うデータの切り出し）
+        params (dict): 出力に影響するパラメータ
+        code (list): 関数・モジュール・ソースファイルのパス（内容が変わればキーも変わる）
+        input_files (list): 入力ファイルのパス（内容のハッシュを使う）
+    """
+    h = hashlib.sha256()
+    _update_hash(h, data)
+    _update_hash(h, params or {})
+    for obj in code or []:
+        h.update(code_version(obj).encode('utf-8'))
+    for path in input_files or []:
+        h.update(file_digest(path).encode('utf-8'))
+    return h.hexdigest()
+
+
+@contextlib.contextmanager
+def _locked(manifest_path):
+    """マニフェストの読み書きを複数プロセス間で排他する"""
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(manifest_path + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'entries': {}}
+
+
+def _artifact_record(path):
+    stat = os.stat(path)
+    return {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+
+def _artifact_unchanged(record):
+    try:
+        stat = os.stat(record['path'])
+    except OSError:
+        return False
+    return stat.st_size == record['size'] and stat.st_mtime_ns == record['mtime_ns']
+
+
+def lookup(key, outputs=None, manifest_path=DEFAULT_MANIFEST):
+    """
+    キーに対応する生成済みファイルを返す。
+
+    Args:
+        key (str): compute_key で計算したキー
+        outputs (list): 期待する出力パス（指定時は全てが同じキーで生成済みの場合のみヒット）
+        manifest_path (str): マニフェストのパス
+
+    Returns:
+        list: 生成済みファイルのパス（ミスの場合は None）
+    """
+    if not CACHE_ENABLED:
+        return None
+    return _fresh_paths(_read_manifest(manifest_path)['entries'].get(key), outputs)
+
+
+def _fresh_paths(entry, outputs=None):
+    """エントリの生成済みファイルが変更されておらず、期待する出力を全て含むならそのパスを返す"""
+    if entry is None:
+        return None
+    artifacts = entry['artifacts']
+    if not artifacts or not all(_artifact_unchanged(a) for a in artifacts):
+        return None
+    paths = [a['path'] for a in artifacts]
+    if outputs is not None and set(map(os.path.abspath, outputs)) - set(paths):
+        return None
+    return paths
+
+
+def record(key, outputs, manifest_path=DEFAULT_MANIFEST, **metadata):
+    """生成したファイルをキーと対応付けてマニフェストに記録する"""
+    record_many([(key, outputs, metadata)], manifest_path)
+
+
+def record_many(items, manifest_path=DEFAULT_MANIFEST):
+    """複数の (キー, 出力パスのリスト, メタデータ) をまとめてマニフェストに記録する"""
+    if not CACHE_ENABLED or not items:
+        return
+    created = datetime.now().isoformat(timespec='seconds')
+    with _locked(manifest_path):
+        manifest = _read_manifest(manifest_path)
+        for key, outputs, metadata in items:
+            outputs = [o for o in outputs if os.path.exists(o)]
+            manifest['entries'][key] = {
+                'artifacts': [_artifact_record(o) for o in outputs],
+                'created': created,
+                **(metadata or {}),
+            }
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, manifest_path)
+
+
+def is_fresh(key, outputs, manifest_path=DEFAULT_MANIFEST):
+    """指定した出力が全て同じキーで生成済みかどうか"""
+    return lookup(key, outputs, manifest_path) is not None
+
+
+def fresh_flags(items, manifest_path=DEFAULT_MANIFEST):
+    """
+    複数の (キー, 出力パスのリスト) について生成済みかどうかをまとめて判定する（マニフェストは1回だけ読む）。
+
+    Returns:
+        list: 各要素が生成済みなら True（キーが None の要素は False）
+    """
+    if not CACHE_ENABLED:
+        return [False] * len(items)
+    entries = _read_manifest(manifest_path)['entries']
+    return [key is not None and _fresh_paths(entries.get(key), outputs) is not None
+            for key, outputs in items]
+
+
+def write_csv(df, path, manifest_path=DEFAULT_MANIFEST, **to_csv_kwargs):
+    """
+    DataFrame / Series を CSV に書き出す。同じ内容・書式で書き出した CSV が変更されずに残っていれば書き直さない。
+
+    Returns:
+        bool: 書き出した場合は True（省略した場合は False）
+    """
+    key = compute_key(data=df, params={'output': os.path.abspath(path), 'to_csv': to_csv_kwargs,
+                                       'pandas': pd.__version__})
+    if is_fresh(key, [path], manifest_path):
+        return False
+    df.to_csv(path, **to_csv_kwargs)
+    record(key, [path], manifest_path, kind='csv')
+    return True
+
+
+def prune(manifest_path=DEFAULT_MANIFEST):
+    """存在しない・変更されたファイルを指すエントリをマニフェストから削除し、削除件数を返す"""
+    with _locked(manifest_path):
+        manifest = _read_manifest(manifest_path)
+        stale = [k for k, e in manifest['entries'].items()
+                 if not all(_artifact_unchanged(a) for a in e['artifacts'])]
+        for k in stale:
+            del manifest['entries'][k]
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+    return len(stale)
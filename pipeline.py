@@ -0,0 +1,360 @@
+"""
+分析スクリプトを依存関係（DAG）に従って実行するパイプライン
+
+各スクリプトを入力ファイルと出力ファイルを持つノードとして宣言し、あるノードの入力を出力する
+ノードを上流とみなして実行順を決める。依存関係のないノードは --jobs で指定した数まで並列に実行し、
+実行可能なノードの中では「そのノードから終端までの最長経路（前回の実行時間で見積もる）」が長いものを
+優先するため、全体の実行時間は各スクリプトの合計ではなくクリティカルパスに近くなる。
+
+入力ファイル・スクリプト・引数が前回と同じで出力が変更されていないノードは、make と同様に実行を省略する
+（判定には output_cache の内容ハッシュを使うため、上流を再実行しても出力が同じなら下流は省略される）。
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import output_cache
+
+CONFIG = {
+    # ノードのパスの基準（各スクリプトはこのディレクトリをカレントディレクトリとして実行する）
+    'root': os.path.dirname(os.path.abspath(__file__)),
+    # ノードごとの標準出力・標準エラー出力の保存先
+    'log_dir': os.path.join('result', 'logs'),
+    # ノードごとの前回の実行時間（クリティカルパスの見積もりに使う）
+    'timings_file': os.path.join('result', '.cache', 'pipeline_timings.json'),
+}
+
+SOURCE_CSV = '2022_1焼却施設.csv'
+RESULT_DIR = 'result'
+
+# incineration.py のサブコマンドに渡す入力・出力先（ノードのパスと同じファイルを使わせる）
+CLI_PATHS = ['--input', f'{{root}}/{SOURCE_CSV}', '--output-dir', f'{{root}}/{RESULT_DIR}']
+
+
+def make_node(name, script, inputs, outputs, code=None, args=None):
+    """
+    パイプラインのノードを作成する。
+
+    Args:
+        name (str): ノード名
+        script (str): 実行するスクリプト（CONFIG['root'] からの相対パス）
+        inputs (list): 読み込むファイル
+        outputs (list): 書き出すファイル（標準出力のログは自動で出力に加わる）
+        code (list): スクリプトが使う共通モジュールのファイル（内容が変われば再実行する）
+        args (list): スクリプトに渡すコマンドライン引数（'{root}' はパスの基準ディレクトリに置き換える）
+    """
+    return {
+        'name': name,
+        'script': script,
+        'inputs': list(inputs),
+        'outputs': list(outputs),
+        'code': list(code or []),
+        'args': list(args or []),
+    }
+
+
+def cli_node(name, command, inputs, outputs, code=None):
+    """incineration.py のサブコマンドを入力・出力先を指定して実行するノード"""
+    return make_node(name, 'incineration.py', inputs, outputs, code=['config.py', 'instrumentation.py', *(code or [])],
+                     args=[command, *CLI_PATHS])
+
+
+NODES = [
+    make_node('format_csv', 'format_csv.py', [SOURCE_CSV], ['formatted_data.csv']),
+    cli_node('calculate_statistics', 'stats', [SOURCE_CSV],
+             ['result/heat_utilization_results_all.csv', 'result/heat_utilization_results_filtered.csv'],
+             code=['calculate_statistics.py', 'lcv_estimation.py', 'imputation.py', 'result_store.py']),
+    cli_node('power_generation_analysis', 'power', [SOURCE_CSV],
+             ['result/power_generation_results_filtered.csv', 'result/power_generation_results_all.csv'],
+             code=['power_generation_analysis.py', 'lcv_estimation.py', 'imputation.py', 'result_store.py']),
+    # 図は stats / power の結果（result/store または結果CSV）と入力CSVからまとめて描画する
+    cli_node('plots', 'plots',
+             [SOURCE_CSV, 'result/heat_utilization_results_filtered.csv', 'result/heat_utilization_results_all.csv',
+              'result/power_generation_results_filtered.csv', 'result/power_generation_results_all.csv'],
+             ['result/heat_utilization_analysis.png', 'result/power_generation_analysis.png',
+              'result/power_generation_utilization_rate_histogram.png',
+              'result/recalculated_utilization_histogram.png', 'result/power_generation_efficiency_histogram.png'],
+             code=['plot_analysis.py', 'plot_power_generation.py', 'plot_utilization_histogram.py',
+                   'replot_utilization_histogram.py', 'plot_efficiency_histogram.py', 'result_store.py',
+                   'figure_rendering.py', 'density_scatter.py', 'jp_font.py']),
+    cli_node('lcv_analysis', 'lcv', [SOURCE_CSV],
+             ['result/lcv_vs_capacity.png', 'result/lcv_vs_years.png'],
+             code=['LCV_Analysis.py', 'figure_rendering.py', 'density_scatter.py', 'jp_font.py']),
+    cli_node('power_efficiency_statistics', 'efficiency', [SOURCE_CSV],
+             ['result/heat_utilization_ratio_histogram.png', 'result/heat_utilization_ratio_results_filtered.csv'],
+             code=['power_efficiency_statistics.py', 'binning.py', 'data_quality_rules.py', 'imputation.py',
+                   'figure_rendering.py', 'jp_font.py']),
+    cli_node('method_counts', 'method-count', [SOURCE_CSV],
+             ['result/implementation_method_counts_full.csv', 'result/implementation_method_counts_grouped.csv',
+              'result/implementation_method_counts_full.png', 'result/implementation_method_counts_grouped.png'],
+             code=['運営体分析.py', 'figure_rendering.py', 'jp_font.py']),
+    make_node('data_quality', 'data_quality_rules.py', [SOURCE_CSV], ['result/data_quality_violations.csv'],
+              args=['--input', f'{{root}}/{SOURCE_CSV}', '--output', f'{{root}}/{RESULT_DIR}/data_quality_violations.csv']),
+    cli_node('describe_data', 'describe', [SOURCE_CSV], [],
+             code=['describe_data.py', 'binning.py', 'facility_listing.py', 'data_quality_rules.py']),
+    make_node('power_capacity_analysis', 'power_capacity_analysis.py', [SOURCE_CSV], [],
+              code=['binning.py', 'facility_listing.py', 'data_quality_rules.py'],
+              args=[f'{{root}}/{SOURCE_CSV}']),
+]
+
+
+def node_args(node, root=None):
+    """ノードのコマンドライン引数（'{root}' をパスの基準ディレクトリに置き換えたもの）"""
+    root = root or CONFIG['root']
+    return [arg.replace('{root}', root) for arg in node['args']]
+
+
+def log_path(node, root=None):
+    return os.path.join(root or CONFIG['root'], CONFIG['log_dir'], f"{node['name']}.log")
+
+
+def build_graph(nodes):
+    """
+    ノードの上流（入力を出力するノード）を求め、トポロジカル順に並べる。
+
+    Returns:
+        tuple: (ノード名 → 上流のノード名の集合, トポロジカル順のノード名のリスト)
+
+    Raises:
+        ValueError: ノード名・出力の重複または循環がある場合
+    """
+    producers = {}
+    for node in nodes:
+        if node['name'] in {n['name'] for n in nodes if n is not node}:
+            raise ValueError(f"ノード名が重複しています: {node['name']}")
+        for path in node['outputs']:
+            if path in producers:
+                raise ValueError(f"出力 {path} を複数のノードが書き出しています: {producers[path]}, {node['name']}")
+            producers[path] = node['name']
+
+    deps = {node['name']: {producers[p] for p in node['inputs'] if p in producers} - {node['name']}
+            for node in nodes}
+
+    # Kahn のアルゴリズム（宣言順をなるべく保つ）
+    remaining = {name: set(d) for name, d in deps.items()}
+    order = []
+    while remaining:
+        ready = [n['name'] for n in nodes if n['name'] in remaining and not remaining[n['name']]]
+        if not ready:
+            raise ValueError(f"依存関係が循環しています: {sorted(remaining)}")
+        for name in ready:
+            order.append(name)
+            del remaining[name]
+        for d in remaining.values():
+            d.difference_update(ready)
+    return deps, order
+
+
+def select_nodes(deps, targets):
+    """指定したノードとその上流をすべて含むノード名の集合"""
+    unknown = set(targets) - set(deps)
+    if unknown:
+        raise ValueError(f"未定義のノードです: {sorted(unknown)}")
+    selected, stack = set(), list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(deps[name])
+    return selected
+
+
+def critical_path_lengths(deps, order, durations):
+    """各ノードから終端までの最長経路の長さ（ノードの実行時間の合計）"""
+    downstream = {name: [] for name in order}
+    for name, d in deps.items():
+        for up in d:
+            downstream[up].append(name)
+    lengths = {}
+    for name in reversed(order):
+        lengths[name] = durations.get(name, 1.0) + max((lengths[n] for n in downstream[name]), default=0.0)
+    return lengths
+
+
+def node_cache_key(node, root=None):
+    """入力ファイル・スクリプト・共通モジュール・引数からノードのキャッシュキーを計算する"""
+    root = root or CONFIG['root']
+    missing = [p for p in node['inputs'] if not os.path.exists(os.path.join(root, p))]
+    if missing:
+        raise FileNotFoundError(f"入力ファイルが見つかりません: {', '.join(missing)}")
+    return output_cache.compute_key(
+        params={'node': node['name'], 'args': node_args(node, root)},
+        code=[os.path.join(root, p) for p in [node['script'], *node['code']]],
+        input_files=[os.path.join(root, p) for p in node['inputs']],
+    )
+
+
+def node_outputs(node, root=None):
+    """ノードの出力（ログを含む）の絶対パス"""
+    root = root or CONFIG['root']
+    return [os.path.join(root, p) for p in node['outputs']] + [log_path(node, root)]
+
+
+def run_node(node, root=None):
+    """
+    ノードのスクリプトを別プロセスで実行する（出力はログファイルに保存）。
+
+    Returns:
+        tuple: (成功したか, 実行時間[秒], エラーメッセージ)
+    """
+    root = root or CONFIG['root']
+    log = log_path(node, root)
+    os.makedirs(os.path.dirname(log), exist_ok=True)
+    env = dict(os.environ, MPLBACKEND='Agg', PYTHONUNBUFFERED='1')
+    start = time.perf_counter()
+    with open(log, 'w', encoding='utf-8') as f:
+        proc = subprocess.run([sys.executable, node['script'], *node_args(node, root)], cwd=root, env=env,
+                              stdout=f, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        return False, elapsed, f"終了コード {proc.returncode}（ログ: {log}）"
+    missing = [p for p in node['outputs'] if not os.path.exists(os.path.join(root, p))]
+    if missing:
+        return False, elapsed, f"出力が作成されませんでした: {', '.join(missing)}（ログ: {log}）"
+    return True, elapsed, None
+
+
+def _load_timings(root):
+    try:
+        with open(os.path.join(root, CONFIG['timings_file']), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_timings(root, timings):
+    path = os.path.join(root, CONFIG['timings_file'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(timings, f, ensure_ascii=False, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def run_pipeline(nodes=NODES, targets=None, jobs=None, force=False, dry_run=False, root=None):
+    """
+    パイプラインを実行する。
+
+    Args:
+        nodes (list): make_node で作成したノード
+        targets (list): 実行するノード名（その上流も実行する。省略時はすべて）
+        jobs (int): 同時に実行するノード数（None は CPU 数）
+        force (bool): 入力が変わっていないノードも実行する
+        dry_run (bool): 実行せず、実行が必要なノードを表示する
+        root (str): パスの基準ディレクトリ（省略時は CONFIG['root']）
+
+    Returns:
+        dict: ノード名 → 状態（'実行' / '省略' / '失敗' / '未実行'）
+    """
+    root = root or CONFIG['root']
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    by_name = {n['name']: n for n in nodes}
+    deps, order = build_graph(nodes)
+    selected = select_nodes(deps, targets) if targets else set(order)
+    order = [name for name in order if name in selected]
+
+    timings = _load_timings(root)
+    priority = critical_path_lengths({n: deps[n] & selected for n in order}, order, timings)
+
+    status, elapsed, errors = {}, {}, {}
+    if dry_run:
+        for name in order:
+            stale = force or any(status[d] == '実行' for d in deps[name] & selected)
+            if not stale:
+                try:
+                    key = node_cache_key(by_name[name], root)
+                    stale = not output_cache.is_fresh(key, node_outputs(by_name[name], root))
+                except FileNotFoundError:
+                    stale = True
+            status[name] = '実行' if stale else '省略'
+            print(f"{status[name]}: {name}")
+        return status
+
+    wall_start = time.perf_counter()
+    keys, running, records = {}, {}, []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while len(status) < len(order):
+            ready = [name for name in order if name not in status and name not in running
+                     and all(status.get(d) in ('実行', '省略') for d in deps[name] & selected)]
+            # 上流が失敗したノードは実行しない
+            for name in order:
+                if name not in status and any(status.get(d) in ('失敗', '未実行') for d in deps[name] & selected):
+                    status[name] = '未実行'
+                    print(f"未実行（上流が失敗）: {name}")
+
+            for name in sorted((n for n in ready if n not in status), key=lambda n: -priority[n]):
+                if len(running) >= jobs:
+                    break
+                node = by_name[name]
+                try:
+                    keys[name] = node_cache_key(node, root)
+                except FileNotFoundError as e:
+                    status[name], errors[name] = '失敗', str(e)
+                    print(f"失敗: {name}: {e}")
+                    continue
+                if not force and output_cache.is_fresh(keys[name], node_outputs(node, root)):
+                    status[name] = '省略'
+                    print(f"変更がないため省略しました: {name}")
+                    continue
+                print(f"実行中: {name}")
+                running[name] = executor.submit(run_node, node, root)
+
+            if not running:
+                continue
+            done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for name in [n for n, future in running.items() if future in done]:
+                ok, seconds, error = running.pop(name).result()
+                elapsed[name] = timings[name] = seconds
+                if ok:
+                    status[name] = '実行'
+                    records.append((keys[name], node_outputs(by_name[name], root),
+                                    {'kind': 'pipeline', 'node': name, 'seconds': round(seconds, 3)}))
+                    print(f"完了: {name}（{seconds:.1f} 秒）")
+                else:
+                    status[name], errors[name] = '失敗', error
+                    print(f"失敗: {name}: {error}")
+
+    output_cache.record_many(records)
+    _save_timings(root, timings)
+    wall = time.perf_counter() - wall_start
+
+    print("\n=== パイプラインの実行結果 ===")
+    for name in order:
+        seconds = f"{elapsed[name]:6.1f} 秒" if name in elapsed else ''
+        print(f"{status[name]:<4} {name:<32} {seconds}")
+    ran = {n: elapsed[n] for n in elapsed}
+    if ran:
+        critical = max(critical_path_lengths({n: deps[n] & set(ran) for n in ran},
+                                             [n for n in order if n in ran], ran).values())
+        print(f"\n経過時間: {wall:.1f} 秒（各ノードの合計 {sum(ran.values()):.1f} 秒、クリティカルパス {critical:.1f} 秒）")
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分析スクリプトを依存関係に従って実行する')
+    parser.add_argument('targets', nargs='*', help='実行するノード（上流も実行する。省略時はすべて）')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='同時に実行するノード数（既定: CPU 数）')
+    parser.add_argument('--force', action='store_true', help='入力が変わっていないノードも実行する')
+    parser.add_argument('--dry-run', action='store_true', help='実行せず、実行が必要なノードを表示する')
+    parser.add_argument('--list', action='store_true', help='ノードと依存関係を表示する')
+    args = parser.parse_args()
+
+    if args.list:
+        deps, order = build_graph(NODES)
+        for name in order:
+            after = f" <- {', '.join(sorted(deps[name]))}" if deps[name] else ''
+            print(f"{name}{after}")
+        return
+
+    status = run_pipeline(NODES, targets=args.targets or None, jobs=args.jobs, force=args.force,
+                          dry_run=args.dry_run)
+    if '失敗' in status.values():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,110 +1,108 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-import matplotlib as mpl
-from scipy.stats import pearsonr
-
-# 日本語フォントの設定
-mpl.rcParams['font.family'] = 'DejaVu Sans, M+ 1C'
-plt.rcParams['font.size'] = 12
-
-# CSVファイルを読み込み
-df_filtered = pd.read_csv('/home/ubuntu/cur/program/Analyisis_incineration/result/power_generation_results_filtered.csv', encoding='utf-8-sig')
-df_all = pd.read_csv('/home/ubuntu/cur/program/Analyisis_incineration/result/power_generation_results_all.csv', encoding='utf-8-sig')
-
-# プロット作成（縦2行 × 横5列）
-fig, axes = plt.subplots(2, 5, figsize=(25, 12))
-fig.suptitle('Power Generation Analysis', fontsize=16)
-
-# --- 1行目: 発電利用率 ---
-
-# データの抽出
-annual_heat_all = df_all['年間発熱量_MJ']
-utilization_rate_all = df_all['発電利用率']
-annual_heat_filtered = df_filtered['年間発熱量_MJ']
-utilization_rate_filtered = df_filtered['発電利用率']
-
-# 列1: 外れ値除去前の散布図（全データ）
-axes[0, 0].scatter(annual_heat_all, utilization_rate_all, alpha=0.5)
-axes[0, 0].set_xlabel('Annual Heat Generation (MJ)')
-axes[0, 0].set_ylabel('Power Generation Utilization Rate')
-axes[0, 0].set_title('All Data\nBefore Outlier Removal')
-axes[0, 0].grid(True, alpha=0.3)
-
-# 列2: 外れ値除去後の散布図
-axes[0, 1].scatter(annual_heat_filtered, utilization_rate_filtered, alpha=0.5, color='green')
-axes[0, 1].set_xlabel('Annual Heat Generation (MJ)')
-axes[0, 1].set_ylabel('Power Generation Utilization Rate')
-axes[0, 1].set_title('Filtered Data\nAfter Outlier Removal')
-axes[0, 1].grid(True, alpha=0.3)
-
-# 列3: 外れ値除去後の散布図（通常スケール）
-axes[0, 2].scatter(annual_heat_filtered, utilization_rate_filtered, alpha=0.6, color='green')
-axes[0, 2].set_xlabel('Annual Heat Generation (MJ)')
-axes[0, 2].set_ylabel('Power Generation Utilization Rate')
-corr, p_value = pearsonr(annual_heat_filtered, utilization_rate_filtered)
-axes[0, 2].set_title(f'Filtered Data (Normal Scale)\nCorr: {corr:.2f}, P: {p_value:.3f}')
-axes[0, 2].grid(True, alpha=0.3)
-
-# 列4: 外れ値除去後の散布図（対数スケール）
-axes[0, 3].scatter(annual_heat_filtered, utilization_rate_filtered, alpha=0.6, color='green')
-axes[0, 3].set_xlabel('Annual Heat Generation (MJ)')
-axes[0, 3].set_ylabel('Power Generation Utilization Rate')
-axes[0, 3].set_xscale('log')
-corr, p_value = pearsonr(annual_heat_filtered, utilization_rate_filtered)
-axes[0, 3].set_title(f'Filtered Data (Log Scale)\nCorr: {corr:.2f}, P: {p_value:.3f}')
-axes[0, 3].grid(True, alpha=0.3)
-
-# 列5: 利用率のヒストグラム
-axes[0, 4].hist(utilization_rate_filtered, bins=20, alpha=0.7, color='green', edgecolor='black')
-axes[0, 4].set_xlabel('Power Generation Utilization Rate')
-axes[0, 4].set_ylabel('Frequency')
-axes[0, 4].set_title('Utilization Rate Distribution')
-axes[0, 4].grid(True, alpha=0.3)
-
-# --- 2行目: 設備利用率 ---
-
-# データの抽出
-facility_utilization_rate_all = df_all['設備利用率']
-facility_utilization_rate_filtered = df_filtered['設備利用率']
-
-# 列1: 外れ値除去前の散布図（全データ）
-axes[1, 0].scatter(annual_heat_all, facility_utilization_rate_all, alpha=0.5, color='purple')
-axes[1, 0].set_xlabel('Annual Heat Generation (MJ)')
-axes[1, 0].set_ylabel('Facility Utilization Rate')
-axes[1, 0].set_title('All Data\nBefore Outlier Removal')
-axes[1, 0].grid(True, alpha=0.3)
-
-# 列2: 外れ値除去後の散布図
-axes[1, 1].scatter(annual_heat_filtered, facility_utilization_rate_filtered, alpha=0.5, color='orange')
-axes[1, 1].set_xlabel('Annual Heat Generation (MJ)')
-axes[1, 1].set_ylabel('Facility Utilization Rate')
-axes[1, 1].set_title('Filtered Data\nAfter Outlier Removal')
-axes[1, 1].grid(True, alpha=0.3)
-
-# 列3: 外れ値除去後の散布図（通常スケール）
-axes[1, 2].scatter(annual_heat_filtered, facility_utilization_rate_filtered, alpha=0.6, color='orange')
-axes[1, 2].set_xlabel('Annual Heat Generation (MJ)')
-axes[1, 2].set_ylabel('Facility Utilization Rate')
-corr, p_value = pearsonr(annual_heat_filtered, facility_utilization_rate_filtered)
-axes[1, 2].set_title(f'Filtered Data (Normal Scale)\nCorr: {corr:.2f}, P: {p_value:.3f}')
-axes[1, 2].grid(True, alpha=0.3)
-
-# 列4: 外れ値除去後の散布図（対数スケール）
-axes[1, 3].scatter(annual_heat_filtered, facility_utilization_rate_filtered, alpha=0.6, color='orange')
-axes[1, 3].set_xlabel('Annual Heat Generation (MJ)')
-axes[1, 3].set_ylabel('Facility Utilization Rate')
-axes[1, 3].set_xscale('log')
-corr, p_value = pearsonr(annual_heat_filtered, facility_utilization_rate_filtered)
-axes[1, 3].set_title(f'Filtered Data (Log Scale)\nCorr: {corr:.2f}, P: {p_value:.3f}')
-axes[1, 3].grid(True, alpha=0.3)
-
-# 列5: 利用率のヒストグラム
-axes[1, 4].hist(facility_utilization_rate_filtered, bins=20, alpha=0.7, color='orange', edgecolor='black')
-axes[1, 4].set_xlabel('Facility Utilization Rate')
-axes[1, 4].set_ylabel('Frequency')
-axes[1, 4].set_title('Facility Utilization Rate Distribution')
-axes[1, 4].grid(True, alpha=0.3)
-
-plt.tight_layout(rect=[0, 0, 1, 0.96])
-plt.savefig('/home/ubuntu/cur/program/Analyisis_incineration/result/power_generation_analysis.png', dpi=300, bbox_inches='tight')
-plt.show()
+
+from density_scatter import DENSITY_THRESHOLD, density_scatter
+from figure_rendering import make_job, render_figures
+from result_store import load_result
+
+INPUT_FILTERED = '/home/ubuntu/cur/program/Analyisis_incineration/result/power_generation_results_filtered.csv'
+INPUT_ALL = '/home/ubuntu/cur/program/Analyisis_incineration/result/power_generation_results_all.csv'
+OUTPUT_PATH = '/home/ubuntu/cur/program/Analyisis_incineration/result/power_generation_analysis.png'
+
+# 各行の設定: (列名, 軸ラベル, 全データの色, 外れ値除去後の色, ヒストグラムのタイトル)
+ROWS = [
+    ('発電利用率', 'Power Generation Utilization Rate', None, 'green', 'Utilization Rate Distribution'),
+    ('設備利用率', 'Facility Utilization Rate', 'purple', 'orange', 'Facility Utilization Rate Distribution'),
+]
+
+# 描画に使う列（結果の保存先からはこの列だけ読み込む）
+COLUMNS = ['年間発熱量_MJ', *(row[0] for row in ROWS)]
+
+
+def draw_power_generation_grid(df_filtered, df_all, density_threshold=DENSITY_THRESHOLD):
+    """
+    発電利用率・設備利用率の散布図・ヒストグラム（縦2行 × 横5列）を描画する。
+    点数が density_threshold を超える散布図は 2 次元ヒストグラムで表示する。
+    """
+    from scipy.stats import pearsonr
+
+    fig, axes = plt.subplots(2, 5, figsize=(25, 12))
+    fig.suptitle('Power Generation Analysis', fontsize=16)
+
+    annual_heat_all = df_all['年間発熱量_MJ']
+    annual_heat_filtered = df_filtered['年間発熱量_MJ']
+
+    for row, (col, label, color_all, color_filtered, hist_title) in enumerate(ROWS):
+        # データの抽出
+        rate_all = df_all[col]
+        rate_filtered = df_filtered[col]
+
+        # 列1: 外れ値除去前の散布図（全データ）
+        density_scatter(axes[row, 0], annual_heat_all, rate_all, threshold=density_threshold,
+                        alpha=0.5, color=color_all)
+        axes[row, 0].set_xlabel('Annual Heat Generation (MJ)')
+        axes[row, 0].set_ylabel(label)
+        axes[row, 0].set_title('All Data\nBefore Outlier Removal')
+        axes[row, 0].grid(True, alpha=0.3)
+
+        # 列2: 外れ値除去後の散布図
+        density_scatter(axes[row, 1], annual_heat_filtered, rate_filtered, threshold=density_threshold,
+                        alpha=0.5, color=color_filtered)
+        axes[row, 1].set_xlabel('Annual Heat Generation (MJ)')
+        axes[row, 1].set_ylabel(label)
+        axes[row, 1].set_title('Filtered Data\nAfter Outlier Removal')
+        axes[row, 1].grid(True, alpha=0.3)
+
+        corr, p_value = pearsonr(annual_heat_filtered, rate_filtered)
+
+        # 列3: 外れ値除去後の散布図（通常スケール）
+        density_scatter(axes[row, 2], annual_heat_filtered, rate_filtered, threshold=density_threshold,
+                        alpha=0.6, color=color_filtered)
+        axes[row, 2].set_xlabel('Annual Heat Generation (MJ)')
+        axes[row, 2].set_ylabel(label)
+        axes[row, 2].set_title(f'Filtered Data (Normal Scale)\nCorr: {corr:.2f}, P: {p_value:.3f}')
+        axes[row, 2].grid(True, alpha=0.3)
+
+        # 列4: 外れ値除去後の散布図（対数スケール）
+        density_scatter(axes[row, 3], annual_heat_filtered, rate_filtered, threshold=density_threshold,
+                        xlog=True, alpha=0.6, color=color_filtered)
+        axes[row, 3].set_xlabel('Annual Heat Generation (MJ)')
+        axes[row, 3].set_ylabel(label)
+        axes[row, 3].set_title(f'Filtered Data (Log Scale)\nCorr: {corr:.2f}, P: {p_value:.3f}')
+        axes[row, 3].grid(True, alpha=0.3)
+
+        # 列5: 利用率のヒストグラム
+        axes[row, 4].hist(rate_filtered, bins=20, alpha=0.7, color=color_filtered, edgecolor='black')
+        axes[row, 4].set_xlabel(label)
+        axes[row, 4].set_ylabel('Frequency')
+        axes[row, 4].set_title(hist_title)
+        axes[row, 4].grid(True, alpha=0.3)
+
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+    return fig
+
+
+def build_jobs(df_filtered, df_all, output_path=OUTPUT_PATH):
+    """描画ジョブを作成する"""
+    return [
+        make_job(draw_power_generation_grid, output_path,
+                 kwargs={'df_filtered': df_filtered, 'df_all': df_all},
+                 savefig={'dpi': 300, 'bbox_inches': 'tight'}),
+    ]
+
+
+def main(df_filtered=None, df_all=None, output_path=OUTPUT_PATH):
+    """
+    図を描画する。df_filtered / df_all（分析の外れ値除去後・除去前の結果）を渡した場合は
+    結果の保存先を読み込まない。
+    """
+    # 結果の保存先から読み込み（なければ結果CSV）
+    if df_filtered is None:
+        df_filtered = load_result('power_generation_filtered', INPUT_FILTERED, columns=COLUMNS)
+    if df_all is None:
+        df_all = load_result('power_generation_all', INPUT_ALL, columns=COLUMNS)
+
+    render_figures(build_jobs(df_filtered, df_all, output_path))
+
+
+if __name__ == '__main__':
+    main()
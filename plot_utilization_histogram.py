@@ -1,18 +1,50 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-import matplotlib as mpl
 
-# 日本語フォントの設定
-mpl.rcParams['font.family'] = 'DejaVu Sans, M+ 1C'
-plt.rcParams['font.size'] = 12
+from figure_rendering import make_job, render_figures
+from result_store import load_result
 
-def plot_power_generation_utilization_histogram():
+INPUT_PATH = '/home/ubuntu/cur/program/Analyisis_incineration/result/power_generation_results_filtered.csv'
+OUTPUT_PATH = '/home/ubuntu/cur/program/Analyisis_incineration/result/power_generation_utilization_rate_histogram.png'
+
+
+def draw_utilization_histogram(utilization_rate):
+    """発電利用率のヒストグラムと統計情報を描画する"""
+    mean_val = utilization_rate.mean()
+    median_val = utilization_rate.median()
+    std_val = utilization_rate.std()
+    count_val = len(utilization_rate)
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+
+    ax.hist(utilization_rate, bins=20, alpha=0.7, color='green', edgecolor='black')
+
+    ax.set_title(f'図1: 発電利用率の分布')
+    ax.set_xlabel('発電利用率')
+    ax.set_ylabel('施設数')
+    ax.grid(True)
+
+    # 統計情報をテキストとしてプロットに追加
+    stats_text = (
+        f"施設数: {count_val}\n"
+        f"平均値: {mean_val:.3f}\n"
+        f"中央値: {median_val:.3f}\n"
+        f"標準偏差: {std_val:.3f}"
+    )
+    ax.text(0.95, 0.95, stats_text, transform=ax.transAxes,
+            fontsize=10, verticalalignment='top', horizontalalignment='right',
+            bbox=dict(boxstyle='round,pad=0.5', fc='white', alpha=0.6))
+    return fig
+
+
+def plot_power_generation_utilization_histogram(input_path=INPUT_PATH, output_path=OUTPUT_PATH, df_filtered=None):
     """
     発電利用率のヒストグラムを作成し、統計情報を表示する。
+    df_filtered（power_generation_analysis の外れ値除去後の結果）を渡した場合は input_path を読み込まない。
     """
     try:
-        # CSVファイルの読み込み
-        df_filtered = pd.read_csv('/home/ubuntu/cur/program/Analyisis_incineration/result/power_generation_results_filtered.csv', encoding='utf-8-sig')
+        # 結果の保存先から読み込み（なければ結果CSV）
+        if df_filtered is None:
+            df_filtered = load_result('power_generation_filtered', input_path, columns=['発電利用率'])
 
         # '発電利用率' のデータを抽出
         utilization_rate = df_filtered['発電利用率']
@@ -23,33 +55,11 @@ def plot_power_generation_utilization_histogram():
         std_val = utilization_rate.std()
         count_val = len(utilization_rate)
 
-        # 2. ヒストグラムのプロット
-        plt.figure(figsize=(10, 6))
-        
-        plt.hist(utilization_rate, bins=20, alpha=0.7, color='green', edgecolor='black')
-
-        plt.title(f'図1: 発電利用率の分布')
-        plt.xlabel('発電利用率')
-        plt.ylabel('施設数')
-        plt.grid(True)
-
-        # 統計情報をテキストとしてプロットに追加
-        stats_text = (
-            f"施設数: {count_val}\n"
-            f"平均値: {mean_val:.3f}\n"
-            f"中央値: {median_val:.3f}\n"
-            f"標準偏差: {std_val:.3f}"
-        )
-        plt.text(0.95, 0.95, stats_text, transform=plt.gca().transAxes,
-                 fontsize=10, verticalalignment='top', horizontalalignment='right',
-                 bbox=dict(boxstyle='round,pad=0.5', fc='white', alpha=0.6))
-
-        # 3. グラフの保存と表示
-        output_path = '/home/ubuntu/cur/program/Analyisis_incineration/result/power_generation_utilization_rate_histogram.png'
-        plt.savefig(output_path)
-        plt.close()
+        # 2. ヒストグラムの描画と保存
+        render_figures([
+            make_job(draw_utilization_histogram, output_path, kwargs={'utilization_rate': utilization_rate}),
+        ])
         
-        print(f"グラフ '{output_path}' を保存しました。")
         print("\n--- 発電利用率の統計情報 ---")
         print(f"施設数: {count_val}")
         print(f"平均値: {mean_val:.3f}")
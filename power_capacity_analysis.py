@@ -1,7 +1,19 @@
+import sys
+
 import pandas as pd
 
-# CSVファイルを読み込み
-df = pd.read_csv('/home/ubuntu/cur/program/Analyisis_incineration/2022_1焼却施設.csv', encoding='utf-8')
+from binning import CAPACITY_BINS, distribution, print_distribution
+from facility_listing import listing_text, query_facilities
+
+# 施設一覧の表示形式
+CAPACITY_RANGE_TEMPLATE = (
+    "{no:2d}. {prefecture} {municipality} - {facility_name}\n"
+    "    発電能力: {power_kw:,.0f} kW | 年間処理量: {annual:,.0f} t/年 | 使用開始年度: {start_year}\n"
+)
+
+# CSVファイルを読み込み（引数で入力CSVを指定できる）
+DATA_PATH = sys.argv[1] if len(sys.argv) > 1 else '/home/ubuntu/cur/program/Analyisis_incineration/2022_1焼却施設.csv'
+df = pd.read_csv(DATA_PATH, encoding='utf-8')
 
 # 発電能力のカラム（インデックス39）
 power_capacity_col = df.iloc[:, 39]
@@ -31,32 +43,17 @@ if len(valid_data) > 0:
     print(f"75%分位: {valid_data.quantile(0.75):.2f} kW")
     
     print(f"\n発電能力の範囲別分布:")
-    print(f"1,000kW未満: {(valid_data < 1000).sum()} 施設")
-    print(f"1,000-3,000kW: {((valid_data >= 1000) & (valid_data < 3000)).sum()} 施設")
-    print(f"3,000-5,000kW: {((valid_data >= 3000) & (valid_data < 5000)).sum()} 施設")
-    print(f"5,000-10,000kW: {((valid_data >= 5000) & (valid_data < 10000)).sum()} 施設")
-    print(f"10,000kW以上: {(valid_data >= 10000).sum()} 施設")
+    print_distribution(distribution(valid_data, CAPACITY_BINS))
     
-    # 発電能力が4000kW～6000kWの施設
-    capacity_range_mask = (power_capacity_numeric >= 4000) & (power_capacity_numeric <= 6000) & power_capacity_numeric.notna()
-    capacity_range_facilities = df[capacity_range_mask].copy()
-    capacity_range_facilities['power_capacity'] = power_capacity_numeric[capacity_range_mask]
-    capacity_range_facilities = capacity_range_facilities.sort_values('power_capacity', ascending=False)
+    # 発電能力が4000kW～6000kWの施設（発電能力の大きい順）
+    capacity_range_facilities = query_facilities(
+        df, '(power_kw >= 4000) & (power_kw <= 6000)', sort_by='power_kw', ascending=False
+    )
     
     print(f"\n=== 発電能力4000kW～6000kWの施設一覧 ===")
     print(f"該当施設数: {len(capacity_range_facilities)}")
     
     if len(capacity_range_facilities) > 0:
-        for i, (idx, row) in enumerate(capacity_range_facilities.iterrows(), 1):
-            prefecture = row.iloc[0]  # 都道+府県名
-            municipality = row.iloc[3]  # 地方公共団体名
-            facility_name = row.iloc[4]  # 施設名称
-            annual_treatment = row.iloc[5]  # 年間処理量_t/年度
-            start_year = row.iloc[26]  # 使用開始年度
-            capacity = row['power_capacity']
-            
-            print(f"{i:2d}. {prefecture} {municipality} - {facility_name}")
-            print(f"    発電能力: {capacity:,.0f} kW | 年間処理量: {annual_treatment:,.0f} t/年 | 使用開始年度: {start_year}")
-            print()
+        print(listing_text(capacity_range_facilities, CAPACITY_RANGE_TEMPLATE))
 else:
     print("有効なデータがありません")
\ No newline at end of file
@@ -4,21 +4,77 @@
 焼却施設データから発電効率の統計情報を取得するスクリプト
 """
 
+import os
+
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-# 日本語フォント設定
-plt.rcParams['font.family'] = 'M+ 1c'
+import output_cache
+from binning import HEAT_RATIO_BINS, distribution, print_distribution
+from data_quality_rules import evaluate_rules
+from figure_rendering import make_job, render_figures
+from instrumentation import staged, traced
+
+# 入力CSVと出力先（カレントディレクトリからの相対パス）
+DATA_FILE = "2022_1焼却施設.csv"
+OUTPUT_DIR = "result"
+
+POWER_EFFICIENCY_COLUMN = "発電能力_発電効率（仕様値・公称値）_％"
+
+CONFIG = {
+    'impute_missing': False,  # 発電効率の欠損値をモデルで補完する（補完した行は '補完フラグ' 列で識別）
+    'impute_method': 'knn',  # 'knn' または 'iterative'
+}
+
+# 元のスクリプトの既定フォントサイズ（matplotlib の既定値）で描画する
+HISTOGRAM_RC = {'font.size': 10}
+
+# 熱利用率計算後のデータに対する検証ルール（式では df_calc の列名を直接参照する）
+CALC_VALIDATION_RULES = [
+    {
+        'name': 'annual_outliers',
+        'description': '年間処理量の異常値（負または100万t/年超）',
+        'violation': '(annual_processing_numeric < 0) | (annual_processing_numeric > 1000000)',
+    },
+    {
+        'name': 'lcv_outliers',
+        'description': '定位発熱量の異常値（1,000 kJ/kg未満または50,000 kJ/kg超）',
+        'violation': '(lcv_used < 0) | (lcv_used > 50000) | (lcv_used < 1000)',
+    },
+    {
+        'name': 'heat_util_negative',
+        'description': '余熱利用量の負の値',
+        'violation': 'heat_utilization_numeric < 0',
+    },
+    {
+        'name': 'power_negative',
+        'description': '発電量の負の値',
+        'violation': 'power_generation_numeric < 0',
+    },
+    {
+        'name': 'over_100_percent',
+        'description': '熱利用率100%超',
+        'violation': 'heat_utilization_ratio > 100',
+    },
+    {
+        'name': 'over_50_percent',
+        'description': '熱利用率50%超〜100%以下',
+        'violation': '(heat_utilization_ratio > 50) & (heat_utilization_ratio <= 100)',
+    },
+]
+
+def save_csv(df, path, label):
+    """CSV を書き出す（内容が前回と同じなら書き直さない）"""
+    if output_cache.write_csv(df, path, index=False, encoding='utf-8-sig'):
+        print(f"{label}を {path} に保存しました。")
+    else:
+        print(f"{label}は変更がないため書き出しを省略しました: {path}")
 
-def load_and_analyze_power_efficiency():
+@traced('load', rows=len)
+def load_data(file_path=DATA_FILE):
     """
-    CSVファイルを読み込み、発電効率の統計情報を取得する
+    CSVファイルを読み込む（UTF-8 で読めない場合は shift_jis で再試行）
     """
-    # CSVファイルの読み込み
-    file_path = "2022_1焼却施設.csv"
-    
     try:
         # CSVファイルを読み込み
         df = pd.read_csv(file_path, encoding='utf-8')
@@ -28,9 +84,25 @@ def load_and_analyze_power_efficiency():
         # エンコーディングエラーの場合、shift_jisで再試行
         df = pd.read_csv(file_path, encoding='shift_jis')
         print(f"データを正常に読み込みました（shift_jis）。データ形状: {df.shape}")
+    return df
+
+@staged
+def load_and_analyze_power_efficiency(df=None, config=CONFIG, stages=None):
+    """
+    CSVファイルを読み込み、発電効率の統計情報を取得する
+
+    config['impute_missing'] が真なら発電施設の発電効率の欠損値を補完し、
+    実測値のみ・補完値を含む場合の統計を並べて表示する。
+
+    Returns:
+        DataFrame: 列 = [発電効率の列, '補完フラグ']（有効な値のみ。なければ None）
+    """
+    # CSVファイルの読み込み（呼び出し元で読み込み済みならそれを使う）
+    if df is None:
+        df = load_data()
     
     # 発電効率のカラム名を確認
-    power_efficiency_column = "発電能力_発電効率（仕様値・公称値）_％"
+    power_efficiency_column = POWER_EFFICIENCY_COLUMN
     
     if power_efficiency_column not in df.columns:
         print("発電効率のカラムが見つかりません。利用可能なカラム:")
@@ -40,6 +112,7 @@ def load_and_analyze_power_efficiency():
         return None
     
     # 発電効率データの抽出
+    stages.begin('derive', rows=len(df))
     power_efficiency = df[power_efficiency_column]
     
     print(f"\n=== 発電効率の統計情報 ===")
@@ -55,9 +128,21 @@ def load_and_analyze_power_efficiency():
     print(f"\n=== 数値変換後の情報 ===")
     print(f"数値変換後の有効データ数: {power_efficiency_numeric.notna().sum()}")
     print(f"数値変換で失われたデータ数: {power_efficiency_numeric.isna().sum() - power_efficiency.isna().sum()}")
+
+    # 欠損値の補完（学習済みモデルはキャッシュされ、同じデータでは再学習しない）
+    imputed_flag = pd.Series(False, index=df.index)
+    if config['impute_missing']:
+        from imputation import impute_inputs, any_imputed, print_imputation_summary
+        imputed = impute_inputs(df, method=config['impute_method'], targets=[power_efficiency_column])
+        imputed_flag = any_imputed(imputed, [power_efficiency_column])
+        power_efficiency_numeric = pd.to_numeric(imputed[power_efficiency_column], errors='coerce')
+        print("\n=== 欠損値の補完 ===")
+        print_imputation_summary(imputed)
     
     # 有効なデータのみでdescribe()を実行
-    valid_data = power_efficiency_numeric.dropna()
+    valid_mask = power_efficiency_numeric.notna()
+    valid_data = power_efficiency_numeric[valid_mask]
+    stages.begin('aggregate', rows=len(valid_data))
     
     if len(valid_data) > 0:
         print(f"\n=== 発電効率の基本統計量（describe()） ===")
@@ -76,28 +161,31 @@ def load_and_analyze_power_efficiency():
             print(f"\n=== 発電効率 > 0 のデータの統計量 ===")
             print(f"データ数: {len(positive_efficiency)}")
             print(positive_efficiency.describe())
-        
-        return valid_data
+
+        # 補完値を含む場合と実測値のみの場合の比較
+        if imputed_flag.any():
+            measured = positive_efficiency[~imputed_flag[positive_efficiency.index]]
+            print(f"\n=== 発電効率 > 0: 実測値のみ / 補完値を含む ===")
+            comparison = pd.DataFrame({'実測値のみ': measured.describe(),
+                                       '補完値を含む': positive_efficiency.describe()})
+            print(comparison)
+        
+        return pd.DataFrame({
+            power_efficiency_column: valid_data,
+            '補完フラグ': imputed_flag[valid_mask],
+        })
     else:
         print("有効な発電効率データが見つかりませんでした。")
         return None
 
-def analyze_power_generation_facilities():
+@traced('aggregate', rows=len)
+def analyze_power_generation_facilities(df=None):
     """
     余熱利用で発電を行っている施設の数と割合を分析する
     """
-    # CSVファイルの読み込み
-    file_path = "2022_1焼却施設.csv"
-    
-    try:
-        # CSVファイルを読み込み
-        df = pd.read_csv(file_path, encoding='utf-8')
-        print(f"データを正常に読み込みました。データ形状: {df.shape}")
-        
-    except UnicodeDecodeError:
-        # エンコーディングエラーの場合、shift_jisで再試行
-        df = pd.read_csv(file_path, encoding='shift_jis')
-        print(f"データを正常に読み込みました（shift_jis）。データ形状: {df.shape}")
+    # CSVファイルの読み込み（呼び出し元で読み込み済みならそれを使う）
+    if df is None:
+        df = load_data()
     
     # 発電関連の列名
     power_gen_inside = "余熱利用の状況_発電（場内利用）"
@@ -172,22 +260,14 @@ def analyze_power_generation_facilities():
     
     return power_generation_facilities
 
-def analyze_heat_utilization_facilities():
+@traced('aggregate', rows=len)
+def analyze_heat_utilization_facilities(df=None):
     """
     温水・蒸気による余熱利用を行っている施設の数と割合、熱利用量の統計情報を分析する
     """
-    # CSVファイルの読み込み
-    file_path = "2022_1焼却施設.csv"
-    
-    try:
-        # CSVファイルを読み込み
-        df = pd.read_csv(file_path, encoding='utf-8')
-        print(f"データを正常に読み込みました。データ形状: {df.shape}")
-        
-    except UnicodeDecodeError:
-        # エンコーディングエラーの場合、shift_jisで再試行
-        df = pd.read_csv(file_path, encoding='shift_jis')
-        print(f"データを正常に読み込みました（shift_jis）。データ形状: {df.shape}")
+    # CSVファイルの読み込み（呼び出し元で読み込み済みならそれを使う）
+    if df is None:
+        df = load_data()
     
     # 温水・蒸気利用関連の列名
     inside_hot_water = "余熱利用の状況_場内温水"
@@ -325,49 +405,60 @@ def analyze_heat_utilization_facilities():
     
     return heat_utilization_facilities
 
+def draw_heat_utilization_histogram(ratios):
+    """熱利用率のヒストグラム（物理的に妥当な 100% 以下のデータ）を描画する"""
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(10, 6))
+    mean_val = ratios.mean()
+    median_val = ratios.median()
+    std_val = ratios.std()
+    plt.hist(ratios, bins=30, alpha=0.8, color='lightgreen', edgecolor='black')
+    plt.title(f'Figure 3: Distribution of Waste Heat Utilization Rate (Overall)\n(Mean: {mean_val:.1f}%, Median: {median_val:.1f}%, Standard Deviation: {std_val:.1f}%, n={len(ratios)})')
+    plt.xlabel('Waste Heat Utilization Rate (%)')
+    plt.ylabel('Number of Facilities')
+    plt.grid(True)
+    return fig
+
 def detect_outliers_and_validate_data(df_calc):
     """
     外れ値検出とデータ検証を行う
     """
     print(f"\n=== 外れ値検出とデータ検証 ===")
     
+    # 検証ルールを一括評価
+    violations = evaluate_rules(df_calc, CALC_VALIDATION_RULES, columns={})
+    
     # 1. 入力データの外れ値検出
     print(f"\n--- 入力データの検証 ---")
     
     # 年間処理量の外れ値（負の値や異常に大きな値）
-    annual_outliers = df_calc[
-        (df_calc['annual_processing_numeric'] < 0) | 
-        (df_calc['annual_processing_numeric'] > 1000000)  # 100万トン/年を超える場合
-    ]
+    annual_outliers = df_calc[violations['annual_outliers']]
     if len(annual_outliers) > 0:
         print(f"年間処理量の異常値: {len(annual_outliers)} 施設")
         print(annual_outliers[['施設名称', 'annual_processing_numeric']].head())
     
     # 定位発熱量の外れ値（負の値や異常に大きな/小さな値）
-    lcv_outliers = df_calc[
-        (df_calc['lcv_used'] < 0) | 
-        (df_calc['lcv_used'] > 50000) |  # 50,000 kJ/kg を超える場合
-        (df_calc['lcv_used'] < 1000)     # 1,000 kJ/kg を下回る場合
-    ]
+    lcv_outliers = df_calc[violations['lcv_outliers']]
     if len(lcv_outliers) > 0:
         print(f"定位発熱量の異常値: {len(lcv_outliers)} 施設")
         print(lcv_outliers[['施設名称', 'lcv_used']].head())
     
     # 余熱利用量の外れ値（負の値）
-    heat_util_outliers = df_calc[df_calc['heat_utilization_numeric'] < 0]
-    if len(heat_util_outliers) > 0:
-        print(f"余熱利用量の負の値: {len(heat_util_outliers)} 施設")
+    heat_util_negative_count = violations['heat_util_negative'].sum()
+    if heat_util_negative_count > 0:
+        print(f"余熱利用量の負の値: {heat_util_negative_count} 施設")
     
     # 発電量の外れ値（負の値）
-    power_outliers = df_calc[df_calc['power_generation_numeric'] < 0]
-    if len(power_outliers) > 0:
-        print(f"発電量の負の値: {len(power_outliers)} 施設")
+    power_negative_count = violations['power_negative'].sum()
+    if power_negative_count > 0:
+        print(f"発電量の負の値: {power_negative_count} 施設")
     
     # 2. 熱利用率の物理的妥当性検証
     print(f"\n--- 熱利用率の物理的妥当性検証 ---")
     
     # 100%を超える熱利用率（物理的に不可能）
-    over_100_percent = df_calc[df_calc['heat_utilization_ratio'] > 100]
+    over_100_percent = df_calc[violations['over_100_percent']]
     if len(over_100_percent) > 0:
         print(f"熱利用率100%超の施設: {len(over_100_percent)} 施設")
         print("詳細:")
@@ -380,10 +471,7 @@ def detect_outliers_and_validate_data(df_calc):
         print(f"\n最高熱利用率: {max_ratio_facility['heat_utilization_ratio']:.2f}% - {max_ratio_facility['施設名称']}")
     
     # 50%を超える熱利用率（非常に高い効率）
-    over_50_percent = df_calc[
-        (df_calc['heat_utilization_ratio'] > 50) & 
-        (df_calc['heat_utilization_ratio'] <= 100)
-    ]
+    over_50_percent = df_calc[violations['over_50_percent']]
     if len(over_50_percent) > 0:
         print(f"熱利用率50%超〜100%以下の施設: {len(over_50_percent)} 施設")
     
@@ -439,25 +527,18 @@ def detect_outliers_and_validate_data(df_calc):
         'statistical_outliers': statistical_outliers,
         'annual_outliers': annual_outliers,
         'lcv_outliers': lcv_outliers,
-        'iqr_bounds': (lower_bound, upper_bound) if len(valid_ratios) > 0 else None
+        'iqr_bounds': (lower_bound, upper_bound) if len(valid_ratios) > 0 else None,
+        'violations': violations
     }
 
-def calculate_heat_utilization_ratio():
+@staged
+def calculate_heat_utilization_ratio(df=None, output_dir=OUTPUT_DIR, stages=None):
     """
     定位発熱量と年間処理量から発生熱量を計算し、熱利用率を算出してヒストグラムを作成する
     """
-    # CSVファイルの読み込み
-    file_path = "2022_1焼却施設.csv"
-    
-    try:
-        # CSVファイルを読み込み
-        df = pd.read_csv(file_path, encoding='utf-8')
-        print(f"データを正常に読み込みました。データ形状: {df.shape}")
-        
-    except UnicodeDecodeError:
-        # エンコーディングエラーの場合、shift_jisで再試行
-        df = pd.read_csv(file_path, encoding='shift_jis')
-        print(f"データを正常に読み込みました（shift_jis）。データ形状: {df.shape}")
+    # CSVファイルの読み込み（呼び出し元で読み込み済みならそれを使う）
+    if df is None:
+        df = load_data()
     
     # 必要な列名
     annual_processing = "年間処理量_t/年度"
@@ -479,6 +560,7 @@ def calculate_heat_utilization_ratio():
     print(f"\n=== 熱利用率の計算 ===")
     
     # データの前処理
+    stages.begin('derive', rows=len(df))
     df_calc = df.copy()
     
     # 年間処理量を数値型に変換
@@ -517,6 +599,7 @@ def calculate_heat_utilization_ratio():
     )
     
     # 計算に必要なデータが揃っている施設の抽出
+    stages.begin('filter', rows=len(df_calc))
     valid_data_mask = (
         df_calc['annual_processing_numeric'].notna() &
         df_calc['lcv_used'].notna() &
@@ -542,6 +625,7 @@ def calculate_heat_utilization_ratio():
     outlier_results = detect_outliers_and_validate_data(valid_data)
     
     # 統計情報の表示
+    stages.begin('aggregate', rows=len(valid_data))
     if len(valid_data) > 0:
         print(f"\n=== 熱利用率の統計情報 ===")
         print(valid_data['heat_utilization_ratio'].describe())
@@ -553,26 +637,10 @@ def calculate_heat_utilization_ratio():
         print(valid_data['total_heat_utilization'].describe())
         
         # 利用率別の施設数分析
-        ratio_ranges = [
-            (0, 10),     # 低利用
-            (10, 20),    # 中利用
-            (20, 30),    # 高利用
-            (30, 50),    # 非常に高利用
-            (50, 100),   # 超高利用
-            (100, float('inf'))  # 物理的に不可能
-        ]
-        
         print(f"\n=== 熱利用率の分布 ===")
-        for i, (min_val, max_val) in enumerate(ratio_ranges):
-            if max_val == float('inf'):
-                count = len(valid_data[valid_data['heat_utilization_ratio'] > min_val])
-                print(f"{min_val}%超: {count:,} 施設 ({count/len(valid_data)*100:.1f}%)")
-            else:
-                count = len(valid_data[
-                    (valid_data['heat_utilization_ratio'] > min_val) & 
-                    (valid_data['heat_utilization_ratio'] <= max_val)
-                ])
-                print(f"{min_val}%超〜{max_val}%以下: {count:,} 施設 ({count/len(valid_data)*100:.1f}%)")
+        ratio_distribution = distribution(valid_data['heat_utilization_ratio'], HEAT_RATIO_BINS,
+                                          total=len(valid_data))
+        print_distribution(ratio_distribution, show_share=True, thousands=True)
         
         # クリーンなデータでの分析オプション
         print(f"\n=== クリーンデータでの分析 ===")
@@ -598,27 +666,16 @@ def calculate_heat_utilization_ratio():
                 print("外れ値除外後の熱利用率統計:")
                 print(no_outliers_data['heat_utilization_ratio'].describe())
         
-        # ヒストグラムの作成（物理的に妥当なデータのみ）
-        plt.figure(figsize=(10, 6))
-        
-        # 物理的に妥当なデータ（≤100%）のみをプロット
+        # ヒストグラムの作成（物理的に妥当なデータのみ。データが前回と同じなら描画しない）
+        stages.begin('export', rows=len(valid_data))
         clean_data = valid_data[valid_data['heat_utilization_ratio'] <= 100]
-        
-        # 統計情報の計算
-        mean_val = clean_data['heat_utilization_ratio'].mean()
-        median_val = clean_data['heat_utilization_ratio'].median()
-        std_val = clean_data['heat_utilization_ratio'].std()
-        
-        plt.hist(clean_data['heat_utilization_ratio'], bins=30, alpha=0.8, color='lightgreen', edgecolor='black')
-        
-        plt.title(f'Figure 3: Distribution of Waste Heat Utilization Rate (Overall)\n(Mean: {mean_val:.1f}%, Median: {median_val:.1f}%, Standard Deviation: {std_val:.1f}%, n={len(clean_data)})')
-        plt.xlabel('Waste Heat Utilization Rate (%)')
-        plt.ylabel('Number of Facilities')
-        plt.grid(True)
-        
-        plt.savefig('result/heat_utilization_ratio_histogram.png')
-        plt.close()
-        print("グラフ 'result/heat_utilization_ratio_histogram.png' を保存しました。")
+        ratios = clean_data['heat_utilization_ratio'].reset_index(drop=True)
+        mean_val = ratios.mean()
+        median_val = ratios.median()
+        std_val = ratios.std()
+        histogram_path = os.path.join(output_dir, 'heat_utilization_ratio_histogram.png')
+        render_figures([make_job(draw_heat_utilization_histogram, histogram_path,
+                                 kwargs={'ratios': ratios}, rc=HISTOGRAM_RC)], workers=1)
         print(f"余熱利用率統計: 平均 = {mean_val:.1f}%, 中央値 = {median_val:.1f}%, 標準偏差 = {std_val:.1f}%")
         print()
         
@@ -660,9 +717,8 @@ def calculate_heat_utilization_ratio():
             '熱利用率_%', '100%超フラグ', '統計的外れ値フラグ', '利用種別'
         ]
         
-        output_csv = "result/heat_utilization_ratio_results_filtered.csv"
-        output_data.to_csv(output_csv, index=False, encoding='utf-8-sig')
-        print(f"詳細データを {output_csv} に保存しました。")
+        output_csv = os.path.join(output_dir, 'heat_utilization_ratio_results_filtered.csv')
+        save_csv(output_data, output_csv, "詳細データ")
         
         # 利用種別の統計
         print(f"\n=== 利用種別の分析 ===")
@@ -673,9 +729,8 @@ def calculate_heat_utilization_ratio():
         # 外れ値のみのデータ保存
         over_100_data = output_data[output_data['100%超フラグ'] == True]
         if len(over_100_data) > 0:
-            outlier_csv = "result/heat_utilization_ratio_outliers_filtered.csv"
-            over_100_data.to_csv(outlier_csv, index=False, encoding='utf-8-sig')
-            print(f"100%超外れ値データを {outlier_csv} に保存しました。")
+            outlier_csv = os.path.join(output_dir, 'heat_utilization_ratio_outliers_filtered.csv')
+            save_csv(over_100_data, outlier_csv, "100%超外れ値データ")
         
         return valid_data
     
@@ -683,32 +738,36 @@ def calculate_heat_utilization_ratio():
         print("計算に必要なデータが不足しています。")
         return None
 
-def main():
+def main(df=None, output_dir=OUTPUT_DIR, config=CONFIG):
     """
-    メイン関数
+    メイン関数（df を渡した場合は入力CSVを読み込まない）
     """
     print("焼却施設の発電効率統計分析を開始します...")
+
+    # CSVファイルは一度だけ読み込み、各分析で共有する
+    if df is None:
+        df = load_data()
     
     # 発電効率の統計分析を実行
-    power_efficiency_data = load_and_analyze_power_efficiency()
+    power_efficiency_data = load_and_analyze_power_efficiency(df, config)
     
     print("\n" + "="*60)
     print("余熱利用発電施設の分析を開始します...")
     
     # 発電施設の分析を実行
-    power_facilities = analyze_power_generation_facilities()
+    power_facilities = analyze_power_generation_facilities(df)
     
     print("\n" + "="*60)
     print("温水・蒸気による余熱利用施設の分析を開始します...")
     
     # 温水・蒸気利用施設の分析を実行
-    heat_facilities = analyze_heat_utilization_facilities()
+    heat_facilities = analyze_heat_utilization_facilities(df)
     
     print("\n" + "="*60)
     print("熱利用率の計算とヒストグラム作成を開始します...")
     
     # 熱利用率の計算とヒストグラム作成
-    heat_ratio_data = calculate_heat_utilization_ratio()
+    heat_ratio_data = calculate_heat_utilization_ratio(df, output_dir)
     
     if all([power_efficiency_data is not None, power_facilities is not None, 
             heat_facilities is not None, heat_ratio_data is not None]):
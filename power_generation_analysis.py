@@ -1,6 +1,11 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
+
+from instrumentation import staged, traced
+from lcv_estimation import select_low_heat_value
+from result_store import store_dir_for, write_result
 
 # 設定定数
 CONFIG = {
@@ -8,6 +13,10 @@ CONFIG = {
     'output_dir': '/home/ubuntu/cur/program/Analyisis_incineration/result',
     'encoding': 'utf-8',
     'outlier_sigma': 1.5,
+    'lcv_use_estimate': True,  # 実測値・計算値がない施設に三成分からの推定値を使用
+    'impute_missing': False,  # 欠損値をモデルで補完する（補完した行は '補完フラグ' 列で識別）
+    'impute_method': 'knn',  # 'knn' または 'iterative'
+    'export_csv': True,  # 結果の保存先（Parquet）に加えて従来の結果CSVも書き出す
     'columns': {
         'prefecture': 0,
         'municipality': 3,
@@ -20,6 +29,9 @@ CONFIG = {
     }
 }
 
+# 結果の保存先に記録するパラメータ（後段は同じパラメータの最新の結果を読み込める）
+STORE_PARAMS = ('outlier_sigma', 'lcv_use_estimate', 'impute_missing', 'impute_method')
+
 def ensure_output_directory(output_dir):
     """出力ディレクトリの存在を確認し、必要に応じて作成"""
     try:
@@ -57,240 +69,167 @@ def safe_to_csv(df, filepath, **kwargs):
         print(f"CSV出力に失敗しました: {filepath} - {e}")
         return False
 
-# 出力ディレクトリの確認
-if not ensure_output_directory(CONFIG['output_dir']):
-    exit(1)
-
-# CSVファイルを読み込み
-try:
-    df = pd.read_csv(CONFIG['input_file'], encoding=CONFIG['encoding'])
-except FileNotFoundError:
-    print(f"入力ファイルが見つかりません: {CONFIG['input_file']}")
-    exit(1)
-except Exception as e:
-    print(f"ファイル読み込みエラー: {e}")
-    exit(1)
-
-# 必要なデータを抽出
-annual_treatment = df.iloc[:, CONFIG['columns']['annual_treatment']]
-power_capacity_kw = pd.to_numeric(df.iloc[:, CONFIG['columns']['power_capacity']], errors='coerce')
-power_generation_mwh = pd.to_numeric(df.iloc[:, CONFIG['columns']['power_generation']], errors='coerce')
-low_heat_value_calc = df.iloc[:, CONFIG['columns']['low_heat_calc']]
-low_heat_value_measured = df.iloc[:, CONFIG['columns']['low_heat_measured']]
-
-# 単位変換
-power_generation_mj = power_generation_mwh * 3600
-theoretical_max_power_mwh = power_capacity_kw * 24 * 365 / 1000 # MWh
-
-# 低位発熱量の選択
-low_heat_value = low_heat_value_measured.copy()
-mask_use_calc = (low_heat_value_measured.isnull()) | (low_heat_value_measured <= 0)
-low_heat_value[mask_use_calc] = low_heat_value_calc[mask_use_calc]
-
-# 計算
-annual_heat = annual_treatment * low_heat_value
-power_utilization_rate = power_generation_mj / annual_heat
-facility_utilization_rate = power_generation_mwh / theoretical_max_power_mwh
-
-# 有効データのマスク
-valid_mask = ~(
-    annual_treatment.isnull() | 
-    power_generation_mj.isnull() | 
-    low_heat_value.isnull() | 
-    power_capacity_kw.isnull() | 
-    (annual_treatment == 0) | 
-    (low_heat_value <= 0) | 
-    (annual_heat == 0) | 
-    (power_generation_mj <= 0) | 
-    (power_capacity_kw <= 0)
-)
-
-# 外れ値除去
-valid_low_heat_value = low_heat_value[valid_mask]
-heat_value_outlier_mask = remove_outliers(valid_low_heat_value, CONFIG['outlier_sigma'])
-temp_valid_indices = valid_mask[valid_mask].index
-low_heat_outlier_indices = temp_valid_indices[heat_value_outlier_mask]
-valid_mask_updated = pd.Series(False, index=valid_mask.index)
-valid_mask_updated[low_heat_outlier_indices] = True
-valid_mask = valid_mask_updated
-
-valid_annual_heat = annual_heat[valid_mask]
-valid_power_utilization_rate = power_utilization_rate[valid_mask]
-valid_facility_utilization_rate = facility_utilization_rate[valid_mask]
-
-heat_outlier_mask = remove_outliers(valid_annual_heat, CONFIG['outlier_sigma'])
-rate_outlier_mask = remove_outliers(valid_power_utilization_rate, CONFIG['outlier_sigma'])
-facility_rate_outlier_mask = remove_outliers(valid_facility_utilization_rate, CONFIG['outlier_sigma'])
-
-outlier_removed_mask = heat_outlier_mask & rate_outlier_mask & facility_rate_outlier_mask
-
-# CSV出力
-filtered_indices = valid_mask[valid_mask].index[outlier_removed_mask]
-
-import pandas as pd
-import numpy as np
-import os
-
-# 設定定数
-CONFIG = {
-    'input_file': '/home/ubuntu/cur/program/Analyisis_incineration/2022_1焼却施設.csv',
-    'output_dir': '/home/ubuntu/cur/program/Analyisis_incineration/result',
-    'encoding': 'utf-8',
-    'outlier_sigma': 1.5,
-    'columns': {
-        'prefecture': 0,
-        'municipality': 3,
-        'facility_name': 4,
-        'annual_treatment': 5,
-        'power_capacity': 39, # 発電能力_発電能力_kW
-        'power_generation': 41, # 発電能力_総発電量（実績値）_MWh
-        'low_heat_calc': 94,
-        'low_heat_measured': 95,
-    }
-}
-
-def ensure_output_directory(output_dir):
-    """出力ディレクトリの存在を確認し、必要に応じて作成"""
-    try:
-        os.makedirs(output_dir, exist_ok=True)
-        return True
-    except Exception as e:
-        print(f"出力ディレクトリの作成に失敗しました: {e}")
-        return False
-
-def remove_outliers(data, sigma_threshold=1.5):
-    """外れ値を除去するマスクを返す"""
-    mean_val = data.mean()
-    std_val = data.std()
-    lower_bound = mean_val - sigma_threshold * std_val
-    upper_bound = mean_val + sigma_threshold * std_val
-    mask = (data >= lower_bound) & (data <= upper_bound)
-    
-    print(f"平均: {mean_val:.2f}")
-    print(f"標準偏差: {std_val:.2f}")
-    print(f"除去基準範囲: {lower_bound:.2f} - {upper_bound:.2f}")
-    print(f"外れ値除去前: {len(data)} 件")
-    print(f"外れ値除去後: {mask.sum()} 件")
-    print(f"外れ値として除去: {len(data) - mask.sum()} 件")
-    
-    return mask
-
-def safe_to_csv(df, filepath, **kwargs):
-    """CSVファイルの安全な書き込み"""
+def save_result(df, dataset, filename, config):
+    """結果を保存先（Parquet）に保存し、config['export_csv'] が真なら CSV にも書き出す"""
+    csv_path = os.path.join(config['output_dir'], filename) if config.get('export_csv', True) else None
+    entry = write_result(df, dataset, params={k: config[k] for k in STORE_PARAMS},
+                         input_files=[config['input_file']], code=[calculate_power_generation, select_low_heat_value],
+                         store_dir=store_dir_for(config['output_dir']), csv_path=csv_path)
+    print(f"\n{dataset} を {entry['path']} に保存しました（版 {entry['version']}）")
+    if entry['csv_written']:
+        print(f"CSV を {csv_path} に出力しました。")
+    elif csv_path is not None:
+        print(f"CSV は変更がないため書き出しを省略しました: {csv_path}")
+    print(f"出力データ数: {len(df)} 件")
+    return entry
+
+@traced('load', rows=len)
+def load_input(config=CONFIG):
+    """入力CSVを読み込む（失敗した場合は None）"""
     try:
-        df.to_csv(filepath, **kwargs)
-        print(f"データを {filepath} に出力しました。")
-        print(f"出力データ数: {len(df)} 件")
-        return True
+        return pd.read_csv(config['input_file'], encoding=config['encoding'])
+    except FileNotFoundError:
+        print(f"入力ファイルが見つかりません: {config['input_file']}")
     except Exception as e:
-        print(f"CSV出力に失敗しました: {filepath} - {e}")
-        return False
-
-# 出力ディレクトリの確認
-if not ensure_output_directory(CONFIG['output_dir']):
-    exit(1)
-
-# CSVファイルを読み込み
-try:
-    df = pd.read_csv(CONFIG['input_file'], encoding=CONFIG['encoding'])
-except FileNotFoundError:
-    print(f"入力ファイルが見つかりません: {CONFIG['input_file']}")
-    exit(1)
-except Exception as e:
-    print(f"ファイル読み込みエラー: {e}")
-    exit(1)
-
-# 必要なデータを抽出
-annual_treatment = df.iloc[:, CONFIG['columns']['annual_treatment']]
-power_capacity_kw = pd.to_numeric(df.iloc[:, CONFIG['columns']['power_capacity']], errors='coerce')
-power_generation_mwh = pd.to_numeric(df.iloc[:, CONFIG['columns']['power_generation']], errors='coerce')
-low_heat_value_calc = df.iloc[:, CONFIG['columns']['low_heat_calc']]
-low_heat_value_measured = df.iloc[:, CONFIG['columns']['low_heat_measured']]
-
-# 単位変換
-power_generation_mj = power_generation_mwh * 3600
-theoretical_max_power_mwh = power_capacity_kw * 24 * 365 / 1000 # MWh
-
-# 低位発熱量の選択
-low_heat_value = low_heat_value_measured.copy()
-mask_use_calc = (low_heat_value_measured.isnull()) | (low_heat_value_measured <= 0)
-low_heat_value[mask_use_calc] = low_heat_value_calc[mask_use_calc]
-
-# 計算
-annual_heat = annual_treatment * low_heat_value
-power_utilization_rate = power_generation_mj / annual_heat
-facility_utilization_rate = power_generation_mwh / theoretical_max_power_mwh
-
-# 有効データのマスク
-valid_mask = ~(
-    annual_treatment.isnull() | 
-    power_generation_mj.isnull() | 
-    low_heat_value.isnull() | 
-    power_capacity_kw.isnull() | 
-    (annual_treatment == 0) | 
-    (low_heat_value <= 0) | 
-    (annual_heat == 0) | 
-    (power_generation_mj <= 0) | 
-    (power_capacity_kw <= 0)
-)
-
-# 外れ値除去
-valid_low_heat_value = low_heat_value[valid_mask]
-heat_value_outlier_mask = remove_outliers(valid_low_heat_value, CONFIG['outlier_sigma'])
-temp_valid_indices = valid_mask[valid_mask].index
-low_heat_outlier_indices = temp_valid_indices[heat_value_outlier_mask]
-valid_mask_updated = pd.Series(False, index=valid_mask.index)
-valid_mask_updated[low_heat_outlier_indices] = True
-valid_mask = valid_mask_updated
-
-valid_annual_heat = annual_heat[valid_mask]
-valid_power_utilization_rate = power_utilization_rate[valid_mask]
-valid_facility_utilization_rate = facility_utilization_rate[valid_mask]
-
-heat_outlier_mask = remove_outliers(valid_annual_heat, CONFIG['outlier_sigma'])
-rate_outlier_mask = remove_outliers(valid_power_utilization_rate, CONFIG['outlier_sigma'])
-facility_rate_outlier_mask = remove_outliers(valid_facility_utilization_rate, CONFIG['outlier_sigma'])
-
-outlier_removed_mask = heat_outlier_mask & rate_outlier_mask & facility_rate_outlier_mask
-
-# CSV出力
-filtered_indices = valid_mask[valid_mask].index[outlier_removed_mask]
-
-output_df_filtered = pd.DataFrame({
-    '都道府県名': df.iloc[filtered_indices, CONFIG['columns']['prefecture']].values,
-    '地方公共団体名': df.iloc[filtered_indices, CONFIG['columns']['municipality']].values,
-    '施設名称': df.iloc[filtered_indices, CONFIG['columns']['facility_name']].values,
-    '年間処理量_t': df.iloc[filtered_indices, CONFIG['columns']['annual_treatment']].values,
-    '発電能力_kW': power_capacity_kw[filtered_indices].values,
-    '総発電量_MWh': power_generation_mwh[filtered_indices].values,
-    '低位発熱量_kJ_per_kg': low_heat_value[filtered_indices].values,
-    '年間発熱量_MJ': annual_heat[filtered_indices].values,
-    '発電量_MJ': power_generation_mj[filtered_indices].values,
-    '発電利用率': power_utilization_rate[filtered_indices].values,
-    '設備利用率': facility_utilization_rate[filtered_indices].values
-})
-
-output_csv_path_filtered = os.path.join(CONFIG['output_dir'], 'power_generation_results_filtered.csv')
-safe_to_csv(output_df_filtered, output_csv_path_filtered, index=False, encoding='utf-8-sig')
-
-valid_indices_all = valid_mask[valid_mask].index
-output_df_all = pd.DataFrame({
-    '都道府県名': df.iloc[valid_indices_all, CONFIG['columns']['prefecture']].values,
-    '地方公共団体名': df.iloc[valid_indices_all, CONFIG['columns']['municipality']].values,
-    '施設名称': df.iloc[valid_indices_all, CONFIG['columns']['facility_name']].values,
-    '年間処理量_t': df.iloc[valid_indices_all, CONFIG['columns']['annual_treatment']].values,
-    '発電能力_kW': power_capacity_kw[valid_indices_all].values,
-    '総発電量_MWh': power_generation_mwh[valid_indices_all].values,
-    '低位発熱量_kJ_per_kg': low_heat_value[valid_indices_all].values,
-    '年間発熱量_MJ': annual_heat[valid_indices_all].values,
-    '発電量_MJ': power_generation_mj[valid_indices_all].values,
-    '発電利用率': power_utilization_rate[valid_indices_all].values,
-    '設備利用率': facility_utilization_rate[valid_indices_all].values
-})
-
-output_csv_path_all = os.path.join(CONFIG['output_dir'], 'power_generation_results_all.csv')
-safe_to_csv(output_df_all, output_csv_path_all, index=False, encoding='utf-8-sig')
-
-
-output_csv_path_all = os.path.join(CONFIG['output_dir'], 'power_generation_results_all.csv')
-safe_to_csv(output_df_all, output_csv_path_all, index=False, encoding='utf-8-sig')
+        print(f"ファイル読み込みエラー: {e}")
+    return None
+
+@staged
+def calculate_power_generation(df, config=CONFIG, stages=None):
+    """
+    発電利用率と設備利用率を計算し、外れ値除去前後の結果をCSVに出力する。
+
+    Returns:
+        dict: データセット名（'power_generation_all' / 'power_generation_filtered'）→ 結果
+    """
+    # 段階ごとの計測（導出 → 絞り込み → 書き出し）
+    stages.begin('derive', rows=len(df))
+
+    # 欠損値の補完（学習済みモデルはキャッシュされ、同じデータでは再学習しない）
+    imputed_flag = pd.Series(False, index=df.index)
+    if config['impute_missing']:
+        from imputation import impute_inputs, any_imputed, print_imputation_summary
+        df = impute_inputs(df, method=config['impute_method'], targets=['発電能力_発電能力_kW'])
+        imputed_flag = any_imputed(df, ['発電能力_発電能力_kW'])
+        print("\n=== 欠損値の補完 ===")
+        print_imputation_summary(df)
+
+    # 必要なデータを抽出
+    annual_treatment = df.iloc[:, config['columns']['annual_treatment']]
+    power_capacity_kw = pd.to_numeric(df.iloc[:, config['columns']['power_capacity']], errors='coerce')
+    power_generation_mwh = pd.to_numeric(df.iloc[:, config['columns']['power_generation']], errors='coerce')
+
+    # 単位変換
+    power_generation_mj = power_generation_mwh * 3600
+    theoretical_max_power_mwh = power_capacity_kw * 24 * 365 / 1000 # MWh
+
+    # 低位発熱量の選択（実測値 → 計算値 → 三成分からの推定値）
+    lcv_selection = select_low_heat_value(df, use_estimate=config['lcv_use_estimate'])
+    low_heat_value = lcv_selection['低位発熱量']
+
+    # 計算
+    annual_heat = annual_treatment * low_heat_value
+    power_utilization_rate = power_generation_mj / annual_heat
+    facility_utilization_rate = power_generation_mwh / theoretical_max_power_mwh
+
+    # 有効データのマスク
+    valid_mask = ~(
+        annual_treatment.isnull() | 
+        power_generation_mj.isnull() | 
+        low_heat_value.isnull() | 
+        power_capacity_kw.isnull() | 
+        (annual_treatment == 0) | 
+        (low_heat_value <= 0) | 
+        (annual_heat == 0) | 
+        (power_generation_mj <= 0) | 
+        (power_capacity_kw <= 0)
+    )
+
+    # 外れ値除去
+    stages.begin('filter', rows=int(valid_mask.sum()))
+    valid_low_heat_value = low_heat_value[valid_mask]
+    heat_value_outlier_mask = remove_outliers(valid_low_heat_value, config['outlier_sigma'])
+    temp_valid_indices = valid_mask[valid_mask].index
+    low_heat_outlier_indices = temp_valid_indices[heat_value_outlier_mask]
+    valid_mask_updated = pd.Series(False, index=valid_mask.index)
+    valid_mask_updated[low_heat_outlier_indices] = True
+    valid_mask = valid_mask_updated
+
+    valid_annual_heat = annual_heat[valid_mask]
+    valid_power_utilization_rate = power_utilization_rate[valid_mask]
+    valid_facility_utilization_rate = facility_utilization_rate[valid_mask]
+
+    heat_outlier_mask = remove_outliers(valid_annual_heat, config['outlier_sigma'])
+    rate_outlier_mask = remove_outliers(valid_power_utilization_rate, config['outlier_sigma'])
+    facility_rate_outlier_mask = remove_outliers(valid_facility_utilization_rate, config['outlier_sigma'])
+
+    outlier_removed_mask = heat_outlier_mask & rate_outlier_mask & facility_rate_outlier_mask
+
+    # CSV出力
+    stages.begin('export', rows=int(outlier_removed_mask.sum()))
+    filtered_indices = valid_mask[valid_mask].index[outlier_removed_mask]
+
+    output_df_filtered = pd.DataFrame({
+        '都道府県名': df.iloc[filtered_indices, config['columns']['prefecture']].values,
+        '地方公共団体名': df.iloc[filtered_indices, config['columns']['municipality']].values,
+        '施設名称': df.iloc[filtered_indices, config['columns']['facility_name']].values,
+        '年間処理量_t': df.iloc[filtered_indices, config['columns']['annual_treatment']].values,
+        '発電能力_kW': power_capacity_kw[filtered_indices].values,
+        '総発電量_MWh': power_generation_mwh[filtered_indices].values,
+        '低位発熱量_kJ_per_kg': low_heat_value[filtered_indices].values,
+        '低位発熱量_区分': lcv_selection['区分'][filtered_indices].values,
+        '低位発熱量_不確かさ_kJ_per_kg': lcv_selection['不確かさ'][filtered_indices].values,
+        '補完フラグ': imputed_flag[filtered_indices].values,
+        '年間発熱量_MJ': annual_heat[filtered_indices].values,
+        '発電量_MJ': power_generation_mj[filtered_indices].values,
+        '発電利用率': power_utilization_rate[filtered_indices].values,
+        '設備利用率': facility_utilization_rate[filtered_indices].values
+    })
+
+    save_result(output_df_filtered, 'power_generation_filtered', 'power_generation_results_filtered.csv', config)
+
+    valid_indices_all = valid_mask[valid_mask].index
+    output_df_all = pd.DataFrame({
+        '都道府県名': df.iloc[valid_indices_all, config['columns']['prefecture']].values,
+        '地方公共団体名': df.iloc[valid_indices_all, config['columns']['municipality']].values,
+        '施設名称': df.iloc[valid_indices_all, config['columns']['facility_name']].values,
+        '年間処理量_t': df.iloc[valid_indices_all, config['columns']['annual_treatment']].values,
+        '発電能力_kW': power_capacity_kw[valid_indices_all].values,
+        '総発電量_MWh': power_generation_mwh[valid_indices_all].values,
+        '低位発熱量_kJ_per_kg': low_heat_value[valid_indices_all].values,
+        '低位発熱量_区分': lcv_selection['区分'][valid_indices_all].values,
+        '低位発熱量_不確かさ_kJ_per_kg': lcv_selection['不確かさ'][valid_indices_all].values,
+        '補完フラグ': imputed_flag[valid_indices_all].values,
+        '年間発熱量_MJ': annual_heat[valid_indices_all].values,
+        '発電量_MJ': power_generation_mj[valid_indices_all].values,
+        '発電利用率': power_utilization_rate[valid_indices_all].values,
+        '設備利用率': facility_utilization_rate[valid_indices_all].values
+    })
+
+    save_result(output_df_all, 'power_generation_all', 'power_generation_results_all.csv', config)
+    stages.end()
+
+    return {'power_generation_all': output_df_all, 'power_generation_filtered': output_df_filtered}
+
+def main(df=None, config=CONFIG):
+    """
+    発電利用率の計算を実行する（df を渡した場合は入力CSVを読み込まない）。
+
+    Returns:
+        dict: calculate_power_generation の結果（失敗した場合は None）
+    """
+    # 出力ディレクトリの確認
+    if not ensure_output_directory(config['output_dir']):
+        return None
+
+    # CSVファイルを読み込み
+    if df is None:
+        df = load_input(config)
+        if df is None:
+            return None
+
+    return calculate_power_generation(df, config)
+
+if __name__ == '__main__':
+    if main() is None:
+        sys.exit(1)
@@ -0,0 +1,418 @@
+"""
+都道府県 × 調査年度ごとの図（発電利用率・発電効率のヒストグラム、年間発熱量 vs 余熱利用率の散布図）を一括作成する
+
+全グループの集計（ヒストグラムの度数・統計量・散布図の座標）は1回の groupby でまとめて行う。
+各ワーカーは図の種類ごとにテンプレート（Figure と Artist）を1回だけ作成し、
+グループごとに棒の高さ（set_height）や点の座標（set_offsets）、テキストだけを更新して保存する。
+
+入力と出力先は config.load_config() の設定ファイル（[prefecture] テーブル）またはコマンドライン引数で指定する。
+
+    python prefecture_batch.py --config incineration.toml
+    python prefecture_batch.py --input 2023_1焼却施設.csv --year 2023 --heat ... --power ...
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import output_cache
+from figure_rendering import DEFAULT_STYLE, RENDER_CODE, init_worker
+from plot_efficiency_histogram import compute_efficiency
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# calculate_statistics / power_generation_analysis の出力（結果の出力先からの相対パス）
+HEAT_FILE = 'heat_utilization_results_filtered.csv'
+POWER_FILE = 'power_generation_results_filtered.csv'
+# 入力の調査年度（[prefecture] テーブルの year または --year で変更できる）
+DEFAULT_YEAR = 2022
+
+CONFIG = {
+    # 調査年度ごとの入力（survey: 調査票の CSV、heat/power: calculate_statistics / power_generation_analysis の出力）
+    'surveys': [
+        {
+            'year': DEFAULT_YEAR,
+            'survey': os.path.join(BASE_DIR, '2022_1焼却施設.csv'),
+            'heat': os.path.join(BASE_DIR, 'result', HEAT_FILE),
+            'power': os.path.join(BASE_DIR, 'result', POWER_FILE),
+        },
+    ],
+    'output_dir': os.path.join(BASE_DIR, 'result', 'prefecture'),
+    'workers': None,
+    'dpi': 150,
+}
+
+# 調査年度ごとの入力のうちパスの項目
+SURVEY_PATH_KEYS = ('survey', 'heat', 'power')
+
+GROUP_KEYS = ['都道府県名', '調査年度']
+
+# 図の種類ごとの設定（source は load_panel が返すデータの名前）
+FIGURE_SPECS = {
+    'utilization': {
+        'type': 'hist',
+        'source': 'power',
+        'column': '発電利用率',
+        'bins': 20,
+        'figsize': (10, 6),
+        'color': 'green',
+        'alpha': 0.7,
+        'title': '{pref} {year}年度: 発電利用率の分布',
+        'xlabel': '発電利用率',
+        'ylabel': '施設数',
+        'stats_format': '施設数: {count}\n平均値: {mean:.3f}\n中央値: {median:.3f}\n標準偏差: {std:.3f}',
+        'bbox': {'boxstyle': 'round,pad=0.5', 'fc': 'white', 'alpha': 0.6},
+    },
+    'efficiency': {
+        'type': 'hist',
+        'source': 'efficiency',
+        'column': '発電効率',
+        'bins': 25,
+        'figsize': (12, 7),
+        'color': 'forestgreen',
+        'alpha': 0.75,
+        'title': '{pref} {year}年度: 発電効率（仕様値・公称値）の分布',
+        'xlabel': '発電効率（仕様値・公称値） [%]',
+        'ylabel': '施設数',
+        'stats_format': '施設数: {count}\n平均値: {mean:.2f} %\n中央値: {median:.2f} %\n標準偏差: {std:.2f} %',
+        'bbox': {'boxstyle': 'round,pad=0.5', 'fc': 'honeydew', 'alpha': 0.8},
+    },
+    'heat_scatter': {
+        'type': 'scatter',
+        'source': 'heat',
+        'x': '年間発熱量_MJ',
+        'y': '余熱利用率',
+        'xlog': True,
+        'figsize': (10, 6),
+        'color': 'red',
+        'alpha': 0.6,
+        'title': '{pref} {year}年度: 年間発熱量 vs 余熱利用率',
+        'xlabel': '年間発熱量 (MJ)',
+        'ylabel': '余熱利用率',
+        'stats_format': '施設数: {count}\n相関係数: {corr:.3f}',
+        'bbox': {'boxstyle': 'round,pad=0.5', 'fc': 'white', 'alpha': 0.6},
+    },
+}
+
+
+# ---------------------------------------------------------------------------
+# データの読み込みと集計（親プロセス）
+# ---------------------------------------------------------------------------
+
+def load_settings(path=None):
+    """
+    config.load_config() の設定から、調査年度ごとの入力と出力先を作る。
+
+    既定は共通の input_file（調査票）と output_dir の heat/power の結果、出力先は output_dir/prefecture。
+    [prefecture] テーブルの surveys（year, survey, heat, power の表の配列）で複数の調査年度を、
+    output_dir・workers・dpi で出力を指定できる（相対パスは base_dir が基準）。
+    """
+    from config import load_config, resolve_path
+
+    config = load_config(path)
+    cfg = config.get('prefecture', {})
+    result_dir = config['output_dir']
+    surveys = cfg.get('surveys') or [{
+        'year': cfg.get('year', DEFAULT_YEAR),
+        'survey': config['input_file'],
+        'heat': os.path.join(result_dir, HEAT_FILE),
+        'power': os.path.join(result_dir, POWER_FILE),
+    }]
+    return {
+        **CONFIG,
+        'surveys': [{**survey, **{k: resolve_path(config, survey[k]) for k in SURVEY_PATH_KEYS if survey.get(k)}}
+                    for survey in surveys],
+        'output_dir': (resolve_path(config, cfg['output_dir']) if 'output_dir' in cfg
+                       else os.path.join(result_dir, 'prefecture')),
+        'workers': cfg.get('workers', CONFIG['workers']),
+        'dpi': cfg.get('dpi', CONFIG['dpi']),
+    }
+
+
+def load_panel(surveys):
+    """
+    調査年度ごとの入力を読み込み、調査年度列を付けて縦に結合する。
+
+    Returns:
+        dict: {'heat': DataFrame, 'power': DataFrame, 'efficiency': DataFrame}
+    """
+    frames = {'heat': [], 'power': [], 'efficiency': []}
+    for survey in surveys:
+        year = survey['year']
+        for source in ('heat', 'power'):
+            path = survey.get(source)
+            if path and os.path.exists(path):
+                frames[source].append(pd.read_csv(path, encoding='utf-8-sig').assign(調査年度=year))
+            elif path:
+                print(f"警告: ファイルが見つかりません: {path}")
+        path = survey.get('survey')
+        if path and os.path.exists(path):
+            df = pd.read_csv(path, encoding='utf-8-sig')
+            efficiency, keep = compute_efficiency(df)
+            frames['efficiency'].append(pd.DataFrame({
+                '都道府県名': df.loc[efficiency.index[keep], '都道府県名'].values,
+                '発電効率': efficiency[keep].values,
+                '調査年度': year,
+            }))
+        elif path:
+            print(f"警告: ファイルが見つかりません: {path}")
+    return {k: pd.concat(v, ignore_index=True) if v else pd.DataFrame(columns=GROUP_KEYS)
+            for k, v in frames.items()}
+
+
+def group_histograms(df, column, bins):
+    """
+    全グループのヒストグラムの度数と統計量を一括で計算する（ビン境界は全グループ共通）。
+
+    Returns:
+        tuple: (ビン境界, グループのキーの Index, 度数[グループ, ビン], 統計量の DataFrame)
+    """
+    df = df.assign(**{column: pd.to_numeric(df[column], errors='coerce')}).dropna(subset=[column] + GROUP_KEYS)
+    values = df[column].to_numpy(dtype=float)
+    edges = np.histogram_bin_edges(values, bins=bins) if values.size else np.linspace(0, 1, bins + 1)
+
+    grouped = df.groupby(GROUP_KEYS, sort=True)[column]
+    codes = grouped.ngroup().to_numpy()
+    stats = grouped.agg(['count', 'mean', 'median', 'std'])
+
+    # 右端の値は最後のビンに含める（np.histogram と同じ扱い）
+    bin_idx = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+    counts = np.bincount(codes * bins + bin_idx, minlength=len(stats) * bins).reshape(len(stats), bins)
+    return edges, stats.index, counts, stats
+
+
+def group_points(df, x_col, y_col, xlog=False):
+    """
+    全グループの散布図の座標と統計量を一括で切り出す。
+
+    Returns:
+        tuple: (軸の範囲 (xlim, ylim), {グループのキー: 座標[n, 2]}, 統計量の DataFrame)
+    """
+    x = pd.to_numeric(df[x_col], errors='coerce')
+    y = pd.to_numeric(df[y_col], errors='coerce')
+    valid = x.notna() & y.notna() & df[GROUP_KEYS].notna().all(axis=1)
+    if xlog:
+        valid &= x > 0
+    df = pd.DataFrame({'x': x, 'y': y})[valid].join(df.loc[valid, GROUP_KEYS])
+    xy = df[['x', 'y']].to_numpy(dtype=float)
+
+    grouped = df.groupby(GROUP_KEYS, sort=True)
+    offsets = {key: xy[idx] for key, idx in grouped.indices.items()}
+    stats = grouped.size().rename('count').to_frame()
+    stats['corr'] = grouped[['x', 'y']].corr().xs('x', level=-1)['y']
+
+    limits = (_padded_limits(xy[:, 0], xlog), _padded_limits(xy[:, 1], False))
+    return limits, offsets, stats
+
+
+def _padded_limits(values, log):
+    """全グループ共通の軸の範囲（少し余白を付ける）"""
+    if values.size == 0:
+        return (1, 10) if log else (0, 1)
+    lo, hi = values.min(), values.max()
+    if log:
+        return lo / 1.5, hi * 1.5
+    pad = (hi - lo) * 0.05 or 0.5
+    return lo - pad, hi + pad
+
+
+def build_tasks(panel, output_dir, kinds=None, dpi=150):
+    """
+    図ごとのタスク（保存先・タイトル・更新するデータ）と、図の種類ごとの共通レイアウトを作成する。
+
+    Returns:
+        tuple: (タスクのリスト, {種類: レイアウト})
+    """
+    tasks = []
+    layouts = {}
+    for kind in kinds or FIGURE_SPECS:
+        spec = FIGURE_SPECS[kind]
+        df = panel[spec['source']]
+        if df.empty:
+            continue
+        if spec['type'] == 'hist':
+            edges, keys, counts, stats = group_histograms(df, spec['column'], spec['bins'])
+            layouts[kind] = {'edges': edges, 'dpi': dpi}
+            payloads = zip(keys, counts)
+        else:
+            limits, offsets, stats = group_points(df, spec['x'], spec['y'], spec.get('xlog', False))
+            layouts[kind] = {'xlim': limits[0], 'ylim': limits[1], 'dpi': dpi}
+            payloads = ((key, offsets[key]) for key in stats.index)
+
+        for (pref, year), data in payloads:
+            stat = stats.loc[(pref, year)].to_dict()
+            stat['count'] = int(stat['count'])
+            tasks.append({
+                'kind': kind,
+                'output': os.path.join(output_dir, kind, str(year), f'{pref}.png'),
+                'title': spec['title'].format(pref=pref, year=year),
+                'stats_text': spec['stats_format'].format(**stat),
+                'data': data,
+            })
+    return tasks, layouts
+
+
+# ---------------------------------------------------------------------------
+# 描画（ワーカープロセス）
+# ---------------------------------------------------------------------------
+
+class HistogramTemplate:
+    """共通のビン境界を持つヒストグラムの図。棒の高さとテキストだけを更新して使い回す"""
+
+    def __init__(self, spec, layout):
+        import matplotlib.pyplot as plt
+
+        edges = layout['edges']
+        self.fig, self.ax = plt.subplots(figsize=spec['figsize'])
+        self.bars = self.ax.bar(edges[:-1], np.zeros(len(edges) - 1), width=np.diff(edges), align='edge',
+                                alpha=spec['alpha'], color=spec['color'], edgecolor='black')
+        self.ax.set_xlim(edges[0], edges[-1])
+        self.ax.set_xlabel(spec['xlabel'])
+        self.ax.set_ylabel(spec['ylabel'])
+        self.ax.grid(True)
+        self.title = self.ax.set_title('')
+        self.text = self.ax.text(0.97, 0.97, '', transform=self.ax.transAxes, fontsize=10,
+                                 verticalalignment='top', horizontalalignment='right', bbox=spec['bbox'])
+
+    def update(self, task):
+        counts = task['data']
+        for bar, height in zip(self.bars, counts):
+            bar.set_height(height)
+        self.ax.set_ylim(0, max(counts.max(), 1) * 1.1)
+        self.title.set_text(task['title'])
+        self.text.set_text(task['stats_text'])
+
+
+class ScatterTemplate:
+    """軸の範囲を固定した散布図。点の座標とテキストだけを更新して使い回す"""
+
+    def __init__(self, spec, layout):
+        import matplotlib.pyplot as plt
+
+        self.fig, self.ax = plt.subplots(figsize=spec['figsize'])
+        self.points = self.ax.scatter([], [], alpha=spec['alpha'], color=spec['color'])
+        if spec.get('xlog'):
+            self.ax.set_xscale('log')
+        self.ax.set_xlim(*layout['xlim'])
+        self.ax.set_ylim(*layout['ylim'])
+        self.ax.set_xlabel(spec['xlabel'])
+        self.ax.set_ylabel(spec['ylabel'])
+        self.ax.grid(True, alpha=0.3)
+        self.title = self.ax.set_title('')
+        self.text = self.ax.text(0.97, 0.97, '', transform=self.ax.transAxes, fontsize=10,
+                                 verticalalignment='top', horizontalalignment='right', bbox=spec['bbox'])
+
+    def update(self, task):
+        self.points.set_offsets(task['data'])
+        self.title.set_text(task['title'])
+        self.text.set_text(task['stats_text'])
+
+
+TEMPLATE_TYPES = {'hist': HistogramTemplate, 'scatter': ScatterTemplate}
+
+_layouts = {}
+_templates = {}
+
+
+def init_batch_worker(style, layouts):
+    """ワーカーの初期化（フォント・スタイルの設定と共通レイアウトの受け取り）"""
+    init_worker(style)
+    _layouts.clear()
+    _layouts.update(layouts)
+    _templates.clear()
+
+
+def render_task(task):
+    """テンプレートを更新して図を1枚保存し、保存先のパスを返す"""
+    kind = task['kind']
+    template = _templates.get(kind)
+    if template is None:
+        spec = FIGURE_SPECS[kind]
+        template = _templates[kind] = TEMPLATE_TYPES[spec['type']](spec, _layouts[kind])
+    template.update(task)
+    os.makedirs(os.path.dirname(task['output']), exist_ok=True)
+    template.fig.savefig(task['output'], dpi=_layouts[kind]['dpi'])
+    return task['output']
+
+
+def task_cache_key(task, layouts, style):
+    """タスクのデータ・共通レイアウト・コードから出力のキャッシュキーを計算する"""
+    return output_cache.compute_key(
+        data=task['data'],
+        params={'kind': task['kind'], 'output': task['output'], 'title': task['title'],
+                'stats_text': task['stats_text'], 'layout': layouts[task['kind']], 'style': style},
+        code=[__file__, *RENDER_CODE],
+    )
+
+
+def render_tasks(tasks, layouts, workers=None, style=None, cache=True):
+    """
+    タスクをまとめて描画する（プロセスプールで並列に保存する）。
+
+    Returns:
+        int: 実際に描画した図の数
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    style = DEFAULT_STYLE if style is None else style
+    keys = [task_cache_key(task, layouts, style) if cache else None for task in tasks]
+    fresh = output_cache.fresh_flags([(key, [task['output']]) for key, task in zip(keys, tasks)])
+    pending = [i for i, is_fresh in enumerate(fresh) if not is_fresh]
+    print(f"図 {len(tasks)} 件のうち {len(tasks) - len(pending)} 件は変更がないため省略します")
+    if not pending:
+        return 0
+
+    todo = [tasks[i] for i in pending]
+    workers = min(workers or os.cpu_count() or 1, len(todo))
+    if workers <= 1:
+        init_batch_worker(style, layouts)
+        paths = [render_task(task) for task in todo]
+    else:
+        ctx = multiprocessing.get_context('spawn')
+        # 同じ種類の図が同じワーカーに続けて渡るよう、まとめて割り当てる
+        chunksize = max(1, len(todo) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=init_batch_worker,
+                                 initargs=(style, layouts)) as executor:
+            paths = list(executor.map(render_task, todo, chunksize=chunksize))
+
+    output_cache.record_many([(keys[i], [path], {'kind': 'figure'})
+                              for i, path in zip(pending, paths) if keys[i] is not None])
+    return len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='都道府県 × 調査年度ごとの図を一括作成する')
+    parser.add_argument('--config', default=None,
+                        help='設定ファイル（TOML / JSON。省略時は環境変数 INCINERATION_CONFIG、incineration.toml の順）')
+    parser.add_argument('--input', default=None, help='調査票の CSV（指定時は1つの調査年度のみ作成する）')
+    parser.add_argument('--year', type=int, default=None, help='--input の調査年度')
+    parser.add_argument('--heat', default=None, help='calculate_statistics の結果CSV（--input と組み合わせる）')
+    parser.add_argument('--power', default=None, help='power_generation_analysis の結果CSV（--input と組み合わせる）')
+    parser.add_argument('--kinds', nargs='+', choices=list(FIGURE_SPECS), help='作成する図の種類（既定: 全て）')
+    parser.add_argument('--output-dir', default=None, help='出力先ディレクトリ')
+    parser.add_argument('--workers', type=int, default=None, help='ワーカープロセス数')
+    parser.add_argument('--no-cache', action='store_true', help='変更がない図も再描画する')
+    args = parser.parse_args()
+
+    config = load_settings(args.config)
+    if args.input or args.heat or args.power or args.year is not None:
+        # 1つの調査年度のみ（指定しなかった項目は設定の最初の調査年度のもの）
+        survey = dict(config['surveys'][0])
+        for key, value in (('survey', args.input), ('heat', args.heat), ('power', args.power), ('year', args.year)):
+            if value is not None:
+                survey[key] = os.path.abspath(value) if key in SURVEY_PATH_KEYS else value
+        config['surveys'] = [survey]
+    output_dir = args.output_dir or config['output_dir']
+    workers = args.workers if args.workers is not None else config['workers']
+
+    panel = load_panel(config['surveys'])
+    tasks, layouts = build_tasks(panel, output_dir, kinds=args.kinds, dpi=config['dpi'])
+    n_rendered = render_tasks(tasks, layouts, workers=workers, cache=not args.no_cache)
+    print(f"{n_rendered} 件の図を {output_dir} に保存しました")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,19 +3,54 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib as mpl
 
-# 日本語フォントの設定
-mpl.rcParams['font.family'] = 'DejaVu Sans, M+ 1C'
-plt.rcParams['font.size'] = 12
+from figure_rendering import make_job, render_figures
 
-def replot_power_generation_utilization_histogram():
+DATA_PATH = '/home/ubuntu/cur/program/Analyisis_incineration/2022_1焼却施設.csv'
+OUTPUT_PATH = '/home/ubuntu/cur/program/Analyisis_incineration/result/recalculated_utilization_histogram.png'
+
+
+def draw_capacity_factor_histogram(utilization_rate_filtered, original_count):
+    """再計算した発電利用率（設備利用率）のヒストグラムと統計情報を描画する"""
+    mean_val = utilization_rate_filtered.mean()
+    median_val = utilization_rate_filtered.median()
+    std_val = utilization_rate_filtered.std()
+    count_val = len(utilization_rate_filtered)
+    outlier_count = original_count - count_val
+
+    fig, ax = plt.subplots(figsize=(12, 7))
+
+    ax.hist(utilization_rate_filtered, bins=25, alpha=0.75, color='deepskyblue', edgecolor='black')
+
+    ax.set_title('Figure 2: Distribution of Capacity Factor')
+    ax.set_xlabel('Capacity Factor (%)')
+    ax.set_ylabel('Number of Facilities')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+    # 統計情報をテキストとしてプロットに追加
+    stats_text = (
+        f"Number of facilities analyzed: {original_count}\n"
+        f" (Number of outliers removed: {outlier_count})\n"
+        f"Number of facilities plotted: {count_val}\n"
+        f"Mean: {mean_val:.3f}\n"
+        f"Median: {median_val:.3f}\n"
+        f"Standard Deviation: {std_val:.3f}"
+    )
+    ax.text(0.97, 0.97, stats_text, transform=ax.transAxes,
+            fontsize=11, verticalalignment='top', horizontalalignment='right',
+            bbox=dict(boxstyle='round,pad=0.5', fc='aliceblue', alpha=0.8))
+    return fig
+
+
+def replot_power_generation_utilization_histogram(df=None, output_path=OUTPUT_PATH):
     """
     元のCSVデータから発電利用率を計算し、外れ値を除外した上でヒストグラムを作成する。
+    df（読み込み済みの元データ）を渡した場合は CSV を読み込まない。
     """
     try:
         # 元データの読み込み
-        df = pd.read_csv('/home/ubuntu/cur/program/Analyisis_incineration/2022_1焼却施設.csv', encoding='utf-8-sig')
+        if df is None:
+            df = pd.read_csv(DATA_PATH, encoding='utf-8-sig')
 
         # 発電を行っている施設をフィルタリング
         df_power = df[
@@ -59,36 +94,13 @@ def replot_power_generation_utilization_histogram():
         original_count = len(df_power)
         outlier_count = original_count - count_val
 
-        # 2. ヒストグラムのプロット
-        plt.figure(figsize=(12, 7))
-        
-        plt.hist(utilization_rate_filtered, bins=25, alpha=0.75, color='deepskyblue', edgecolor='black')
-
-        plt.title('Figure 2: Distribution of Capacity Factor')
-        plt.xlabel('Capacity Factor (%)')
-        plt.ylabel('Number of Facilities')
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-
-        # 統計情報をテキストとしてプロットに追加
-        stats_text = (
-            f"Number of facilities analyzed: {original_count}\n"
-            f" (Number of outliers removed: {outlier_count})\n"
-            f"Number of facilities plotted: {count_val}\n"
-            f"Mean: {mean_val:.3f}\n"
-            f"Median: {median_val:.3f}\n"
-            f"Standard Deviation: {std_val:.3f}"
-        )
-        plt.text(0.97, 0.97, stats_text, transform=plt.gca().transAxes,
-                 fontsize=11, verticalalignment='top', horizontalalignment='right',
-
-                 bbox=dict(boxstyle='round,pad=0.5', fc='aliceblue', alpha=0.8))
-
-        # 3. グラフの保存と表示
-        output_path = '/home/ubuntu/cur/program/Analyisis_incineration/result/recalculated_utilization_histogram.png'
-        plt.savefig(output_path)
-        plt.close()
+        # 2. ヒストグラムの描画と保存
+        render_figures([
+            make_job(draw_capacity_factor_histogram, output_path,
+                     kwargs={'utilization_rate_filtered': utilization_rate_filtered,
+                             'original_count': original_count}),
+        ])
         
-        print(f"新しいグラフ '{output_path}' を保存しました。")
         print("\n--- 発電利用率の統計情報（再計算後） ---")
         print(f"計算対象となった施設数: {original_count}")
         print(f"外れ値として除外された施設数: {outlier_count}")
@@ -99,7 +111,7 @@ def replot_power_generation_utilization_histogram():
         print()
 
     except FileNotFoundError:
-        print(f"エラー: ファイル /home/ubuntu/cur/program/Analyisis_incineration/2022_1焼却施設.csv が見つかりません。")
+        print(f"エラー: ファイル {DATA_PATH} が見つかりません。")
     except Exception as e:
         print(f"エラーが発生しました: {e}")
 
@@ -0,0 +1,346 @@
+"""
+複数のセクションからなる分析レポート（HTML）を作成するモジュール
+
+統計表・図・外れ値の監査・方式別の件数などをセクションとして登録し、1つの HTML にまとめる。
+セクションごとに入力データ・引数・コードのハッシュをキーとして HTML の断片をキャッシュするため、
+再作成時は入力が変わったセクションだけを描画し直す。レポートは断片を順にファイルへ書き出す
+（全体を文字列として保持しない）ため、画像を埋め込んだ大きなレポートでもメモリ使用量は増えない。
+"""
+
+import argparse
+import base64
+import glob
+import html as html_lib
+import os
+import shutil
+
+import pandas as pd
+
+import output_cache
+from binning import EFFICIENCY_BINS, distribution
+from data_quality_rules import SURVEY_RULES, build_violation_report, evaluate_rules, summarize_violations
+from figure_rendering import job_cache_key, make_job, render_figures
+from streaming_stats import numeric_chunk
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DATA_PATH = os.path.join(BASE_DIR, '2022_1焼却施設.csv')
+OUT_DIR = os.path.join(BASE_DIR, 'result')
+
+# セクションの HTML 断片の保存先（キャッシュのマニフェストと同じディレクトリ）
+SECTION_CACHE_DIR = os.path.join(os.path.dirname(output_cache.DEFAULT_MANIFEST), 'report_sections')
+
+# 画像を base64 で埋め込むときに一度に読み込むバイト数（3 の倍数にして改行なしで連結できるようにする）
+_EMBED_CHUNK = 3 * (1 << 16)
+
+_IMAGE_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.gif': 'image/gif',
+                '.svg': 'image/svg+xml', '.webp': 'image/webp'}
+
+REPORT_HEAD = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="utf-8" />
+    <title>{title}</title>
+    <style>
+        body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Noto Sans JP', 'Hiragino Kaku Gothic ProN', 'Yu Gothic', Meiryo, Arial, sans-serif; margin: 24px; }}
+        h1 {{ margin-bottom: 8px; }}
+        section {{ margin: 32px 0; }}
+        table.data {{ border-collapse: collapse; margin: 12px 0; }}
+        table.data th, table.data td {{ border: 1px solid #ddd; padding: 6px 8px; text-align: right; }}
+        table.data th {{ background: #f7f7f7; text-align: center; }}
+        .note {{ color: #666; font-size: 0.9em; }}
+        img.figure {{ max-width: 100%; border: 1px solid #eee; }}
+    </style>
+</head>
+<body>
+    <h1>{title}</h1>
+"""
+
+REPORT_FOOT = """
+    <p class="note">{note}</p>
+</body>
+</html>
+"""
+
+
+def make_section(name, title, render, kwargs=None, input_files=None, code=None):
+    """
+    セクションを作成する。
+
+    Args:
+        name (str): セクションの識別名（レポート内で一意。見出しのアンカーにも使う）
+        title (str): 見出し
+        render (callable): render(out, **kwargs) で HTML の断片を out に書き込むモジュールレベルの関数
+        kwargs (dict): render に渡す引数（キャッシュキーの計算に使う）。値が None の 'embed' と 'report_dir' は
+            build_report の設定で置き換える
+        input_files (list): セクションが読み込むファイル（内容が変われば描画し直す）
+        code (list): render 以外にセクションの内容に影響する関数・モジュール
+    """
+    return {
+        'name': name,
+        'title': title,
+        'render': render,
+        'kwargs': kwargs or {},
+        'input_files': input_files or [],
+        'code': code or [],
+    }
+
+
+# ---------------------------------------------------------------------------
+# セクションの描画関数
+# ---------------------------------------------------------------------------
+
+def write_table(out, table, index=True, note=None, float_format='{:,.2f}'.format):
+    """表を書き込む"""
+    if note:
+        out.write(f'<p class="note">{html_lib.escape(note)}</p>\n')
+    table.to_html(buf=out, index=index, classes='data', border=0, float_format=float_format)
+    out.write('\n')
+
+
+def write_describe(out, df, columns=None):
+    """数値列の基本統計（describe）を書き込む"""
+    data = df if columns is None else df[columns]
+    numeric = numeric_chunk(data)
+    write_table(out, numeric.describe().transpose(), note=f'総行数: {len(df):,}')
+
+
+def write_distribution(out, values, bins, aggregates=None):
+    """範囲別分布（binning.distribution）を書き込む"""
+    values = pd.to_numeric(pd.Series(values), errors='coerce')
+    dist = distribution(values, bins, aggregates=aggregates)
+    write_table(out, dist, index=False, note=f'有効データ数: {int(values.notna().sum()):,} / {len(values):,}')
+
+
+def write_audit(out, df, rules=SURVEY_RULES, max_rows=200):
+    """データ品質ルールの監査結果（ルール別の違反施設数と違反施設の一覧）を書き込む"""
+    violations = evaluate_rules(df, rules)
+    write_table(out, summarize_violations(violations, rules), index=False)
+    report = build_violation_report(df, violations, rules)
+    note = f'違反のある施設: {len(report):,} 件'
+    if len(report) > max_rows:
+        note += f'（違反件数の多い順に {max_rows} 件を表示）'
+    write_table(out, report.sort_values('違反件数', ascending=False, kind='stable').head(max_rows),
+                index=False, note=note)
+
+
+def write_counts(out, counts, label='件数'):
+    """value_counts などの件数を表にして書き込む"""
+    table = counts.rename(label).to_frame()
+    table['割合_%'] = table[label] / table[label].sum() * 100
+    write_table(out, table)
+
+
+def write_image(out, path, embed=True, report_dir=None, alt=''):
+    """
+    画像を書き込む。
+
+    embed が True なら base64 の data URI として埋め込み（分割して読み込み・書き込む）、
+    False ならレポートからの相対パスでリンクする。
+    """
+    alt = html_lib.escape(alt or os.path.basename(path))
+    if not embed:
+        src = os.path.relpath(path, report_dir) if report_dir else os.path.abspath(path)
+        out.write(f'<img class="figure" src="{html_lib.escape(src)}" alt="{alt}" />\n')
+        return
+    mime = _IMAGE_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
+    out.write(f'<img class="figure" alt="{alt}" src="data:{mime};base64,')
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_EMBED_CHUNK), b''):
+            out.write(base64.b64encode(chunk).decode('ascii'))
+    out.write('" />\n')
+
+
+def write_figure(out, job, embed=True, report_dir=None):
+    """描画ジョブの図を描画（変更がなければ描画済みの図を使用）して書き込む"""
+    render_figures([job])
+    write_image(out, job['output'], embed=embed, report_dir=report_dir)
+
+
+def write_csv_table(out, path, max_rows=100, encoding='utf-8-sig'):
+    """CSV ファイルの内容を表として書き込む（先頭 max_rows 行）"""
+    table = pd.read_csv(path, encoding=encoding, nrows=max_rows + 1)
+    note = os.path.basename(path)
+    if len(table) > max_rows:
+        table = table.head(max_rows)
+        note += f'（先頭 {max_rows} 行）'
+    write_table(out, table, index=False, note=note)
+
+
+# ---------------------------------------------------------------------------
+# よく使うセクション
+# ---------------------------------------------------------------------------
+
+def describe_section(name, title, df, columns=None):
+    return make_section(name, title, write_describe, {'df': df, 'columns': columns})
+
+
+def distribution_section(name, title, values, bins, aggregates=None):
+    return make_section(name, title, write_distribution, {'values': values, 'bins': bins, 'aggregates': aggregates},
+                        code=[distribution])
+
+
+def audit_section(name, title, df, rules=SURVEY_RULES):
+    return make_section(name, title, write_audit, {'df': df, 'rules': rules}, code=[evaluate_rules])
+
+
+def counts_section(name, title, counts, label='件数'):
+    return make_section(name, title, write_counts, {'counts': counts, 'label': label})
+
+
+def figure_section(name, title, job, embed=None):
+    """描画ジョブ（figure_rendering.make_job）の図のセクション"""
+    return make_section(name, title, write_figure, {'job': job, 'embed': embed, 'report_dir': None},
+                        code=[job['draw']])
+
+
+def image_section(name, title, path, embed=None):
+    """生成済みの画像ファイルのセクション"""
+    return make_section(name, title, write_image, {'path': path, 'embed': embed, 'report_dir': None},
+                        input_files=[path])
+
+
+def csv_section(name, title, path, max_rows=100):
+    """生成済みの CSV ファイルのセクション"""
+    return make_section(name, title, write_csv_table, {'path': path, 'max_rows': max_rows}, input_files=[path])
+
+
+# ---------------------------------------------------------------------------
+# レポートの作成
+# ---------------------------------------------------------------------------
+
+def section_cache_key(section):
+    """セクションの引数・入力ファイル・コードからキャッシュキーを計算する"""
+    kwargs = section['kwargs']
+    data = dict(kwargs)
+    if 'job' in data:
+        # 図はジョブのキー（引数・保存設定・描画関数のコード）で代表させる
+        data['job'] = job_cache_key(data['job'])
+    return output_cache.compute_key(
+        data=data,
+        params={'name': section['name'], 'title': section['title']},
+        code=[section['render'], __file__, *section['code']],
+        input_files=section['input_files'],
+    )
+
+
+def _resolve_context(section, context):
+    """値が None の 'embed' / 'report_dir' をレポートの設定で置き換えたセクションを返す"""
+    kwargs = {k: (context[k] if k in context and v is None else v) for k, v in section['kwargs'].items()}
+    return {**section, 'kwargs': kwargs}
+
+
+def _render_fragment(section, fragment_path):
+    """セクションの HTML 断片を描画して保存する"""
+    tmp_path = fragment_path + '.part'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(f'    <section id="{html_lib.escape(section["name"])}">\n')
+        f.write(f'    <h2>{html_lib.escape(section["title"])}</h2>\n')
+        section['render'](f, **section['kwargs'])
+        f.write('    </section>\n')
+    os.replace(tmp_path, fragment_path)
+
+
+def build_report(sections, out_path, title='分析レポート', embed_images=True, cache=True):
+    """
+    セクションを順に描画して1つの HTML レポートに書き出す。
+
+    Args:
+        sections (list): make_section などで作成したセクション
+        out_path (str): レポートの保存先
+        title (str): レポートの見出し
+        embed_images (bool): 画像を埋め込む（False なら相対パスでリンクする）
+        cache (bool): 入力が前回と同じセクションは保存済みの断片を使う
+
+    Returns:
+        int: 描画し直したセクション数
+    """
+    names = [s['name'] for s in sections]
+    if len(set(names)) != len(names):
+        raise ValueError(f"セクション名が重複しています: {names}")
+
+    report_dir = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(report_dir, exist_ok=True)
+    os.makedirs(SECTION_CACHE_DIR, exist_ok=True)
+    context = {'embed': embed_images, 'report_dir': report_dir}
+    sections = [_resolve_context(s, context) for s in sections]
+
+    keys = [section_cache_key(s) for s in sections]
+    fragments = [os.path.join(SECTION_CACHE_DIR, f'{key}.html') for key in keys]
+    fresh = (output_cache.fresh_flags([(k, [p]) for k, p in zip(keys, fragments)]) if cache
+             else [False] * len(sections))
+
+    rendered = []
+    tmp_path = out_path + '.part'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        out.write(REPORT_HEAD.format(title=html_lib.escape(title)))
+        out.write('    <ul class="toc">\n')
+        for s in sections:
+            out.write(f'        <li><a href="#{html_lib.escape(s["name"])}">{html_lib.escape(s["title"])}</a></li>\n')
+        out.write('    </ul>\n')
+
+        for section, key, fragment, is_fresh in zip(sections, keys, fragments, fresh):
+            if not is_fresh:
+                _render_fragment(section, fragment)
+                rendered.append((key, [fragment], {'kind': 'report_section', 'section': section['name']}))
+            with open(fragment, 'r', encoding='utf-8') as f:
+                shutil.copyfileobj(f, out)
+
+        out.write(REPORT_FOOT.format(
+            note=f"全 {len(sections)} セクション（うち {len(rendered)} セクションを今回描画）"))
+    os.replace(tmp_path, out_path)
+    if cache:
+        output_cache.record_many(rendered)
+
+    print(f"レポートを書き出しました: {out_path}（描画 {len(rendered)} / 全 {len(sections)} セクション）")
+    return len(rendered)
+
+
+def default_sections(df, out_dir=OUT_DIR, include_results=False):
+    """焼却施設データの標準的なセクション（基本統計・発電効率・外れ値の監査・実施方式の件数）"""
+    from plot_efficiency_histogram import compute_efficiency, draw_efficiency_histogram
+    from 運営体分析 import TARGET_COL, value_counts_grouped_raw
+
+    efficiency, keep = compute_efficiency(df)
+    histogram_path = os.path.join(out_dir, 'power_generation_efficiency_histogram.png')
+    stat_columns = [c for c in ['年間処理量_t/年度', '施設全体の処理能力_t/日', '発電能力_発電効率（仕様値・公称値）_％']
+                    if c in df.columns]
+    sections = [
+        describe_section('describe', '主な数値列の基本統計', df, stat_columns),
+        distribution_section('efficiency_bins', '発電効率の範囲別分布', efficiency, EFFICIENCY_BINS),
+        figure_section('efficiency_histogram', '発電効率のヒストグラム（IQR法で外れ値を除外）', make_job(
+            draw_efficiency_histogram, histogram_path,
+            kwargs={'efficiency_filtered': efficiency[keep], 'original_count': len(efficiency)})),
+        audit_section('quality_audit', 'データ品質ルールの監査', df),
+        counts_section('method_counts', 'ごみ処理事業実施方式（方式の種類別）の件数',
+                       value_counts_grouped_raw(df, TARGET_COL), label='施設数'),
+    ]
+    if include_results:
+        for path in sorted(glob.glob(os.path.join(out_dir, '*.png'))):
+            # 既定のセクションで描画する図は重複して取り込まない
+            if os.path.abspath(path) != os.path.abspath(histogram_path):
+                sections.append(image_section(f'png_{os.path.basename(path)}', os.path.basename(path), path))
+        for path in sorted(glob.glob(os.path.join(out_dir, '*.csv'))):
+            sections.append(csv_section(f'csv_{os.path.basename(path)}', os.path.basename(path), path))
+    return sections
+
+
+def main():
+    parser = argparse.ArgumentParser(description='焼却施設データの分析レポート（HTML）を作成する')
+    parser.add_argument('--input', default=DATA_PATH, help='施設データのCSV')
+    parser.add_argument('--output', default=os.path.join(OUT_DIR, 'analysis_report.html'), help='レポートの保存先')
+    parser.add_argument('--out-dir', default=OUT_DIR, help='図の保存先・取り込む結果のディレクトリ')
+    parser.add_argument('--include-results', action='store_true',
+                        help='出力ディレクトリの生成済みの図（*.png）と表（*.csv）もセクションとして取り込む')
+    parser.add_argument('--link-images', action='store_true', help='画像を埋め込まず相対パスでリンクする')
+    parser.add_argument('--no-cache', action='store_true', help='全てのセクションを描画し直す')
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input, encoding='utf-8-sig')
+    sections = default_sections(df, args.out_dir, include_results=args.include_results)
+    build_report(sections, args.output, title='焼却施設データ 分析レポート',
+                 embed_images=not args.link_images, cache=not args.no_cache)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+分析結果の保存先（型付きの Parquet・実行メタデータ・カタログ）
+
+calculate_statistics.py などの結果を <output_dir>/store/<データセット名>/<版>.parquet に保存し、
+入力データのハッシュ・パラメータ（外れ値の σ、低位発熱量の選び方など）・コードのバージョンを
+Parquet のメタデータとカタログ（catalog.jsonl）に記録する。版は結果の内容・パラメータ・コードの
+ハッシュで、同じ結果は同じファイルになる。
+
+後段のスクリプトは latest() / read_result() で「データセット X をパラメータ Y で計算した最新の結果」を
+必要な列だけ読み込める。CSV で読み込む場合と違って型（数値・真偽値・欠損）がそのまま保たれる。
+CSV は write_result(csv_path=...) で従来どおり書き出せる（後方互換のための出力）。
+
+    python result_store.py result/store                      # カタログの一覧
+    python result_store.py result/store --dataset power_generation_filtered --export out.csv
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from output_cache import code_version, compute_key, file_digest, write_csv
+
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'result', 'store')
+CATALOG_FILE = 'catalog.jsonl'
+# Parquet のスキーマのメタデータに実行メタデータを保存するキー
+METADATA_KEY = b'result_store'
+
+
+def store_dir_for(output_dir):
+    """出力先ディレクトリに対応する保存先"""
+    return os.path.join(output_dir, 'store')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("結果を Parquet で保存するには pyarrow が必要です (pip install pyarrow)") from e
+    return pyarrow
+
+
+def _catalog_path(store_dir):
+    return os.path.join(store_dir, CATALOG_FILE)
+
+
+def write_result(df, dataset, params=None, input_files=None, code=None, store_dir=DEFAULT_STORE, csv_path=None):
+    """
+    結果を Parquet で保存し、カタログに記録する。
+
+    Args:
+        df (pd.DataFrame): 保存する結果
+        dataset (str): データセット名（例: 'heat_utilization_filtered'）
+        params (dict): 結果を計算したパラメータ（latest() の検索条件になる）
+        input_files (list): 入力ファイル（ハッシュをメタデータに記録する）
+        code (list): 結果を計算した関数など（ソースのハッシュをメタデータに記録する）
+        store_dir (str): 保存先
+        csv_path (str): 指定した場合は CSV（utf-8-sig）にも書き出す（同じ内容の CSV が残っていれば書き直さない）
+
+    Returns:
+        dict: カタログに記録した内容（path, version など）と CSV を書き出したかどうか（csv_written）
+    """
+    pa = _pyarrow()
+    params = dict(params or {})
+    input_files = [p for p in (input_files or []) if os.path.exists(p)]
+    version = compute_key(data=df, params={'dataset': dataset, **params}, code=code)[:16]
+    path = os.path.join(store_dir, dataset, f"{version}.parquet")
+
+    entry = {
+        'dataset': dataset,
+        'version': version,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'path': os.path.abspath(path),
+        'rows': len(df),
+        'columns': [str(c) for c in df.columns],
+        'params': params,
+        'input_hash': {os.path.basename(p): file_digest(p) for p in input_files},
+        'code_version': {getattr(obj, '__qualname__', repr(obj)): code_version(obj) for obj in code or []},
+    }
+
+    # 同じ版（内容・パラメータ・コードが同じ）が既にあれば書き直さない
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[METADATA_KEY] = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        part = path + '.part'
+        pa.parquet.write_table(table.replace_schema_metadata(metadata), part, compression='zstd')
+        os.replace(part, path)
+
+    # カタログは1行ずつ追記する（後の行ほど新しい）
+    with open(_catalog_path(store_dir), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    csv_written = csv_path is not None and write_csv(df, csv_path, index=False, encoding='utf-8-sig')
+    return {**entry, 'csv_written': csv_written}
+
+
+def read_catalog(store_dir=DEFAULT_STORE):
+    """カタログの記録（ファイルが残っているもののみ、新しい順）"""
+    try:
+        with open(_catalog_path(store_dir), 'r', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+    return [e for e in reversed(entries) if os.path.exists(e['path'])]
+
+
+def find_results(dataset, params=None, store_dir=DEFAULT_STORE):
+    """
+    データセットの結果のうち、params の値が全て一致するものを新しい順に返す。
+
+    params に含めなかったパラメータは問わない。同じ版が複数回記録されている場合は最新の記録のみ。
+    """
+    params = params or {}
+    found, seen = [], set()
+    for entry in read_catalog(store_dir):
+        if entry['dataset'] != dataset or entry['version'] in seen:
+            continue
+        if all(entry['params'].get(k) == v for k, v in params.items()):
+            found.append(entry)
+            seen.add(entry['version'])
+    return found
+
+
+def latest(dataset, params=None, store_dir=DEFAULT_STORE):
+    """データセットの最新の結果の記録（なければ None）"""
+    found = find_results(dataset, params, store_dir)
+    return found[0] if found else None
+
+
+def read_result(dataset, columns=None, params=None, version=None, store_dir=DEFAULT_STORE):
+    """
+    データセットの結果を読み込む（既定は最新の結果）。
+
+    Args:
+        columns (list): 読み込む列（省略時は全ての列）
+        params (dict): 検索条件のパラメータ
+        version (str): 読み込む版（指定した場合は params より優先）
+    """
+    if version is not None:
+        entry = next((e for e in find_results(dataset, store_dir=store_dir) if e['version'] == version), None)
+    else:
+        entry = latest(dataset, params, store_dir)
+    if entry is None:
+        raise FileNotFoundError(f"保存された結果がありません: {dataset} {params or ''}（{store_dir}）")
+    _pyarrow()
+    return pd.read_parquet(entry['path'], columns=columns)
+
+
+def read_metadata(path):
+    """Parquet ファイルに保存した実行メタデータ"""
+    pa = _pyarrow()
+    metadata = pa.parquet.read_schema(path).metadata or {}
+    return json.loads(metadata[METADATA_KEY]) if METADATA_KEY in metadata else None
+
+
+def load_result(dataset, csv_path, columns=None, params=None, store_dir=None):
+    """
+    結果を保存先から読み込み、保存先にデータセットの記録が1つもなければ（保存先を使う前の結果）CSV を読み込む。
+
+    params を指定し、保存先にデータセットの記録があるのに params に一致する結果がない場合は
+    FileNotFoundError を送出する（CSV は別のパラメータで計算した結果の可能性があるため読み込まない）。
+
+    Args:
+        csv_path (str): 従来の結果CSV（保存先の既定は同じディレクトリの store）
+    """
+    store_dir = store_dir or store_dir_for(os.path.dirname(os.path.abspath(csv_path)))
+    try:
+        return read_result(dataset, columns=columns, params=params, store_dir=store_dir)
+    except (FileNotFoundError, ImportError):
+        if params is not None and find_results(dataset, store_dir=store_dir):
+            raise
+        return pd.read_csv(csv_path, encoding='utf-8-sig', usecols=columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='保存した分析結果の一覧と CSV への書き出し')
+    parser.add_argument('store', nargs='?', default=DEFAULT_STORE, help='保存先ディレクトリ')
+    parser.add_argument('--dataset', default=None, help='データセット名')
+    parser.add_argument('--version', default=None, help='版（省略時は最新）')
+    parser.add_argument('--export', default=None, help='結果を書き出す CSV のパス（--dataset が必要）')
+    args = parser.parse_args()
+
+    if args.export:
+        if not args.dataset:
+            parser.error('--export には --dataset が必要です')
+        df = read_result(args.dataset, version=args.version, store_dir=args.store)
+        df.to_csv(args.export, index=False, encoding='utf-8-sig')
+        print(f"{args.dataset} を {args.export} に出力しました（{len(df)} 件）")
+        return
+
+    entries = read_catalog(args.store)
+    if args.dataset:
+        entries = find_results(args.dataset, store_dir=args.store)
+    if not entries:
+        print(f"保存された結果がありません: {args.store}")
+        return
+    catalog = pd.DataFrame([{
+        'dataset': e['dataset'], 'version': e['version'], 'created': e['created'], 'rows': e['rows'],
+        **{f"param_{k}": v for k, v in e['params'].items()},
+    } for e in entries]).drop_duplicates(['dataset', 'version'])
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(catalog.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+CSV をチャンクごとに読み込み、列ごとの統計量を逐次的に集計するモジュール
+
+件数・平均・分散（Chan らの並列アルゴリズムで合成できるモーメント）と最小値・最大値は全列まとめて
+NumPy の配列で更新する。四分位数とヒストグラムは列ごとの固定サイズの一様サンプル
+（ランダムな優先度の小さい順に保持するボトム k サンプル。合成しても一様性が保たれる）から求める。
+メモリ使用量は行数によらず「列数 × サンプルサイズ」で抑えられる。
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 50_000
+DEFAULT_SAMPLE_SIZE = 20_000
+DESCRIBE_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+
+def numeric_chunk(df):
+    """数値型でない列だけを pd.to_numeric で数値化する（数値列はそのまま使う）"""
+    df = df.copy()
+    for col in df.columns[~df.dtypes.map(pd.api.types.is_numeric_dtype).to_numpy(dtype=bool)]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def iter_numeric_chunks(csv_path, chunksize=DEFAULT_CHUNKSIZE, encoding='utf-8-sig'):
+    """CSV をチャンクごとに読み込み、数値化した DataFrame を順に返す"""
+    for chunk in pd.read_csv(csv_path, encoding=encoding, chunksize=chunksize, low_memory=False):
+        yield numeric_chunk(chunk)
+
+
+class StreamingDescribe:
+    """
+    列ごとの統計量を逐次的に集計し、DataFrame.describe() と同じ形式で返す。
+
+    Args:
+        columns (list): 集計する列名
+        sample_size (int): 四分位数・ヒストグラム用に列ごとに保持するサンプルの最大件数
+        seed (int): サンプリングの乱数シード
+    """
+
+    def __init__(self, columns, sample_size=DEFAULT_SAMPLE_SIZE, seed=0):
+        self.columns = list(columns)
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+        n = len(self.columns)
+        self.n_rows = 0
+        self.count = np.zeros(n, dtype=np.int64)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+        # 列ごとのサンプル（値と優先度）
+        self.samples = [np.empty(0) for _ in range(n)]
+        self.priorities = [np.empty(0) for _ in range(n)]
+
+    def update(self, df):
+        """数値化したチャンクで統計量を更新する"""
+        values = df.reindex(columns=self.columns).to_numpy(dtype=float)
+        self.n_rows += len(values)
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0)
+        has = count > 0
+        if not has.any():
+            return
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(has, np.nansum(values, axis=0) / np.maximum(count, 1), 0.0)
+            m2 = np.nansum((values - mean) ** 2, axis=0)
+        self._merge_moments(count, mean, m2,
+                            np.where(valid, values, np.inf).min(axis=0),
+                            np.where(valid, values, -np.inf).max(axis=0))
+
+        for i in np.flatnonzero(has):
+            col_values = values[valid[:, i], i]
+            self._merge_sample(i, col_values, self.rng.random(col_values.size))
+
+    def merge(self, other):
+        """別の集計結果（同じ列）を合成する"""
+        if other.columns != self.columns:
+            raise ValueError("列が一致しない集計結果は合成できません")
+        self.n_rows += other.n_rows
+        self._merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+        for i in range(len(self.columns)):
+            self._merge_sample(i, other.samples[i], other.priorities[i])
+        return self
+
+    def _merge_moments(self, count, mean, m2, vmin, vmax):
+        total = self.count + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean - self.mean
+            ratio = np.where(total > 0, count / np.maximum(total, 1), 0.0)
+            self.mean = self.mean + delta * ratio
+            self.m2 = self.m2 + m2 + delta ** 2 * self.count * ratio
+        self.count = total
+        self.min = np.minimum(self.min, vmin)
+        self.max = np.maximum(self.max, vmax)
+
+    def _merge_sample(self, i, values, priorities):
+        values = np.concatenate([self.samples[i], values])
+        priorities = np.concatenate([self.priorities[i], priorities])
+        if values.size > self.sample_size:
+            keep = np.argpartition(priorities, self.sample_size)[:self.sample_size]
+            values, priorities = values[keep], priorities[keep]
+        self.samples[i] = values
+        self.priorities[i] = priorities
+
+    def is_exact(self, column):
+        """サンプルが全データを含む（四分位数・ヒストグラムが厳密値）かどうか"""
+        return self.count[self.columns.index(column)] <= self.sample_size
+
+    def describe(self):
+        """DataFrame.describe().transpose() と同じ形式の統計量"""
+        has = self.count > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.where(self.count > 1, np.sqrt(self.m2 / np.maximum(self.count - 1, 1)), np.nan)
+        quartiles = np.array([
+            np.quantile(s, [0.25, 0.5, 0.75]) if s.size else [np.nan] * 3 for s in self.samples
+        ]).reshape(len(self.columns), 3)
+        return pd.DataFrame({
+            'count': self.count.astype(float),
+            'mean': np.where(has, self.mean, np.nan),
+            'std': std,
+            'min': np.where(has, self.min, np.nan),
+            '25%': quartiles[:, 0],
+            '50%': quartiles[:, 1],
+            '75%': quartiles[:, 2],
+            'max': np.where(has, self.max, np.nan),
+        }, index=self.columns)[DESCRIBE_INDEX]
+
+    def histogram(self, column, bins=20):
+        """
+        列のヒストグラム（サンプルが全データを含まない場合はサンプルの度数を件数に合わせて拡大した推定値）
+
+        Returns:
+            tuple: (度数, ビン境界)。有効値がない場合は None
+        """
+        i = self.columns.index(column)
+        sample = self.samples[i]
+        if sample.size == 0:
+            return None
+        lo, hi = self.min[i], self.max[i]
+        if lo == hi:
+            lo, hi = lo - 0.5, hi + 0.5
+        counts, edges = np.histogram(sample, bins=bins, range=(lo, hi))
+        if sample.size < self.count[i]:
+            counts = counts * (self.count[i] / sample.size)
+        return counts, edges
+
+
+def svg_histogram(counts, edges, width=360, height=120, color='#4c78a8'):
+    """ヒストグラムをインラインの SVG 文字列にする（matplotlib を使わずに軽量に描画する）"""
+    n = len(counts)
+    top = max(float(np.max(counts)), 1.0)
+    bar_w = width / n
+    bars = ''.join(
+        f'<rect x="{i * bar_w:.1f}" y="{height - c / top * height:.1f}" width="{max(bar_w - 1, 0.5):.1f}" '
+        f'height="{c / top * height:.1f}" fill="{color}"><title>{edges[i]:.4g} – {edges[i + 1]:.4g}: {c:.0f}</title></rect>'
+        for i, c in enumerate(counts)
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height + 16}" '
+        f'viewBox="0 0 {width} {height + 16}">{bars}'
+        f'<text x="0" y="{height + 13}" font-size="11">{edges[0]:.4g}</text>'
+        f'<text x="{width}" y="{height + 13}" font-size="11" text-anchor="end">{edges[-1]:.4g}</text></svg>'
+    )
@@ -0,0 +1,160 @@
+"""
+焼却施設調査データ（2022_1焼却施設.csv と同じ列構成）の合成データを任意の行数で生成する
+
+実データの行を復元抽出して列構成・○ フラグ・カテゴリ・欠損の組み合わせを保ったまま、
+施設規模に比例する列（処理能力・処理量・発電能力・発電量・余熱利用量など）には行ごとに共通の
+規模係数を掛け、低位発熱量と発電効率には独立な揺らぎを加える。規模に比例する列は同じ係数で
+動かすため、発電利用率・設備利用率・余熱利用率などの比率は実データの分布に近いまま、
+値そのものは元の行と一致しない。
+
+    python synthetic_survey.py --rows 100000 --output result/synthetic/survey_100000.csv
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+CONFIG = {
+    'template': os.path.join(os.path.dirname(os.path.abspath(__file__)), '2022_1焼却施設.csv'),
+    'encoding': 'utf-8-sig',
+    'output_dir': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'result', 'synthetic'),
+    'seed': 0,
+    # 規模係数（対数正規分布）の標準偏差
+    'scale_sigma': 0.25,
+    # 低位発熱量・発電効率に掛ける揺らぎ（正規分布、相対値）の標準偏差
+    'lcv_sigma': 0.05,
+    'efficiency_sigma': 0.05,
+    # 主要な数値列を追加で欠損させる割合（補完・欠損処理の負荷確認用。0 なら実データの欠損のみ）
+    'extra_missing': 0.0,
+}
+
+# 施設規模に比例する列 → 丸める小数点以下の桁数
+SCALE_COLUMNS = {
+    '年間処理量_t/年度': 2,
+    '資源化量_資源化物回収_t/年度': 0,
+    '資源化量_発生ガス回収_m3/年度': 0,
+    '施設全体の処理能力_t/日': 0,
+    '余熱利用量（仕様値・公称値）_余熱利用量_MJ': 0,
+    '余熱利用量（仕様値・公称値）_うち外部熱供給量_MJ': 0,
+    '余熱利用量（実績値）_余熱利用量_MJ': 0,
+    '余熱利用量（実績値）_うち外部熱供給量_MJ': 0,
+    '発電能力_発電能力_kW': 0,
+    '発電能力_総発電量（実績値）_MWh': 0,
+    '発電能力_うち外部供給量（実績値）_MWh': 0,
+    '余剰電力利用（売電）_売電量_MWh/年': 0,
+    '余剰電力利用（売電）_売電収入_円/年': 0,
+}
+
+LCV_COLUMNS = ['低位発熱量_(計算値)_kJ/kg', '低位発熱量_(実測値)_kJ/kg']
+EFFICIENCY_COLUMN = '発電能力_発電効率（仕様値・公称値）_％'
+
+# extra_missing で欠損させる列
+MISSING_TARGETS = ['年間処理量_t/年度', '発電能力_発電能力_kW', '発電能力_総発電量（実績値）_MWh',
+                   '余熱利用量（実績値）_余熱利用量_MJ', *LCV_COLUMNS, EFFICIENCY_COLUMN]
+
+
+def load_template(config=CONFIG):
+    """合成の元にする実データを読み込む"""
+    return pd.read_csv(config['template'], encoding=config['encoding'])
+
+
+def _jitter(values, sigma, rng, decimals=0):
+    """相対値の揺らぎを加える（0 と欠損はそのまま、負にはしない）"""
+    noise = rng.normal(1.0, sigma, len(values)).clip(0.5, 1.5)
+    return (values * noise).round(decimals)
+
+
+def generate_survey(n_rows, template=None, config=CONFIG, seed=None):
+    """
+    実データと同じ列構成の合成データを生成する。
+
+    Args:
+        n_rows (int): 行数
+        template (pd.DataFrame): 元にする実データ（省略時は config['template'] を読み込む）
+        config (dict): 揺らぎの大きさなどの設定
+        seed (int): 乱数のシード（省略時は config['seed']）
+
+    Returns:
+        pd.DataFrame: 合成データ（列名・列の順序・型は実データと同じ）
+    """
+    if template is None:
+        template = load_template(config)
+    rng = np.random.default_rng(config['seed'] if seed is None else seed)
+
+    source = rng.integers(0, len(template), n_rows)
+    df = template.take(source).reset_index(drop=True)
+
+    # 識別子は行ごとに一意にする
+    df['施設コード'] = np.arange(1, n_rows + 1, dtype=np.int64) + 10_000_000
+    df['施設名称'] = df['施設名称'].astype(str) + '_' + pd.RangeIndex(n_rows).astype(str)
+
+    # 規模に比例する列は行ごとに同じ係数を掛ける（比率の分布を保つ）
+    scale = rng.lognormal(0.0, config['scale_sigma'], n_rows)
+    for column, decimals in SCALE_COLUMNS.items():
+        if column in df.columns:
+            df[column] = (pd.to_numeric(df[column], errors='coerce') * scale).round(decimals)
+
+    for column in LCV_COLUMNS:
+        if column in df.columns:
+            df[column] = _jitter(pd.to_numeric(df[column], errors='coerce'), config['lcv_sigma'], rng)
+    if EFFICIENCY_COLUMN in df.columns:
+        df[EFFICIENCY_COLUMN] = _jitter(pd.to_numeric(df[EFFICIENCY_COLUMN], errors='coerce'),
+                                        config['efficiency_sigma'], rng, decimals=1)
+
+    if config['extra_missing'] > 0:
+        for column in MISSING_TARGETS:
+            if column in df.columns:
+                df.loc[rng.random(n_rows) < config['extra_missing'], column] = np.nan
+    return df
+
+
+def synthetic_path(n_rows, seed=None, config=CONFIG):
+    """行数とシードに対応する合成データのパス"""
+    seed = config['seed'] if seed is None else seed
+    missing = f"_missing{config['extra_missing']:g}" if config['extra_missing'] > 0 else ''
+    return os.path.join(config['output_dir'], f"survey_{n_rows}_seed{seed}{missing}.csv")
+
+
+def write_survey(n_rows, output_path=None, template=None, config=CONFIG, seed=None, overwrite=False):
+    """
+    合成データを生成してCSVに保存する（既にあれば再生成しない）。
+
+    Returns:
+        str: 保存したCSVのパス
+    """
+    output_path = output_path or synthetic_path(n_rows, seed, config)
+    if os.path.exists(output_path) and not overwrite:
+        if os.path.getmtime(output_path) >= os.path.getmtime(config['template']):
+            return output_path
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    df = generate_survey(n_rows, template, config, seed)
+    # 書き込み途中のファイルを読まれないよう、一時ファイルに書いてから置き換える
+    part = output_path + '.part'
+    df.to_csv(part, index=False, encoding=config['encoding'])
+    os.replace(part, output_path)
+    print(f"合成データを {output_path} に出力しました（{n_rows:,} 行）")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='焼却施設調査データと同じ列構成の合成データを生成する')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000], help='行数（複数指定可）')
+    parser.add_argument('--output', default=None, help='出力CSV（行数を1つだけ指定した場合）')
+    parser.add_argument('--seed', type=int, default=CONFIG['seed'], help='乱数のシード')
+    parser.add_argument('--extra-missing', type=float, default=CONFIG['extra_missing'],
+                        help='主要な数値列を追加で欠損させる割合')
+    parser.add_argument('--overwrite', action='store_true', help='既存のファイルも再生成する')
+    args = parser.parse_args()
+    if args.output and len(args.rows) > 1:
+        parser.error('--output は行数を1つだけ指定した場合に使えます')
+
+    config = {**CONFIG, 'extra_missing': args.extra_missing}
+    template = load_template(config)
+    for n_rows in args.rows:
+        write_survey(n_rows, args.output, template, config, args.seed, overwrite=args.overwrite)
+
+
+if __name__ == '__main__':
+    main()
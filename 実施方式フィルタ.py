@@ -1,12 +1,23 @@
 import os
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import re
+
 import pandas as pd
 
+from instrumentation import stage
+
 
 # Defaults aligned with 運営体分析.py
 DATA_PATH = "/home/ubuntu/cur/program/Analyisis_incineration/2022_1焼却施設.csv"
 OUT_DIR = "/home/ubuntu/cur/program/Analyisis_incineration/result"
 TARGET_COL = "ごみ処理事業実施方式"
+# 分割出力で Parquet の hive 形式のディレクトリ名（<列名>=<方式>）に使う列名
+PARTITION_COL = "実施方式キー"
+# "_" で始まるファイルは pyarrow がデータセットの読み込みで無視する
+MANIFEST_NAME = "_partition_manifest.csv"
+# ファイル名・ディレクトリ名に使えない文字（hive 形式と同じく %XX にする）
+UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|%=\x00-\x1f]')
 
 
 def load_data(path: str) -> pd.DataFrame:
@@ -47,6 +58,13 @@ def normalize_series_for_grouped_match(s: pd.Series) -> pd.Series:
     return grouped.replace({"": "不明・未記載"})
 
 
+def normalize_keys(s: pd.Series, match: str = "raw") -> pd.Series:
+    """Return the scheme key used for matching (``raw`` or ``grouped``)."""
+    if match == "raw":
+        return normalize_series_for_raw_match(s)
+    return normalize_series_for_grouped_match(s)
+
+
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(
         description=(
@@ -55,7 +73,7 @@ def parse_args() -> argparse.Namespace:
     )
     p.add_argument(
         "methods",
-        nargs="+",
+        nargs="*",
         help=(
             "抽出対象の方式名（複数可）。"
             "--match grouped の場合は 'DB', 'PFI' など括弧前を指定"
@@ -86,35 +104,58 @@ def parse_args() -> argparse.Namespace:
             "raw: カラムの表記そのままで一致。grouped: 括弧前でグルーピングして一致"
         ),
     )
-    return p.parse_args()
-
-
-def main() -> None:
-    args = parse_args()
+    p.add_argument(
+        "--partition-dir",
+        default=None,
+        help=(
+            "指定時は方式名を指定せず、全ての方式を1回の読み込みで方式ごとに分割してこのディレクトリに出力する"
+        ),
+    )
+    p.add_argument(
+        "--format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="分割出力の形式。parquet は <実施方式キー>=<方式>/part-0.parquet の hive 形式",
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="分割出力を並行して書き出すスレッド数（既定: CPU 数）",
+    )
+    args = p.parse_args()
+    if not args.methods and args.partition_dir is None:
+        p.error("抽出対象の方式名、または --partition-dir を指定してください。")
+    return args
 
-    os.makedirs(OUT_DIR, exist_ok=True)
-    out_path = args.output or os.path.join(OUT_DIR, "filtered_implementation_methods.csv")
 
-    df = load_data(args.input)
-    if args.column not in df.columns:
-        raise SystemExit(f"指定カラムが見つかりません: {args.column}")
+def filter_methods(
+    df: pd.DataFrame,
+    methods: list,
+    out_path: str,
+    column: str = TARGET_COL,
+    match: str = "raw",
+) -> pd.DataFrame:
+    """Extract rows whose scheme is one of ``methods`` and save them to ``out_path``."""
+    if column not in df.columns:
+        raise SystemExit(f"指定カラムが見つかりません: {column}")
 
-    methods = [m.strip() for m in args.methods if str(m).strip() != ""]
+    methods = [m.strip() for m in methods if str(m).strip() != ""]
     if not methods:
         raise SystemExit("抽出対象の方式名が空です。1つ以上指定してください。")
 
-    s = df[args.column]
-    if args.match == "raw":
-        key_series = normalize_series_for_raw_match(s)
-    else:
-        key_series = normalize_series_for_grouped_match(s)
+    with stage("derive", rows=len(df)):
+        key_series = normalize_keys(df[column], match)
 
-    include_set = set(methods)
-    mask = key_series.isin(include_set)
-    filtered = df.loc[mask].copy()
+    with stage("filter", rows=len(df)) as record:
+        include_set = set(methods)
+        mask = key_series.isin(include_set)
+        filtered = df.loc[mask].copy()
+        record["rows"] = len(filtered)
 
     # Save
-    filtered.to_csv(out_path, index=False, encoding="utf-8-sig")
+    with stage("export", rows=len(filtered)):
+        filtered.to_csv(out_path, index=False, encoding="utf-8-sig")
 
     # Report
     unique_found = sorted(set(key_series[mask]))
@@ -124,6 +165,106 @@ def main() -> None:
         " 一致方式=", unique_found,
     )
     print("出力CSV:", out_path)
+    return filtered
+
+
+def partition_path(out_dir: str, key: str, fmt: str = "csv") -> str:
+    """Output path of one partition (unsafe characters in the key are %XX-encoded)."""
+    encoded = UNSAFE_CHARS.sub(lambda m: "".join(f"%{b:02X}" for b in m.group().encode("utf-8")), key)
+    if fmt == "parquet":
+        return os.path.join(out_dir, f"{PARTITION_COL}={encoded}", "part-0.parquet")
+    return os.path.join(out_dir, f"{encoded}.csv")
+
+
+def _write_partition(part: pd.DataFrame, path: str, fmt: str) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 書き込み途中のファイルを読まれないよう、一時ファイルに書いてから置き換える
+    tmp = path + ".part"
+    if fmt == "parquet":
+        part.to_parquet(tmp, index=False)
+    else:
+        part.to_csv(tmp, index=False, encoding="utf-8-sig")
+    os.replace(tmp, path)
+    return path
+
+
+def _remove_stale(out_dir: str, keep: set) -> None:
+    """Remove partitions listed in the previous manifest that are not written this time."""
+    manifest = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest):
+        return
+    for path in pd.read_csv(manifest, encoding="utf-8-sig")["出力"].dropna():
+        path = os.path.join(out_dir, path)
+        if path not in keep and os.path.exists(path):
+            os.remove(path)
+            parent = os.path.dirname(path)
+            if parent != out_dir and not os.listdir(parent):
+                os.rmdir(parent)
+
+
+def partition_methods(
+    df: pd.DataFrame,
+    out_dir: str,
+    column: str = TARGET_COL,
+    match: str = "raw",
+    fmt: str = "csv",
+    workers: int = None,
+) -> pd.DataFrame:
+    """Split rows by scheme key in one pass and write every partition concurrently.
+
+    The key is normalized once for the whole frame (``raw`` or ``grouped``, as in
+    ``filter_methods``). ``fmt="csv"`` writes ``<key>.csv`` per scheme and
+    ``fmt="parquet"`` writes a hive-partitioned dataset
+    (``<PARTITION_COL>=<key>/part-0.parquet``) readable with
+    ``pd.read_parquet(out_dir)``. A manifest with the row count of every
+    partition is written to ``<out_dir>/_partition_manifest.csv``.
+
+    Returns the manifest (方式, 件数, 出力).
+    """
+    if column not in df.columns:
+        raise SystemExit(f"指定カラムが見つかりません: {column}")
+
+    with stage("derive", rows=len(df)):
+        key_series = normalize_keys(df[column], match)
+        groups = key_series.groupby(key_series, sort=True).indices
+        paths = {key: partition_path(out_dir, key, fmt) for key in groups}
+
+    with stage("export", rows=len(df), partitions=len(groups)):
+        os.makedirs(out_dir, exist_ok=True)
+        _remove_stale(out_dir, set(paths.values()))
+        with ThreadPoolExecutor(max_workers=workers or min(len(groups), os.cpu_count() or 1) or 1) as executor:
+            futures = [
+                executor.submit(_write_partition, df.iloc[rows], paths[key], fmt)
+                for key, rows in groups.items()
+            ]
+            for future in futures:
+                future.result()
+
+        manifest = pd.DataFrame({
+            "方式": list(groups),
+            "件数": [len(rows) for rows in groups.values()],
+            "出力": [os.path.relpath(paths[key], out_dir) for key in groups],
+        }).sort_values("件数", ascending=False, kind="stable")
+        manifest.to_csv(os.path.join(out_dir, MANIFEST_NAME), index=False, encoding="utf-8-sig")
+
+    print("分割完了: 総件数=", len(df), " 方式数=", len(manifest), " 形式=", fmt)
+    print(manifest.to_string(index=False))
+    print("出力先:", out_dir)
+    return manifest.reset_index(drop=True)
+
+
+def main() -> None:
+    args = parse_args()
+
+    df = load_data(args.input)
+    if args.partition_dir is not None:
+        partition_methods(df, args.partition_dir, column=args.column, match=args.match,
+                          fmt=args.format, workers=args.workers)
+        return
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    out_path = args.output or os.path.join(OUT_DIR, "filtered_implementation_methods.csv")
+    filter_methods(df, args.methods, out_path, column=args.column, match=args.match)
 
 
 if __name__ == "__main__":
@@ -1,94 +1,15 @@
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-import seaborn as sns
-from matplotlib import font_manager
-from matplotlib import rcParams
-from matplotlib.font_manager import FontProperties
 import argparse
 
+import output_cache
+from figure_rendering import make_job, render_figures
+from instrumentation import stage
+from jp_font import japanese_font_properties
 
-JP_FONT_PROP: FontProperties | None = None  # set by setup_japanese_font
-
-
-def setup_japanese_font() -> None:
-	"""Pick and apply a JP-capable font to avoid DejaVu fallback."""
-	candidate_paths = [
-		"/usr/share/fonts/truetype/mplus/mplus-1c-regular.ttf",
-		"/usr/share/fonts/truetype/mplus/mplus-1c-bold.ttf",
-		"/usr/share/fonts/truetype/mplus/mplus-1c-medium.ttf",
-		"/usr/share/fonts/truetype/mplus/mplus-1p-regular.ttf",
-		"/usr/share/fonts/truetype/mplus/mplus-1p-bold.ttf",
-		"/usr/share/fonts/truetype/mplus/mplus-1p-medium.ttf",
-		"/usr/share/fonts/opentype/mplus/MPLUS1c-Regular.otf",
-		"/usr/share/fonts/opentype/mplus/MPLUS1c-Bold.otf",
-		"/usr/share/fonts/opentype/mplus/MPLUS1p-Regular.otf",
-		"/usr/share/fonts/opentype/mplus/MPLUS1p-Bold.otf",
-	]
-	candidate_families = [
-		"M PLUS 1c", "M PLUS 1p", "M+ 1c", "M+ 1p",
-		"Noto Sans CJK JP", "Noto Sans JP",
-		"IPAexGothic", "IPAGothic", "TakaoPGothic",
-	]
-
-	chosen_family, resolved_path = None, None
-
-	# 1) Prefer loading by file path to get an exact family name
-	for p in candidate_paths:
-		if not os.path.exists(p):
-			continue
-		try:
-			font_manager.fontManager.addfont(p)
-			if not chosen_family:
-				prop = font_manager.FontProperties(fname=p)
-				chosen_family, resolved_path = prop.get_name(), p
-		except Exception:
-			pass
-
-	# 2) Fallback: try well-known family names
-	if not chosen_family:
-		for fam in candidate_families:
-			try:
-				font_manager.findfont(mpl.font_manager.FontProperties(family=fam), fallback_to_default=False)
-				chosen_family = fam
-				break
-			except Exception:
-				pass
-
-	# 3) Apply rcParams
-	if chosen_family:
-		rcParams.update({
-			'font.family': [chosen_family],
-			'font.sans-serif': [
-				chosen_family,
-				'Noto Sans CJK JP', 'Noto Sans JP',
-				'IPAexGothic', 'IPAGothic', 'TakaoPGothic',
-			],
-			'axes.unicode_minus': False,
-			'axes.titleweight': 'normal',
-			'font.weight': 'normal',
-		})
-		try:
-			resolved = font_manager.findfont(mpl.font_manager.FontProperties(family=chosen_family), fallback_to_default=False)
-		except Exception:
-			resolved = resolved_path or ''
-		print(f"Using Japanese font family: {chosen_family} -> {resolved}")
-
-		global JP_FONT_PROP
-		JP_FONT_PROP = FontProperties(fname=resolved_path) if resolved_path and os.path.exists(resolved_path) else FontProperties(family=chosen_family)
-	else:
-		# Keep defaults but warn user
-		print("Warning: Could not find a Japanese font. Matplotlib may fall back to DejaVu Sans.")
-		JP_FONT_PROP = None
-
-
-# Configure font at import time so all plots use it
-setup_japanese_font()
 
 DATA_PATH = "/home/ubuntu/cur/program/Analyisis_incineration/2022_1焼却施設.csv"
 OUT_DIR = "/home/ubuntu/cur/program/Analyisis_incineration/result"
-os.makedirs(OUT_DIR, exist_ok=True)
 
 TARGET_COL = "ごみ処理事業実施方式"
 
@@ -134,8 +55,11 @@ def value_counts_grouped_raw(df: pd.DataFrame, col: str) -> pd.Series:
     return grouped.value_counts(sort=False)
 
 
-def plot_barh_counts(counts: pd.Series, title: str, filename: str):
-	plt.figure(figsize=(10, max(4, 0.5 * len(counts))))
+def draw_barh_counts(counts: pd.Series, title: str):
+	import matplotlib.pyplot as plt
+	import seaborn as sns
+
+	fig = plt.figure(figsize=(10, max(4, 0.5 * len(counts))))
 	sns.set_style("whitegrid")
 	ax = sns.barplot(x=counts.values, y=counts.index, palette="Blues_d")
 
@@ -151,24 +75,29 @@ def plot_barh_counts(counts: pd.Series, title: str, filename: str):
 	]
 
 	# Enforce JP font everywhere if available (preserve current sizes)
-	if JP_FONT_PROP is not None:
+	jp_font_prop = japanese_font_properties()
+	if jp_font_prop is not None:
 		texts = [ax.title, ax.xaxis.label, ax.yaxis.label] + ax.get_xticklabels() + ax.get_yticklabels() + annots
 		for t in texts:
 			size = t.get_fontsize()
-			t.set_fontproperties(JP_FONT_PROP)
+			t.set_fontproperties(jp_font_prop)
 			t.set_fontsize(size)
 
-	plt.tight_layout()
-	out_path = os.path.join(OUT_DIR, filename)
-	plt.savefig(out_path)
-	plt.close()
-	print(f"グラフを保存しました: {out_path}")
+	fig.tight_layout()
+	return fig
 
 
-def save_counts_csv(counts: pd.Series, filename: str):
-	out_path = os.path.join(OUT_DIR, filename)
-	counts.rename("count").to_frame().to_csv(out_path, encoding="utf-8-sig")
-	print(f"集計CSVを保存しました: {out_path}")
+def barh_counts_job(counts: pd.Series, title: str, filename: str, out_dir: str = OUT_DIR) -> dict:
+	return make_job(draw_barh_counts, os.path.join(out_dir, filename), kwargs={"counts": counts, "title": title})
+
+
+def save_counts_csv(counts: pd.Series, filename: str, out_dir: str = OUT_DIR):
+	out_path = os.path.join(out_dir, filename)
+	# 件数が前回と同じなら書き直さない
+	if output_cache.write_csv(counts.rename("count").to_frame(), out_path, encoding="utf-8-sig"):
+		print(f"集計CSVを保存しました: {out_path}")
+	else:
+		print(f"変更がないため集計CSVの書き出しを省略しました: {out_path}")
 
 
 def parse_args() -> argparse.Namespace:
@@ -181,38 +110,43 @@ def parse_args() -> argparse.Namespace:
 	return parser.parse_args()
 
 
-def main():
-	args = parse_args()
-	df = load_data(DATA_PATH)
+def run(df: pd.DataFrame, out_dir: str = OUT_DIR, sort_by_counts: bool = False):
+	"""実施方式の件数を集計し、CSVとグラフを out_dir に保存する"""
+	os.makedirs(out_dir, exist_ok=True)
 
 	# 参考用に先頭を出力
 	columns = ["施設名称", "施設全体の処理能力_t/日", "炉型式", TARGET_COL]
 	pd.set_option("display.max_columns", None)
 	print(df[columns].head())
 
-	# 1) 実施方式（フル表記）の件数
-	counts_full = value_counts_raw(df, TARGET_COL)
-	if args.sort_by_counts:
-		counts_full = counts_full.sort_values(ascending=False)
-	save_counts_csv(counts_full, "implementation_method_counts_full.csv")
-	title_full = "図: ごみ処理事業実施方式（フル表記）の内訳" + ("（降順）" if args.sort_by_counts else "")
-	plot_barh_counts(
-		counts_full,
-		title=title_full,
-		filename="implementation_method_counts_full.png",
-	)
+	# 1) 実施方式（フル表記）の件数、2) 実施方式（括弧前でグルーピング）の件数
+	with stage("aggregate", rows=len(df)):
+		counts_full = value_counts_raw(df, TARGET_COL)
+		counts_group = value_counts_grouped_raw(df, TARGET_COL)
+		if sort_by_counts:
+			counts_full = counts_full.sort_values(ascending=False)
+			counts_group = counts_group.sort_values(ascending=False)
+
+	with stage("export", rows=len(counts_full) + len(counts_group)):
+		save_counts_csv(counts_full, "implementation_method_counts_full.csv", out_dir)
+		save_counts_csv(counts_group, "implementation_method_counts_grouped.csv", out_dir)
+
+	suffix = "（降順）" if sort_by_counts else ""
+	title_full = "図: ごみ処理事業実施方式（フル表記）の内訳" + suffix
+	title_group = "図: ごみ処理事業実施方式（方式の種類別）の内訳" + suffix
+	jobs = [
+		barh_counts_job(counts_full, title_full, "implementation_method_counts_full.png", out_dir),
+		barh_counts_job(counts_group, title_group, "implementation_method_counts_grouped.png", out_dir),
+	]
 
-	# 2) 実施方式（括弧前でグルーピング）の件数
-	counts_group = value_counts_grouped_raw(df, TARGET_COL)
-	if args.sort_by_counts:
-		counts_group = counts_group.sort_values(ascending=False)
-	save_counts_csv(counts_group, "implementation_method_counts_grouped.csv")
-	title_group = "図: ごみ処理事業実施方式（方式の種類別）の内訳" + ("（降順）" if args.sort_by_counts else "")
-	plot_barh_counts(
-		counts_group,
-		title=title_group,
-		filename="implementation_method_counts_grouped.png",
-	)
+	# 2つのグラフを並列に描画・保存
+	render_figures(jobs)
+
+
+def main():
+	args = parse_args()
+	df = load_data(DATA_PATH)
+	run(df, OUT_DIR, sort_by_counts=args.sort_by_counts)
 
 
 if __name__ == "__main__":